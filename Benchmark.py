@@ -0,0 +1,181 @@
+# Micro-benchmarks for the hot paths of seed generation and patching.
+# Run with python Benchmark.py <benchmark> [options], see `python Benchmark.py -h`.
+# Settings files are loaded from the tests directory, like Unittest.py does.
+
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+import crc
+from Fill import ShuffleError
+from Main import resolve_settings, build_world_graphs, place_items
+from ntype import BigStream
+from RuleParser import compiled_rules, load_rule_cache, save_rule_cache
+from Search import Search
+from Settings import Settings
+from World import World
+
+test_dir = os.path.join(os.path.dirname(__file__), 'tests')
+
+
+def load_test_settings(filename: str, seed: str = 'BENCHMARK') -> Settings:
+    with open(os.path.join(test_dir, filename)) as f:
+        settings_dict = json.load(f)
+    settings_dict.update({
+        'create_patch_file': False,
+        'create_compressed_rom': False,
+        'create_wad_file': False,
+        'create_uncompressed_rom': False,
+        'create_spoiler': True,
+        'count': 1,
+        'seed': seed,
+    })
+    return Settings(settings_dict)
+
+
+def filled_worlds(filename: str, max_attempts: int = 10) -> list[World]:
+    settings = load_test_settings(filename)
+    resolve_settings(settings)
+    for attempt in range(max_attempts):
+        try:
+            worlds = build_world_graphs(settings)
+            place_items(worlds)
+            return worlds
+        except ShuffleError:
+            settings.reset_distribution()
+    raise RuntimeError(f'Could not fill {filename} in {max_attempts} attempts.')
+
+
+# Best average time per call over a few rounds, to filter out noise from other processes.
+def time_per_call(function: Callable[[], Any], repeat: int, rounds: int = 5) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+
+def report(rows: list[tuple[str, ...]], header: tuple[str, ...]) -> None:
+    widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def benchmark_search(args: argparse.Namespace) -> None:
+    rows = []
+    for filename in args.files:
+        worlds = filled_worlds(filename)
+        search = Search([world.state for world in worlds])
+        explored_search = search.copy()
+        explored_search.collect_locations()
+        copy_time = time_per_call(explored_search.copy, args.repeat)
+        collect_time = time_per_call(lambda: search.copy().collect_locations(), args.repeat)
+        rows.append((filename, str(len(worlds)), f'{copy_time * 1e6:.1f}', f'{collect_time * 1e3:.2f}'))
+    report(rows, ('settings', 'worlds', 'copy (us)', 'collect_locations (ms)'))
+
+
+def benchmark_fill(args: argparse.Namespace) -> None:
+    rows = []
+    for filename in args.files:
+        settings = load_test_settings(filename)
+        resolve_settings(settings)
+        times = []
+        while len(times) < args.repeat:
+            worlds = build_world_graphs(settings)
+            start = time.perf_counter()
+            try:
+                place_items(worlds)
+                times.append(time.perf_counter() - start)
+            except ShuffleError:
+                pass
+            settings.reset_distribution()
+        rows.append((filename, str(len(worlds)), f'{min(times):.2f}', f'{sum(times) / len(times):.2f}'))
+    report(rows, ('settings', 'worlds', 'fill best (s)', 'fill mean (s)'))
+
+
+def benchmark_rules(args: argparse.Namespace) -> None:
+    rows = []
+    for filename in args.files:
+        settings = load_test_settings(filename)
+        resolve_settings(settings)
+        compiled_rules.clear()
+        start = time.perf_counter()
+        worlds = build_world_graphs(settings)
+        cold_time = time.perf_counter() - start
+        settings.reset_distribution()
+
+        def rebuild() -> None:
+            build_world_graphs(settings)
+            settings.reset_distribution()
+        warm_time = time_per_call(rebuild, args.repeat, rounds=1)
+        rows.append((filename, str(len(worlds)), f'{cold_time:.2f}', f'{warm_time:.2f}'))
+        if args.cache_file:
+            save_rule_cache(args.cache_file)
+            compiled_rules.clear()
+            load_rule_cache(args.cache_file)
+            start = time.perf_counter()
+            build_world_graphs(settings)
+            rows[-1] += (f'{time.perf_counter() - start:.2f}',)
+            settings.reset_distribution()
+    header = ('settings', 'worlds', 'cold build (s)', 'warm build (s)')
+    report(rows, header + (('from file (s)',) if args.cache_file else ()))
+
+
+def benchmark_crc(args: argparse.Namespace) -> None:
+    data = BigStream(bytearray(os.urandom(args.size << 20)))
+    implementations = [('python', crc.calculate_crc_python)]
+    if crc.numpy is not None:
+        implementations.append(('numpy', crc.calculate_crc_numpy))
+    rows = []
+    results = set()
+    for name, calculate_crc in implementations:
+        results.add(bytes(calculate_crc(data)))
+        rows.append((name, f'{time_per_call(lambda: calculate_crc(data), args.repeat) * 1e3:.1f}'))
+    if len(results) != 1:
+        raise RuntimeError('CRC implementations disagree.')
+    report(rows, ('implementation', 'calculate_crc (ms)'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmarks for the randomizer hot paths.')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    search_parser = subparsers.add_parser('search', help='Search.copy() and collect_locations() on filled test worlds.')
+    search_parser.add_argument('files', nargs='*', help='Settings files in the tests directory. Defaults to all of them.')
+    search_parser.add_argument('--repeat', type=int, default=20)
+    search_parser.set_defaults(run=benchmark_search)
+
+    fill_parser = subparsers.add_parser('fill', help='Item placement (Fill.distribute_items_restrictive) on the test settings.')
+    fill_parser.add_argument('files', nargs='*', default=['multiworld.sav', 'ludicrous.sav'], help='Settings files in the tests directory.')
+    fill_parser.add_argument('--repeat', type=int, default=3)
+    fill_parser.set_defaults(run=benchmark_fill)
+
+    rules_parser = subparsers.add_parser('rules', help='World graph construction (build_world_graphs) with a cold and a warm rule cache.')
+    rules_parser.add_argument('files', nargs='*', default=['multiworld.sav', 'mq.sav'], help='Settings files in the tests directory.')
+    rules_parser.add_argument('--repeat', type=int, default=3)
+    rules_parser.add_argument('--cache_file', help='Also time loading the rules saved to this file.')
+    rules_parser.set_defaults(run=benchmark_rules)
+
+    crc_parser = subparsers.add_parser('crc', help='N64 header CRC (crc.calculate_crc) on a random buffer.')
+    crc_parser.add_argument('--size', type=int, default=64, help='Buffer size in MiB.')
+    crc_parser.add_argument('--repeat', type=int, default=3)
+    crc_parser.set_defaults(run=benchmark_crc)
+
+    args = parser.parse_args()
+    if hasattr(args, 'files') and not args.files:
+        args.files = sorted(filename for filename in os.listdir(test_dir) if filename.endswith('.sav'))
+
+    logging.basicConfig(level=logging.ERROR)
+    args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -61,6 +61,7 @@ class Entrance:
     def connect(self, region: Region) -> None:
         self.connected_region = region
         region.entrances.append(self)
+        region.world.hint_area_index.invalidate(region)
 
     def disconnect(self) -> Optional[Region]:
         if self.connected_region is None:
@@ -71,6 +72,7 @@ class Entrance:
             raise e
         previously_connected = self.connected_region
         self.connected_region = None
+        previously_connected.world.hint_area_index.invalidate(previously_connected)
         return previously_connected
 
     def bind_two_way(self, other_entrance: Entrance) -> None:
@@ -807,14 +807,17 @@ def split_entrances_by_requirements(worlds: list[World], entrances_to_split: lis
 
 
 def replace_entrance(worlds: list[World], entrance: Entrance, target: Entrance, rollbacks: list[tuple[Entrance, Entrance]],
-                     locations_to_ensure_reachable: Iterable[Location], itempool: list[Item], placed_one_way_entrances: Optional[list[tuple[Entrance, Entrance]]] = None) -> bool:
+                     locations_to_ensure_reachable: Iterable[Location], itempool: list[Item], placed_one_way_entrances: Optional[list[tuple[Entrance, Entrance]]] = None,
+                     validation_search: Optional[ValidationSearch] = None) -> bool:
     if placed_one_way_entrances is None:
         placed_one_way_entrances = []
     try:
         check_entrances_compatibility(entrance, target, rollbacks, placed_one_way_entrances)
         change_connections(entrance, target)
-        validate_world(entrance.world, worlds, entrance, locations_to_ensure_reachable, itempool, placed_one_way_entrances=placed_one_way_entrances)
+        validate_world(entrance.world, worlds, entrance, locations_to_ensure_reachable, itempool, placed_one_way_entrances=placed_one_way_entrances, validation_search=validation_search)
         rollbacks.append((entrance, target))
+        if validation_search is not None:
+            validation_search.add_placement(entrance)
         return True
     except EntranceShuffleError as error:
         # If the entrance can't be placed there, log a debug message and change the connections back to what they were previously
@@ -866,6 +869,12 @@ def shuffle_entrances(worlds: list[World], entrances: list[Entrance], target_ent
     # Retrieve all items in the itempool, all worlds included
     complete_itempool = [item for world in worlds for item in world.get_itempool_with_dungeon_items()]
 
+    # Placements only ever disconnect the target entrances and the assumed reverses of the entrances being placed
+    hidden_entrances = [target for target in target_entrances if target.connected_region is not None]
+    hidden_entrances.extend(entrance.reverse.assumed for entrance in entrances
+                            if entrance.connected_region is None and entrance.reverse and entrance.reverse.assumed.connected_region is not None)
+    validation_search = ValidationSearch(worlds, complete_itempool, hidden_entrances)
+
     random.shuffle(entrances)
 
     # Place all entrances in the pool, validating worlds during every placement
@@ -878,7 +887,8 @@ def shuffle_entrances(worlds: list[World], entrances: list[Entrance], target_ent
             if target.connected_region is None:
                 continue
 
-            if replace_entrance(worlds, entrance, target, rollbacks, locations_to_ensure_reachable, complete_itempool, placed_one_way_entrances=placed_one_way_entrances):
+            if replace_entrance(worlds, entrance, target, rollbacks, locations_to_ensure_reachable, complete_itempool,
+                                placed_one_way_entrances=placed_one_way_entrances, validation_search=validation_search):
                 break
 
         if entrance.connected_region is None:
@@ -911,9 +921,74 @@ def check_entrances_compatibility(entrance: Entrance, target: Entrance, rollback
                     pass
 
 
+# A max explore search kept alive across all the placements of a shuffle_entrances call, so that validating a placement doesn't explore the worlds
+# from scratch. It is explored with the assumed entrances placements can disconnect hidden, so everything it reaches is also reached with any
+# candidate placement. Validating a placement resumes a copy of it with those entrances and the newly placed ones, which converges on what a new
+# search would find. Accepted placements are explored into it, rejected ones are undone by restore_connections before it ever sees them,
+# so there is nothing to roll back.
+# The no items and time travel searches are not kept, since they only take a single pass over the exits, which makes what they reach
+# depend on the order they explore the worlds in.
+class ValidationSearch:
+    def __init__(self, worlds: list[World], itempool: list[Item], hidden_entrances: list[Entrance]) -> None:
+        self.worlds: list[World] = worlds
+        self.itempool: list[Item] = itempool
+        self.hidden_entrances: list[Entrance] = hidden_entrances
+        self.search: Optional[Search] = None
+        self.progression_locations: list[Location] = []
+
+    def max_explore(self, entrance_placed: Entrance) -> Search:
+        if self.search is None:
+            # Created in the middle of a placement, so the placed exits have to be hidden as well
+            connected_regions = self._hide(self.hidden_entrances + placed_exits(entrance_placed))
+            try:
+                self.search = Search([world.state for world in self.worlds])
+                self.search.collect_all(self.itempool)
+                self.progression_locations = self.search.progression_locations()
+                self.search.collect_locations(self.progression_locations)
+            finally:
+                self._unhide(connected_regions)
+        search = self.search.copy()
+        search.queue_exits(self.hidden_entrances + placed_exits(entrance_placed))
+        search.collect_locations(self.progression_locations)
+        return search
+
+    # Explore the exits of an accepted placement
+    def add_placement(self, entrance_placed: Entrance) -> None:
+        if self.search is None:
+            return
+        connected_regions = self._hide(self.hidden_entrances)
+        try:
+            self.search.queue_exits(placed_exits(entrance_placed))
+            self.search.collect_locations(self.progression_locations)
+        finally:
+            self._unhide(connected_regions)
+
+    # Searches only look at connected_region, so entrances are hidden from them without touching the entrance lists of their regions,
+    # whose order the rest of the shuffle depends on.
+    @staticmethod
+    def _hide(entrances: list[Entrance]) -> list[tuple[Entrance, Optional[Region]]]:
+        connected_regions = [(entrance, entrance.connected_region) for entrance in entrances]
+        for entrance in entrances:
+            entrance.connected_region = None
+        return connected_regions
+
+    @staticmethod
+    def _unhide(connected_regions: list[tuple[Entrance, Optional[Region]]]) -> None:
+        for entrance, region in connected_regions:
+            entrance.connected_region = region
+
+
+# Returns the exits connected by change_connections when placing an entrance
+def placed_exits(entrance: Entrance) -> list[Entrance]:
+    if entrance.reverse:
+        return [entrance, entrance.replaces.reverse]
+    return [entrance]
+
+
 # Validate the provided worlds' structures, raising an error if it's not valid based on our criterias
 def validate_world(world: World, worlds: list[World], entrance_placed: Optional[Entrance], locations_to_ensure_reachable: Iterable[Location],
-                   itempool: list[Item], placed_one_way_entrances: Optional[list[tuple[Entrance, Entrance]]] = None) -> None:
+                   itempool: list[Item], placed_one_way_entrances: Optional[list[tuple[Entrance, Entrance]]] = None,
+                   validation_search: Optional[ValidationSearch] = None) -> None:
     if placed_one_way_entrances is None:
         placed_one_way_entrances = []
     # For various reasons, we don't want the player to end up through certain entrances as the wrong age
@@ -941,7 +1016,10 @@ def validate_world(world: World, worlds: list[World], entrance_placed: Optional[
                 raise EntranceShuffleError('%s is potentially accessible as adult' % entrance.name)
 
     if locations_to_ensure_reachable:
-        max_search = Search.max_explore([w.state for w in worlds], itempool)
+        if validation_search is not None and entrance_placed is not None:
+            max_search = validation_search.max_explore(entrance_placed)
+        else:
+            max_search = Search.max_explore([w.state for w in worlds], itempool)
         if world.check_beatable_only:
             if worlds[0].settings.reachable_locations == 'goals':
                 # If this entrance is required for a goal, it must be placed somewhere reachable.
@@ -979,6 +1057,8 @@ def validate_world(world: World, worlds: list[World], entrance_placed: Optional[
             if impas_front_entrance is not None and impas_back_entrance is not None and not same_hint_area(impas_front_entrance, impas_back_entrance):
                 raise EntranceShuffleError('Kak Impas House entrances are not in the same hint area')
 
+    # Both checks below use the same time travel search, it only depends on the connections
+    time_travel_search = None
     if (world.shuffle_special_interior_entrances or world.settings.shuffle_overworld_entrances or world.settings.spawn_positions) and \
        (entrance_placed == None or entrance_placed.type in ('SpecialInterior', 'Hideout', 'Overworld', 'OverworldOneWay', 'Spawn', 'WarpSong', 'OwlDrop')):
         # At least one valid starting region with all basic refills should be reachable without using any items at the beginning of the seed
@@ -1008,7 +1088,8 @@ def validate_world(world: World, worlds: list[World], entrance_placed: Optional[
         # The Big Poe Shop should always be accessible as adult without the need to use any bottles
         # This is important to ensure that players can never lock their only bottles by filling them with Big Poes they can't sell
         # We can use starting items in this check as long as there are no exits requiring the use of a bottle without refills
-        time_travel_search = Search.with_items([w.state for w in worlds], [ItemFactory('Time Travel', world=w) for w in worlds])
+        if time_travel_search is None:
+            time_travel_search = Search.with_items([w.state for w in worlds], [ItemFactory('Time Travel', world=w) for w in worlds])
 
         if not time_travel_search.can_reach(world.get_region('Market Guard House'), age='adult'):
             raise EntranceShuffleError('Big Poe Shop access is not guaranteed as adult')
@@ -401,6 +401,13 @@ def fill_restrictive(worlds: list[World], base_search: Search, locations: list[L
     # don't run over this search, just keep it as an item collection
     items_search = base_search.copy()
     items_search.collect_all(itempool)
+
+    # Everything reachable without any of the items left to place stays reachable
+    # for the rest of this fill, so it is only explored once and extended as items
+    # are placed. Each max search then resumes from it instead of re-exploring from
+    # the base search, which reaches the same result with less work.
+    reachable_search = base_search.copy()
+    reachable_items = []
     logging.getLogger('').debug(f'Placing {len(itempool)} items among {len(locations)} potential locations.')
     itempool.sort(key=lambda item: not item.priority)
 
@@ -420,10 +427,15 @@ def fill_restrictive(worlds: list[World], base_search: Search, locations: list[L
             l2cations = locations
         random.shuffle(l2cations)
 
+        # pick up the items placed so far that are reachable without the itempool
+        for location in reachable_search.iter_reachable_locations(reachable_search.progression_locations()):
+            reachable_search.collect(location.item)
+            reachable_items.append(location.item)
+
         # generate the max search with every remaining item
         # this will allow us to place this item in a reachable location
         items_search.uncollect(item_to_place)
-        max_search = items_search.copy()
+        max_search = reachable_search.resume_with(items_search.state_list, reachable_items)
         max_search.collect_locations()
 
         # perform_access_check checks location reachability
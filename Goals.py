@@ -1,7 +1,12 @@
 from __future__ import annotations
+import logging
+import multiprocessing
+import os
 import sys
 from collections import defaultdict
 from collections.abc import Iterable, Collection
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Optional, Any
 
 from HintList import BOSS_GOAL_TABLE, REWARD_GOAL_TABLE, get_hint_group, hint_exclusions
@@ -200,8 +205,11 @@ def update_goal_items(spoiler: Spoiler) -> None:
     always_locations = [location.name for world in worlds for location in get_hint_group('always', world)]
 
     if worlds[0].enable_goal_hints:
+        goal_workers = worlds[0].settings.goal_workers or os.cpu_count() or 1
+        parallel_search = len(worlds) > 1 and goal_workers > 1 and 'fork' in multiprocessing.get_all_start_methods()
         # References first world for goal categories only
         for cat_name, category in worlds[0].locked_goal_categories.items():
+            jobs = []
             for cat_world in worlds:
                 search = Search([world.state for world in worlds])
                 search.collect_pseudo_starting_items()
@@ -219,6 +227,11 @@ def update_goal_items(spoiler: Spoiler) -> None:
                 # Goals are changed for beatable-only accessibility per-world
                 category.update_reachable_goals(search, full_search)
                 reachable_goals = full_search.beatable_goals_fast({ cat_name: category }, cat_world.id)
+                if parallel_search:
+                    # The goal search itself runs in a worker, with the goal quantities as they are now.
+                    jobs.append(LockedGoalSearch(cat_name, cat_world.id, reachable_goals, get_goal_quantities(worlds, cat_name)))
+                    unlock_category_entrances(category_locks, cat_state)
+                    continue
                 identified_locations = search_goals({ cat_name: category }, reachable_goals, search, priority_locations, all_locations, item_locations, always_locations)
                 # Multiworld can have all goals for one player's bridge entirely
                 # locked by another player's bridge. Therefore, we can't assume
@@ -230,6 +243,10 @@ def update_goal_items(spoiler: Spoiler) -> None:
 
                 unlock_category_entrances(category_locks, cat_state)
 
+            if jobs:
+                context = LockedGoalSearchContext(spoiler, priority_locations, all_locations, item_locations, always_locations)
+                search_locked_goals_parallel(context, jobs, goal_workers, required_locations)
+
     search = Search([world.state for world in worlds])
     search.collect_pseudo_starting_items()
     reachable_goals = {}
@@ -300,6 +317,116 @@ def update_goal_items(spoiler: Spoiler) -> None:
     spoiler.goal_locations = required_locations_dict
 
 
+# One search for the goals of a locked category with the entrance locks of a single world.
+# The searches for every world of a category only depend on what the categories before it found,
+# so they can run side by side. Goal quantities are passed along since the setup for each world
+# can lower them, and each search has to see them as they were right after its own setup.
+@dataclass
+class LockedGoalSearch:
+    category_name: str
+    world_id: int
+    reachable_goals: ValidGoals
+    goal_quantities: list[int]
+
+
+@dataclass
+class LockedGoalSearchResult:
+    # Locations are referenced as (world id, location name), the same locations in the parent are used when merging.
+    required_locations: dict[str, list[tuple[int, str, int, int]]]
+    priority_locations: list[tuple[int, str]]
+    weighted_goals: list[str]
+    category_weighted: bool
+    misc_hint_locations: list[tuple[int, str]]
+
+
+@dataclass
+class LockedGoalSearchContext:
+    spoiler: Spoiler
+    priority_locations: dict[int, dict[str, str]]
+    all_locations: list[Location]
+    item_locations: Collection[Location]
+    always_locations: Collection[str]
+
+
+def get_goal_quantities(worlds: list[World], category_name: str) -> list[int]:
+    return [item['quantity'] for world in worlds if category_name in world.goal_categories
+            for goal in world.goal_categories[category_name].goals for item in goal.items]
+
+
+def set_goal_quantities(worlds: list[World], category_name: str, quantities: list[int]) -> None:
+    items = [item for world in worlds if category_name in world.goal_categories
+             for goal in world.goal_categories[category_name].goals for item in goal.items]
+    for item, quantity in zip(items, quantities):
+        item['quantity'] = quantity
+
+
+# Set in the parent right before the goal search workers are forked. Worlds hold their access rules
+# as lambdas and can't be pickled, so the workers get everything by inheriting it instead.
+locked_goal_search_context: Optional[LockedGoalSearchContext] = None
+
+
+# Runs in a forked goal search worker. Rebuilds the search the parent set the job up with.
+def search_locked_goals(job: LockedGoalSearch) -> LockedGoalSearchResult:
+    context = locked_goal_search_context
+    worlds = context.spoiler.worlds
+    category = worlds[0].locked_goal_categories[job.category_name]
+    set_goal_quantities(worlds, job.category_name, job.goal_quantities)
+
+    search = Search([world.state for world in worlds])
+    search.collect_pseudo_starting_items()
+    cat_state = list(filter(lambda s: s.world.id == job.world_id, search.state_list))
+    lock_category_entrances(category, cat_state)
+
+    misc_hint_locations = []
+    identified_locations = search_goals({ job.category_name: category }, job.reachable_goals, search, context.priority_locations,
+                                        context.all_locations, context.item_locations, context.always_locations,
+                                        misc_hint_locations=misc_hint_locations)
+    return LockedGoalSearchResult(
+        required_locations={
+            goal_name: [(location.world.id, location.name, weight, hint_weight) for location, weight, hint_weight in world_location_lists[job.world_id]]
+            for goal_name, world_location_lists in identified_locations[job.category_name].items()
+        },
+        priority_locations=[(world_id, location_name) for world_id, locations in context.priority_locations.items()
+                            for location_name, category_name in locations.items() if category_name == job.category_name],
+        weighted_goals=[goal.name for goal in category.goals if goal.weight],
+        category_weighted=bool(category.weight),
+        misc_hint_locations=[(location.world.id, location.name) for location in misc_hint_locations],
+    )
+
+
+# Runs the goal searches of one locked category in a pool of forked processes and merges their
+# results in world order, the same way as running them one after the other.
+def search_locked_goals_parallel(context: LockedGoalSearchContext, jobs: list[LockedGoalSearch], workers: int,
+                                 required_locations: RequiredLocations) -> None:
+    global locked_goal_search_context
+    worlds = context.spoiler.worlds
+    workers = min(workers, len(jobs))
+    logging.getLogger('').debug('Searching %d goal categories with %d workers.', len(jobs), workers)
+    locked_goal_search_context = context
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            results = list(executor.map(search_locked_goals, jobs))
+    finally:
+        locked_goal_search_context = None
+
+    for job, result in zip(jobs, results):
+        category = worlds[0].locked_goal_categories[job.category_name]
+        for goal_name, locations in result.required_locations.items():
+            required_locations[job.category_name][goal_name][job.world_id] = [
+                (worlds[world_id].get_location(location_name), weight, hint_weight)
+                for world_id, location_name, weight, hint_weight in locations
+            ]
+        for world_id, location_name in result.priority_locations:
+            context.priority_locations[world_id][location_name] = job.category_name
+        for goal_name in result.weighted_goals:
+            category.get_goal(goal_name).weight = 1
+        if result.category_weighted:
+            category.weight = 1
+        # Misc. hints keep the first location found for them, so the order they were checked in matters.
+        for world_id, location_name in result.misc_hint_locations:
+            worlds[world_id].get_location(location_name).maybe_set_misc_hints()
+
+
 def lock_category_entrances(category: GoalCategory, state_list: Iterable[State]) -> dict[int, dict[str, AccessRule]]:
     # Disable access rules for specified entrances
     category_locks = {}
@@ -324,21 +451,24 @@ def unlock_category_entrances(category_locks: dict[int, dict[str, AccessRule]],
 
 def search_goals(categories: dict[str, GoalCategory], reachable_goals: ValidGoals, search: Search, priority_locations: dict[int, dict[str, str]],
                  all_locations: list[Location], item_locations: Collection[Location], always_locations: Collection[str],
-                 search_woth: bool = False) -> RequiredLocations:
+                 search_woth: bool = False, misc_hint_locations: Optional[list[Location]] = None) -> RequiredLocations:
     # required_locations[category.name][goal.name][world_id] = [...]
     required_locations: RequiredLocations = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
     world_ids = [state.world.id for state in search.state_list]
     if search_woth:
         required_locations['way of the hero'] = []
     remaining_locations = all_locations[:]
+    progression_locations = search.progression_locations()
     for location in search.iter_reachable_locations(all_locations):
         # Try to remove items one at a time and see if the goal is still reachable
         if location in item_locations:
             old_item = location.item
             location.item = None
             # copies state! This is very important as we're in the middle of a search
-            # already, but beneficially, has search it can start from
-            valid_goals = search.beatable_goals(categories)
+            # already, but beneficially, has search it can start from.
+            # Locations the search already visited won't be visited again by the copy, so leave them out.
+            progression_locations = [loc for loc in progression_locations if not search.visited(loc)]
+            valid_goals = search.beatable_goals(categories, progression_locations)
             for cat_name, category in categories.items():
                 # Exit early if no goals are beatable with category locks
                 if category.name in reachable_goals and reachable_goals[category.name]:
@@ -372,10 +502,14 @@ def search_goals(categories: dict[str, GoalCategory], reachable_goals: ValidGoal
                 required_locations['way of the hero'].append(location)
             location.item = old_item
         location.maybe_set_misc_hints()
+        if misc_hint_locations is not None:
+            misc_hint_locations.append(location)
         remaining_locations.remove(location)
         if location.item.solver_id is not None:
             search.state_list[location.item.world.id].collect(location.item)
     for location in remaining_locations:
         # finally, collect unreachable locations for misc. item hints
         location.maybe_set_misc_hints()
+    if misc_hint_locations is not None:
+        misc_hint_locations.extend(remaining_locations)
     return required_locations
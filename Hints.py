@@ -6,7 +6,7 @@ import os
 import random
 import sys
 import urllib.request
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, deque
 from collections.abc import Callable, Iterable
 from enum import Enum
 from typing import TYPE_CHECKING, Optional
@@ -233,7 +233,7 @@ def add_hint(spoiler: Spoiler, world: World, groups: list[list[int]], gossip_tex
                 reachable = True
                 if locations:
                     for location in locations:
-                        if not any(map(lambda stone_location: can_reach_hint(spoiler.worlds, stone_location, location), stone_locations)):
+                        if not any(map(lambda stone_location: can_reach_hint(spoiler.hint_reachability, stone_location, location), stone_locations)):
                             reachable = False
 
                 if not first or reachable:
@@ -252,6 +252,7 @@ def add_hint(spoiler: Spoiler, world: World, groups: list[list[int]], gossip_tex
                         # by establishing a (hint -> item) -> hint -> item -> (first hint) loop
                         for location in locations:
                             location.add_rule(world.parser.parse_rule(repr(event_item.name)))
+                        spoiler.hint_reachability.invalidate()
 
                     total -= 1
                     first = False
@@ -301,14 +302,44 @@ def add_hint(spoiler: Spoiler, world: World, groups: list[list[int]], gossip_tex
     return success
 
 
-def can_reach_hint(worlds: list[World], hint_location: Location, location: Location) -> bool:
+# Caches the explorations that hint reachability is checked against while building hints.
+# Exploring without a location's item is done at most once per location, and not at all if
+# the item was never collected by the full exploration to begin with.
+# Anything that changes the logic, like placing hint event items, has to call invalidate.
+class HintReachability:
+    def __init__(self, worlds: list[World]) -> None:
+        self.worlds: list[World] = worlds
+        self._search: Optional[Search] = None
+        self._searches_without: dict[Location, Search] = {}
+
+    def invalidate(self) -> None:
+        self._search = None
+        self._searches_without.clear()
+
+    def search(self) -> Search:
+        if self._search is None:
+            self._search = Search.max_explore([world.state for world in self.worlds])
+        return self._search
+
+    def search_without(self, location: Location) -> Search:
+        # Only progression items are collected, and only from locations that were visited.
+        if location.item is None or not location.item.advancement:
+            return self.search()
+        if self._search is not None and not self._search.visited(location):
+            return self._search
+        if location not in self._searches_without:
+            old_item = location.item
+            location.item = None
+            self._searches_without[location] = Search.max_explore([world.state for world in self.worlds])
+            location.item = old_item
+        return self._searches_without[location]
+
+
+def can_reach_hint(reachability: HintReachability, hint_location: Location, location: Location) -> bool:
     if location is None:
         return True
 
-    old_item = location.item
-    location.item = None
-    search = Search.max_explore([world.state for world in worlds])
-    location.item = old_item
+    search = reachability.search_without(location)
 
     return (search.spot_access(hint_location)
             and (hint_location.type != 'HintStone' or search.state_list[location.world.id].guarantee_hint()))
@@ -375,6 +406,24 @@ class HintAreaNotFound(RuntimeError):
     pass
 
 
+# Remembers the region HintArea.at settles on for each region it was asked about, per world.
+# Each result also records the regions whose entrances its search went through, so connecting
+# or disconnecting an entrance only drops the results that could have gone through it.
+class HintAreaIndex:
+    def __init__(self) -> None:
+        self.hint_regions: dict[Region, Optional[Region]] = {}
+        self.dependents: dict[Region, set[Region]] = defaultdict(set)
+
+    def add(self, region: Region, hint_region: Optional[Region], searched_regions: Iterable[Region]) -> None:
+        self.hint_regions[region] = hint_region
+        for searched_region in searched_regions:
+            self.dependents[searched_region].add(region)
+
+    def invalidate(self, region: Region) -> None:
+        for dependent in self.dependents.pop(region, ()):
+            self.hint_regions.pop(dependent, None)
+
+
 class HintArea(Enum):
     # internal name          prepositions        display name                  short name                color         internal dungeon name
     #                        vague     clear
@@ -417,7 +466,8 @@ class HintArea(Enum):
     DESERT_COLOSSUS        = 'at',     'at',     'the Desert Colossus',        "Desert Colossus",        'Yellow',     None
     SPIRIT_TEMPLE          = 'inside', 'in',     'the Spirit Temple',          "Spirit Temple",          'Yellow',     'Spirit Temple'
 
-    # Performs a breadth first search to find the closest hint area from a given spot (region, location, or entrance).
+    # Finds the closest hint area from a given spot (region, location, or entrance).
+    # The answer only depends on the region the spot is in, so it is looked up in the world's HintAreaIndex.
     # May fail to find a hint if the given spot is only accessible from the root and not from any other region with a hint area
     @staticmethod
     def at(spot: Spot, use_alt_hint: bool = False) -> HintArea:
@@ -425,16 +475,34 @@ class HintArea(Enum):
             original_parent = spot
         else:
             original_parent = spot.parent_region
-        already_checked = []
-        spot_queue = [spot]
-        fallback_spot_queue = []
+        hint_area_index = original_parent.world.hint_area_index
+        try:
+            hint_region = hint_area_index.hint_regions[original_parent]
+        except KeyError:
+            hint_region, searched_regions = HintArea.find_hint_region(original_parent)
+            hint_area_index.add(original_parent, hint_region, searched_regions)
+
+        if hint_region is None:
+            raise HintAreaNotFound('No hint area could be found for %s [World %d]' % (spot, spot.world.id))
+        if use_alt_hint and hint_region.alt_hint:
+            return hint_region.alt_hint
+        return hint_region.hint
+
+    # Performs a breadth first search to find the closest region with a hint area from a given region.
+    # Also returns the regions whose entrances were searched on the way there.
+    @staticmethod
+    def find_hint_region(original_parent: Region) -> tuple[Optional[Region], list[Region]]:
+        already_checked = set()
+        searched_regions = []
+        spot_queue = deque([original_parent])
+        fallback_spot_queue = deque()
 
         while spot_queue or fallback_spot_queue:
             if not spot_queue:
                 spot_queue = fallback_spot_queue
-                fallback_spot_queue = []
-            current_spot = spot_queue.pop(0)
-            already_checked.append(current_spot)
+                fallback_spot_queue = deque()
+            current_spot = spot_queue.popleft()
+            already_checked.add(current_spot)
 
             if isinstance(current_spot, Region):
                 parent_region = current_spot
@@ -442,10 +510,9 @@ class HintArea(Enum):
                 parent_region = current_spot.parent_region
 
             if parent_region.hint and (original_parent.name == 'Root' or parent_region.name != 'Root'):
-                if use_alt_hint and parent_region.alt_hint:
-                    return parent_region.alt_hint
-                return parent_region.hint
+                return parent_region, searched_regions
 
+            searched_regions.append(parent_region)
             for entrance in parent_region.entrances:
                 if entrance not in already_checked:
                     # prioritize two-way entrances
@@ -454,7 +521,7 @@ class HintArea(Enum):
                     else:
                         spot_queue.append(entrance)
 
-        raise HintAreaNotFound('No hint area could be found for %s [World %d]' % (spot, spot.world.id))
+        return None, searched_regions
 
     @classmethod
     def for_dungeon(cls, dungeon_name: str) -> Optional[HintArea]:
@@ -1266,6 +1333,7 @@ def always_named_item(world: World, locations: Iterable[Location]):
 def build_gossip_hints(spoiler: Spoiler, worlds: list[World]) -> None:
     from Dungeon import Dungeon
 
+    reachability = spoiler.hint_reachability = HintReachability(worlds)
     checked_locations = dict()
     # Add misc. item hint locations to "checked" locations if the respective hint is reachable without the hinted item.
     for world in worlds:
@@ -1297,27 +1365,27 @@ def build_gossip_hints(spoiler: Spoiler, worlds: list[World]) -> None:
                         )
                     ]
                 for compass_location in compass_locations:
-                    if can_reach_hint(worlds, compass_location, location):
+                    if can_reach_hint(reachability, compass_location, location):
                         item_world = location.world
                         if item_world.id not in checked_locations:
                             checked_locations[item_world.id] = set()
                         checked_locations[item_world.id].add(location.name)
                         break
             else:
-                if 'altar' in world.settings.misc_hints and can_reach_hint(worlds, world.get_location('ToT Child Altar Hint' if location.item.info.stone else 'ToT Adult Altar Hint'), location):
+                if 'altar' in world.settings.misc_hints and can_reach_hint(reachability, world.get_location('ToT Child Altar Hint' if location.item.info.stone else 'ToT Adult Altar Hint'), location):
                     item_world = location.world
                     if item_world.id not in checked_locations:
                         checked_locations[item_world.id] = set()
                     checked_locations[item_world.id].add(location.name)
         for hint_type, location in world.misc_hint_item_locations.items():
-            if hint_type in world.settings.misc_hints and can_reach_hint(worlds, world.get_location(misc_item_hint_table[hint_type]['hint_location']), location):
+            if hint_type in world.settings.misc_hints and can_reach_hint(reachability, world.get_location(misc_item_hint_table[hint_type]['hint_location']), location):
                 item_world = location.world
                 if item_world.id not in checked_locations:
                     checked_locations[item_world.id] = set()
                 checked_locations[item_world.id].add(location.name)
         for hint_type in world.misc_hint_location_items.keys():
             location = world.get_location(misc_location_hint_table[hint_type]['item_location'])
-            if hint_type in world.settings.misc_hints and can_reach_hint(worlds, world.get_location(misc_location_hint_table[hint_type]['hint_location']), location):
+            if hint_type in world.settings.misc_hints and can_reach_hint(reachability, world.get_location(misc_location_hint_table[hint_type]['hint_location']), location):
                 item_world = location.world
                 if item_world.id not in checked_locations:
                     checked_locations[item_world.id] = set()
@@ -1333,6 +1401,7 @@ def build_gossip_hints(spoiler: Spoiler, worlds: list[World]) -> None:
     for world in worlds:
         world.update_useless_areas(spoiler)
         build_world_gossip_hints(spoiler, world, checked_locations.pop(world.id, None))
+    spoiler.hint_reachability = None
 
 
 # builds out general hints based on location and whether an item is required or not
@@ -1340,7 +1409,9 @@ def build_world_gossip_hints(spoiler: Spoiler, world: World, checked_locations:
     world.barren_dungeon = 0
     world.woth_dungeon = 0
 
-    search = Search.max_explore([w.state for w in spoiler.worlds])
+    if spoiler.hint_reachability is None:
+        spoiler.hint_reachability = HintReachability(spoiler.worlds)
+    search = spoiler.hint_reachability.search()
     for stone in gossipLocations.values():
         stone.reachable = (
             search.spot_access(world.get_location(stone.location))
@@ -48,6 +48,8 @@ class Location:
         self.never: bool = False
         self.filter_tags: Optional[tuple[str, ...]] = (filter_tags,) if isinstance(filter_tags, str) else filter_tags
         self.rule_string: Optional[str] = None
+        # Per-world index assigned by World.add_location, used by Search to track visited locations.
+        self.index: Optional[int] = None
 
     def copy(self) -> Location:
         new_location = Location(name=self.name, address=self.address, address2=self.address2, default=self.default,
@@ -64,6 +66,7 @@ class Location:
         new_location.disabled = self.disabled
         new_location.always = self.always
         new_location.never = self.never
+        new_location.index = self.index
 
         return new_location
 
@@ -6,10 +6,15 @@ import platform
 import shutil
 from typing import Optional
 
-from Rom import Rom
+from Rom import Rom, changed_runs
 from Utils import default_output_path, is_bundled, local_path, run_process
 from ntype import BigStream
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # Handle 3.0 website patches.
 def apply_ootr_3_web_patch(settings, rom: Rom) -> None:
@@ -39,8 +44,8 @@ def apply_ootr_3_web_patch(settings, rom: Rom) -> None:
         minibsdiff_python = True
 
     if minibsdiff_python:
-        # Use the (slow) python re-implementation of minibsdiff.
-        logger.info("Patching ROM using slow Python implementation of minibsdiff. This might take some time.")
+        # Use the python re-implementation of minibsdiff.
+        logger.info("Patching ROM using Python implementation of minibsdiff.")
         apply_minibsdiff_patch_file(rom, settings.patch_file)
     else:
         # Use the minibsdiff binary.
@@ -121,15 +126,11 @@ def apply_minibsdiff_patch_file(rom: Rom, file: str) -> None:
             diff_bytes: bytearray = patch_data.read_bytes(diff_block_address, ctrl_block[0])
             diff_block_address += ctrl_block[0]
 
-            # Check for differences.
-            for i, diff_byte in enumerate(diff_bytes):
-                if old_pos + i > original_size:
-                    break
-                original_byte = rom.original.read_byte(old_pos + i)
-                current_byte = rom.read_byte(new_pos + i)
-                new_byte = (original_byte + diff_byte) & 0xFF
-                if new_byte != current_byte:
-                    rom.write_byte(new_pos + i, new_byte)
+            # Add the diff bytes to the original bytes, up to the end of the original ROM.
+            if old_pos < 0:
+                raise Exception("Patch file is invalid. Aborting.")
+            diff_size = max(min(len(diff_bytes), original_size - old_pos), 0)
+            write_changed_bytes(rom, new_pos, add_bytes(rom.original.buffer[old_pos:old_pos + diff_size], diff_bytes[:diff_size]))
 
             # Increment positions.
             old_pos += ctrl_block[0]
@@ -144,17 +145,39 @@ def apply_minibsdiff_patch_file(rom: Rom, file: str) -> None:
             extra_bytes = patch_data.read_bytes(extra_block_address, ctrl_block[1])
             extra_block_address += ctrl_block[1]
 
-            # Check for differences.
-            for i, extra_byte in enumerate(extra_bytes):
-                current_byte = rom.read_byte(new_pos + i)
-                if extra_byte != current_byte:
-                    rom.write_byte(new_pos + i, extra_byte)
+            write_changed_bytes(rom, new_pos, extra_bytes)
 
         # Increment positions.
         old_pos += ctrl_block[2]
         new_pos += ctrl_block[1]
 
 
+# Only write the bytes that are different, so only those are marked as changed.
+def write_changed_bytes(rom: Rom, address: int, data: bytes) -> None:
+    for run_start, run_end in changed_runs(data, rom.read_bytes(address, len(data)), 0, len(data)):
+        rom.write_bytes(address + run_start, data[run_start:run_end])
+
+
+# Add the bytes of two byte strings of the same length, wrapping around like unsigned bytes.
+def add_bytes(data: bytes, diff: bytes) -> bytes:
+    if numpy is not None:
+        return add_bytes_numpy(data, diff)
+    return add_bytes_python(data, diff)
+
+
+def add_bytes_numpy(data: bytes, diff: bytes) -> bytes:
+    return (numpy.frombuffer(data, dtype=numpy.uint8) + numpy.frombuffer(diff, dtype=numpy.uint8)).tobytes()
+
+
+# Adds all the bytes at once as one big integer. Leaving out the top bit of every byte keeps
+# the carries from spilling into the next byte, and the top bits are added back without carry.
+def add_bytes_python(data: bytes, diff: bytes) -> bytes:
+    top_bits = int.from_bytes(b'\x80' * len(data), 'big')
+    data_int, diff_int = int.from_bytes(data, 'big'), int.from_bytes(diff, 'big')
+    low_bits_sum = (data_int & ~top_bits) + (diff_int & ~top_bits)
+    return (low_bits_sum ^ ((data_int ^ diff_int) & top_bits)).to_bytes(len(data), 'big')
+
+
 def minibsdiff_read_int64(patch_data: BigStream, position: Optional[int] = None) -> int:
     buffer: bytearray = patch_data.read_bytes(position, 8)
     y: int = 0
@@ -44,15 +44,34 @@
 # As such, if the file moves, the patch will break.
 
 from __future__ import annotations
+import bisect
+import hashlib
 import json
+import marshal
+import os
+import sys
 from struct import pack, unpack
 from typing import Optional, Any
 
-from Rom import Rom
-from Utils import data_path
+from Rom import Rom, ChangedRanges
+from Utils import data_path, local_path
+
+if sys.version_info >= (3, 10):
+    from typing import TypeAlias
+else:
+    TypeAlias = str
 
 SCENE_TABLE: int = 0xB71440
 
+# The ranges a scene patch read, the bytes it wrote, and its dmadata updates.
+ScenePatch: TypeAlias = "tuple[list[tuple[int, int]], list[tuple[int, bytes]], list[tuple[Optional[int], int, int, Optional[int]]]]"
+
+# Parsed mqu.json: see get_json.
+mq_json: Optional[list[dict[str, Any]]] = None
+
+# Compiled MQ scene patches by base ROM file: see get_compiled_scene_patches.
+compiled_scene_patches: dict[str, tuple[str, str, int, int, dict[int, ScenePatch]]] = {}
+
 
 class File:
     def __init__(self, name: str, start: int = 0, end: Optional[int] = None, remap: Optional[int] = None) -> None:
@@ -89,7 +108,7 @@ class File:
         offset = new_start - self.start
         new_end = self.end + offset
 
-        rom.buffer[new_start:new_end] = rom.buffer[self.start:self.end]
+        rom.write_bytes(new_start, rom.read_bytes(self.start, self.end - self.start))
         self.start = new_start
         self.end = new_end
         update_dmadata(rom, self)
@@ -307,7 +326,7 @@ class Scene:
             b_start = self.file.start + (types_move_addr & 0xFFFFFF)
             size = mesh.polytypes * 8
 
-            rom.buffer[b_start:b_start + size] = rom.buffer[a_start:a_start + size]
+            rom.write_bytes(b_start, rom.read_bytes(a_start, size))
             mesh.polytypes_addr = types_move_addr
 
         # patch polytypes
@@ -418,19 +437,142 @@ class Room:
 
 
 def patch_files(rom: Rom, mq_scenes: list[int]) -> None:
-    data = get_json()
-    scenes = [Scene(x) for x in data]
-    for scene in scenes:
-        if scene.id in mq_scenes:
-            if scene.id == 9:
-                patch_ice_cavern_scene_header(rom)
-            scene.write_data(rom)
+    compiled_patches = get_compiled_scene_patches(rom)
+    for scene_data in get_json():
+        if scene_data['Id'] in mq_scenes:
+            if compiled_patches is not None and apply_scene_patch(rom, compiled_patches[scene_data['Id']]):
+                continue
+            write_scene_data(rom, Scene(scene_data))
 
 
+def write_scene_data(rom: Rom, scene: Scene) -> None:
+    if scene.id == 9:
+        patch_ice_cavern_scene_header(rom)
+    scene.write_data(rom)
+
+
+# Scene objects are changed by writing them, so only the parsed json is kept.
 def get_json() -> Any:
-    with open(data_path('mqu.json'), 'r') as stream:
-        data = json.load(stream)
-    return data
+    global mq_json
+    if mq_json is None:
+        with open(data_path('mqu.json'), 'r') as stream:
+            mq_json = json.load(stream)
+    return mq_json
+
+
+# Records what patching an MQ scene does to a copy of the base ROM: the ranges it read before writing
+# to them, the final bytes of every range it wrote, and its dmadata updates in order. dmadata updates
+# are only recorded, as they depend on where earlier patches moved the files.
+class SceneRecorder(Rom):
+    def __init__(self, base: Rom) -> None:
+        super().__init__()
+        self.original = base
+        self.buffer = bytearray(base.buffer)
+        self.reads: list[tuple[int, int]] = []
+        self.dma_updates: list[tuple[Optional[int], int, int, Optional[int]]] = []
+
+    def read_byte(self, address: Optional[int] = None) -> int:
+        self.record_read(self.last_address if address is None else address, 1)
+        return super().read_byte(address)
+
+    def read_bytes(self, address: Optional[int] = None, length: int = 1) -> bytearray:
+        self.record_read(self.last_address if address is None else address, length)
+        return super().read_bytes(address, length)
+
+    def record_read(self, start: int, length: int) -> None:
+        end = start + length
+        self.changed_ranges.merge()
+        ranges = self.changed_ranges.ranges
+        index = max(bisect.bisect_right(ranges, (start, float('inf'))) - 1, 0)
+        while start < end and index < len(ranges) and ranges[index][0] < end:
+            written_start, written_end = ranges[index]
+            if written_start > start:
+                self.reads.append((start, written_start))
+            start = max(start, written_end)
+            index += 1
+        if start < end:
+            self.reads.append((start, end))
+
+    def update_dmadata_record_by_key(self, key: Optional[int], start: int, end: int, from_file: Optional[int] = None) -> None:
+        self.dma_updates.append((key, start, end, from_file))
+
+    def record_scene(self, scene: Scene) -> ScenePatch:
+        write_scene_data(self, scene)
+        reads = []
+        for start, end in sorted(self.reads):
+            if reads and start <= reads[-1][1]:
+                reads[-1] = (reads[-1][0], max(end, reads[-1][1]))
+            else:
+                reads.append((start, end))
+        writes = [(start, bytes(self.buffer[start:end])) for start, end in self.changed_ranges]
+        dma_updates = self.dma_updates
+
+        # Put the base ROM back for the next scene
+        for start, end in self.changed_ranges:
+            self.buffer[start:end] = self.original.buffer[start:end]
+        self.changed_ranges = ChangedRanges()
+        self.reads = []
+        self.dma_updates = []
+        return reads, writes, dma_updates
+
+
+# Identifies the code and data that compiled scene patches come from, so they are compiled again whenever either changes.
+def scene_patch_version() -> str:
+    version = hashlib.sha256()
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in ('MQ.py', 'Rom.py', 'ntype.py'):
+        try:
+            with open(os.path.join(source_dir, filename), 'rb') as f:
+                version.update(f.read())
+        except OSError:
+            pass
+    with open(data_path('mqu.json'), 'rb') as f:
+        version.update(f.read())
+    return version.hexdigest()
+
+
+# Patching a scene only depends on the ROM bytes it reads, so each scene is patched once per base ROM file
+# and scene_patch_version, and kept in memory and on disk next to the decompressed ROM as the bytes it writes.
+def get_compiled_scene_patches(rom: Rom, cache_path: Optional[str] = None) -> Optional[dict[int, ScenePatch]]:
+    if rom.source_file is None or rom.original is rom:
+        return None
+    try:
+        stat = os.stat(rom.source_file)
+    except OSError:
+        return None
+    source = (scene_patch_version(), os.path.abspath(rom.source_file), stat.st_mtime_ns, stat.st_size)
+    cached = compiled_scene_patches.get(source[1], None)
+    if cached is None or cached[:4] != source:
+        if cache_path is None:
+            cache_path = local_path('ZOOTDEC.mq')
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            cached = None
+        if not isinstance(cached, tuple) or cached[:4] != source:
+            recorder = SceneRecorder(rom.original)
+            cached = (*source, {scene_data['Id']: recorder.record_scene(Scene(scene_data)) for scene_data in get_json()})
+            try:
+                with open(cache_path, 'wb') as f:
+                    marshal.dump(cached, f)
+            except OSError:
+                # Read-only installs just patch the scenes again next run.
+                pass
+        compiled_scene_patches[source[1]] = cached
+    return cached[4]
+
+
+# Writes a compiled scene patch, unless an earlier patch changed something it read from the base ROM.
+def apply_scene_patch(rom: Rom, scene_patch: ScenePatch) -> bool:
+    reads, writes, dma_updates = scene_patch
+    if any(rom.changed_ranges.overlaps(start, end) for start, end in reads):
+        return False
+    for address, data in writes:
+        rom.write_bytes(address, data)
+    for key, start, end, from_file in dma_updates:
+        rom.update_dmadata_record_by_key(key, start, end, from_file)
+    return True
 
 
 def convert_actor_data(string: str) -> list[int]:
@@ -445,7 +587,7 @@ def get_segment_address(base: int, offset: int) -> int:
 
 
 def patch_ice_cavern_scene_header(rom: Rom) -> None:
-    rom.buffer[0x2BEB000:0x2BEB038] = rom.buffer[0x2BEB008:0x2BEB040]
+    rom.write_bytes(0x2BEB000, rom.read_bytes(0x2BEB008, 0x38))
     rom.write_int32s(0x2BEB038, [0x0D000000, 0x02000000])
 
 
@@ -487,7 +629,7 @@ def patch_spirit_temple_mq_room_6(rom: Rom, room_addr: int) -> None:
     b_start = room_addr + alt_header_off
     b_end = b_start + header_size
 
-    rom.buffer[b_start:b_end] = rom.buffer[a_start:a_end]
+    rom.write_bytes(b_start, rom.read_bytes(a_start, header_size))
 
     # make the child header skip the first actor,
     # which avoids the spawning of the block while in the hole
@@ -498,7 +640,7 @@ def patch_spirit_temple_mq_room_6(rom: Rom, room_addr: int) -> None:
     rom.write_int32(cmd_addr + 4, actor_list_addr)
 
     # move header
-    rom.buffer[a_start + 8:a_end + 8] = rom.buffer[a_start:a_end]
+    rom.write_bytes(a_start + 8, rom.read_bytes(a_start, header_size))
 
     # write alternate header command
     seg = get_segment_address(3, alt_data_off)
@@ -657,8 +799,8 @@ def insert_space(rom: Rom, file: File, vram_start: int, insert_section: int, ins
         cur += 4
 
     # Move rom bytes
-    rom.buffer[(insert_rom + insert_size):(file.end + insert_size)] = rom.buffer[insert_rom:file.end]
-    rom.buffer[insert_rom:(insert_rom + insert_size)] = [0] * insert_size
+    rom.write_bytes(insert_rom + insert_size, rom.read_bytes(insert_rom, file.end - insert_rom))
+    rom.write_bytes(insert_rom, [0] * insert_size)
     file.end += insert_size
 
 
@@ -2,13 +2,17 @@ from __future__ import annotations
 import copy
 import hashlib
 import logging
+import multiprocessing
 import os
 import platform
 import random
 import shutil
 import time
 import zipfile
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Optional
 
 
 from Cosmetics import CosmeticsLog, patch_cosmetics
@@ -22,7 +26,7 @@ from MBSDIFFPatch import apply_ootr_3_web_patch
 from Models import patch_model_adult, patch_model_child
 from N64Patch import create_patch_file, apply_patch_file
 from Patches import patch_rom
-from Rom import Rom
+from Rom import Rom, ChangedRanges
 from Rules import set_rules, set_shop_rules
 from Settings import Settings
 from SettingsList import logic_tricks
@@ -59,6 +63,120 @@ def main(settings: Settings, max_attempts: int = 10) -> Spoiler:
     return spoiler
 
 
+@dataclass
+class BatchSeedResult:
+    seed: str
+    success: bool = False
+    attempts: int = 0
+    wall_time: float = 0.0
+    error: str = ''
+
+
+# Where a batch worker reports each seed it starts, so main_batch knows which seeds a dead worker was running.
+batch_started: Optional[multiprocessing.SimpleQueue] = None
+
+
+def init_batch_worker(loglevel: int, started: multiprocessing.SimpleQueue) -> None:
+    global batch_started
+    batch_started = started
+    logging.basicConfig(format='%(message)s', level=loglevel)
+    logging.getLogger('').setLevel(loglevel)
+
+
+# Runs in a batch worker process. Settings are rebuilt from their dict, since a Settings
+# object (its distribution in particular) can't be pickled. Each seed starts from the
+# original settings, so its result doesn't depend on which seeds ran before it.
+def generate_batch_seed(settings_dict: dict[str, Any], custom_seed: bool, seed: str) -> BatchSeedResult:
+    if batch_started is not None:
+        batch_started.put(seed)
+    result = BatchSeedResult(seed)
+    start = time.perf_counter()
+    try:
+        settings = Settings(copy.deepcopy(settings_dict))
+        settings.update_seed(seed)
+        settings.custom_seed = custom_seed
+        main(settings)
+        result.success = True
+    except Exception as e:
+        logging.getLogger('').exception('Seed %s failed.', seed)
+        result.error = f'{type(e).__name__}: {e}'
+    result.wall_time = time.perf_counter() - start
+    return result
+
+
+# Generates settings.count seeds named <seed>-<i> across a pool of worker processes.
+# Seeds that fail are queued again up to max_retries times while the rest of the batch keeps going.
+# A seed generates the same way every time, so this only helps with failures from outside the
+# generator, like a worker process being killed. When a worker dies the pool can't be used anymore,
+# so the seeds it was running count as failed, and every unfinished seed moves to a new pool.
+def main_batch(settings: Settings, workers: int = 0, max_retries: int = 1) -> list[BatchSeedResult]:
+    logger = logging.getLogger('')
+    seeds = [f'{settings.seed}-{i}' for i in range(settings.count)]
+    results = {seed: BatchSeedResult(seed) for seed in seeds}
+    workers = min(workers or os.cpu_count() or 1, len(seeds))
+    logger.info('Generating %d seeds with %d workers.', len(seeds), workers)
+    # starting_items is a defaultdict with a local default factory, which can't be pickled.
+    settings_dict = {**settings.settings_dict, 'starting_items': dict(settings.starting_items)}
+    started = multiprocessing.SimpleQueue()
+
+    def finish(result: BatchSeedResult) -> bool:
+        seed_result = results[result.seed]
+        seed_result.attempts += 1
+        seed_result.success = result.success
+        seed_result.wall_time += result.wall_time
+        seed_result.error = result.error
+        if not result.success and seed_result.attempts <= max_retries:
+            logger.warning('Seed %s failed (%s), retrying.', result.seed, result.error)
+            return True
+        return False
+
+    queued = seeds
+    while queued:
+        broken = []
+        running = set()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker, initargs=(logger.getEffectiveLevel(), started)) as executor:
+            pending = {}
+
+            def submit(seed: str) -> None:
+                try:
+                    pending[executor.submit(generate_batch_seed, settings_dict, settings.custom_seed, seed)] = seed
+                except BrokenProcessPool:
+                    broken.append(seed)
+
+            for seed in queued:
+                submit(seed)
+            while pending:
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                while not started.empty():
+                    running.add(started.get())
+                for future in done:
+                    seed = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        broken.append(seed)
+                        continue
+                    running.discard(seed)
+                    if finish(result):
+                        submit(seed)
+            while not started.empty():
+                running.add(started.get())
+
+        queued = []
+        for seed in broken:
+            # If no seed got to start, the pool broke before running anything, so every seed
+            # is charged an attempt to make sure this ends.
+            charged = seed in running or not running.intersection(broken)
+            if not charged or finish(BatchSeedResult(seed, error='Worker process died.')):
+                queued.append(seed)
+
+    logger.info('Batch summary:')
+    for result in results.values():
+        logger.info('  %s: %s after %d attempt(s) in %.1fs%s', result.seed, 'success' if result.success else 'FAILED',
+                    result.attempts, result.wall_time, f' ({result.error})' if result.error else '')
+    return list(results.values())
+
+
 def resolve_settings(settings: Settings) -> Optional[Rom]:
     logger = logging.getLogger('')
 
@@ -287,6 +405,84 @@ def generate_wad(wad_file: str, rom_file: str, output_file: str, channel_title:
         os.remove(rom_file)
 
 
+@dataclass
+class PatchFileContext:
+    settings: Settings
+    spoiler: Spoiler
+    rom: Rom
+    rng_state: tuple
+    output_dir: str
+    output_filename_base: str
+    separate_cosmetics: bool
+
+
+# Writes the patch file, and its cosmetics log if there is one, for a world already patched into the ROM.
+# Returns the names of the written files, in the order they go into the patch archive.
+def write_patch_file(context: PatchFileContext, world: World, patch_cosmetics_log: Optional[CosmeticsLog], xor_seed: int) -> list[str]:
+    logger = logging.getLogger('')
+    settings = context.settings
+    file_list = []
+    player_filename_suffix = f"P{world.id + 1}" if settings.world_count > 1 else ""
+
+    patch_filename = f"{context.output_filename_base}{player_filename_suffix}.zpf"
+    logger.info(f"Creating Patch File: {patch_filename}")
+    output_path = os.path.join(context.output_dir, patch_filename)
+    file_list.append(patch_filename)
+    create_patch_file(context.rom, output_path, xor_seed=xor_seed)
+
+    # Cosmetics Log for patch file only.
+    if settings.create_cosmetics_log and patch_cosmetics_log:
+        if context.separate_cosmetics:
+            cosmetics_log_filename = f"{context.output_filename_base}{player_filename_suffix}.zpf_Cosmetics.json"
+        else:
+            cosmetics_log_filename = f"{context.output_filename_base}{player_filename_suffix}_Cosmetics.json"
+        logger.info(f"Creating Cosmetics Log: {cosmetics_log_filename}")
+        patch_cosmetics_log.to_file(os.path.join(context.output_dir, cosmetics_log_filename))
+        file_list.append(cosmetics_log_filename)
+    return file_list
+
+
+# Set in the parent right before the patch workers are forked. Worlds hold their access rules as
+# lambdas and can't be pickled, so the workers get the patching context by inheriting it instead.
+patch_file_context: Optional[PatchFileContext] = None
+
+
+# Whether this patch worker already patched a world into its ROM.
+patch_worker_used: bool = False
+
+
+# Runs in a forked patch worker, which starts from the parent's unpatched ROM. Workers patch
+# more than one world when there are more worlds than workers, so later worlds restore the ROM first.
+def create_world_patch_file(world_id: int, xor_seed: int) -> list[str]:
+    global patch_worker_used
+    context = patch_file_context
+    world = context.spoiler.worlds[world_id]
+    logging.getLogger('').info(f"Patching ROM: Player {world.id + 1}")
+    context.settings.generating_patch_file = True
+    patch_cosmetics_log = prepare_rom(context.spoiler, world, context.rom, context.settings, context.rng_state, patch_worker_used)
+    patch_worker_used = True
+    return write_patch_file(context, world, patch_cosmetics_log, xor_seed)
+
+
+# Patches every world and writes its patch file in a pool of forked processes.
+# The file list is returned in world order, the same as creating the files one world at a time.
+def create_patch_files_parallel(context: PatchFileContext, xor_seeds: list[int], workers: int) -> list[str]:
+    global patch_file_context
+    worlds = context.spoiler.worlds
+    workers = min(workers, len(worlds))
+    logging.getLogger('').info('Creating %d patch files with %d workers.', len(worlds), workers)
+    patch_file_context = context
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [executor.submit(create_world_patch_file, world.id, xor_seeds[world.id]) for world in worlds]
+            file_list = []
+            for future in futures:
+                file_list += future.result()
+    finally:
+        patch_file_context = None
+    return file_list
+
+
 def patch_and_output(settings: Settings, spoiler: Spoiler, rom: Optional[Rom]) -> None:
     logger = logging.getLogger('')
     worlds = spoiler.worlds
@@ -311,38 +507,30 @@ def patch_and_output(settings: Settings, spoiler: Spoiler, rom: Optional[Rom]) -
         rng_state = random.getstate()
         file_list = []
         restore_rom = False
+        patch_context = PatchFileContext(settings, spoiler, rom, rng_state, output_dir, output_filename_base, separate_cosmetics)
+        # Picked up front so every patch file is the same whether it's created here or in a worker process.
+        xor_rng = random.Random()
+        xor_seeds = [xor_rng.getrandbits(64) for _ in worlds]
+        patch_workers = settings.patch_workers or os.cpu_count() or 1
+        parallel_patch_files = (settings.create_patch_file and settings.world_count > 1 and patch_workers > 1
+                                and 'fork' in multiprocessing.get_all_start_methods())
+        if parallel_patch_files:
+            file_list = create_patch_files_parallel(patch_context, xor_seeds, patch_workers)
         for world in worlds:
             # If we aren't creating a patch file and this world isn't the one being outputted, move to the next world.
             if not (settings.create_patch_file or world.id == settings.player_num - 1):
                 continue
 
-            if settings.world_count > 1:
-                logger.info(f"Patching ROM: Player {world.id + 1}")
-                player_filename_suffix = f"P{world.id + 1}"
-            else:
-                logger.info('Patching ROM')
-                player_filename_suffix = ""
-
-            settings.generating_patch_file = settings.create_patch_file
-            patch_cosmetics_log = prepare_rom(spoiler, world, rom, settings, rng_state, restore_rom)
-            restore_rom = True
-
-            if settings.create_patch_file:
-                patch_filename = f"{output_filename_base}{player_filename_suffix}.zpf"
-                logger.info(f"Creating Patch File: {patch_filename}")
-                output_path = os.path.join(output_dir, patch_filename)
-                file_list.append(patch_filename)
-                create_patch_file(rom, output_path)
-
-                # Cosmetics Log for patch file only.
-                if settings.create_cosmetics_log and patch_cosmetics_log:
-                    if separate_cosmetics:
-                        cosmetics_log_filename = f"{output_filename_base}{player_filename_suffix}.zpf_Cosmetics.json"
-                    else:
-                        cosmetics_log_filename = f"{output_filename_base}{player_filename_suffix}_Cosmetics.json"
-                    logger.info(f"Creating Cosmetics Log: {cosmetics_log_filename}")
-                    patch_cosmetics_log.to_file(os.path.join(output_dir, cosmetics_log_filename))
-                    file_list.append(cosmetics_log_filename)
+            player_filename_suffix = f"P{world.id + 1}" if settings.world_count > 1 else ""
+
+            if not parallel_patch_files:
+                logger.info(f"Patching ROM: Player {world.id + 1}" if settings.world_count > 1 else 'Patching ROM')
+                settings.generating_patch_file = settings.create_patch_file
+                patch_cosmetics_log = prepare_rom(spoiler, world, rom, settings, rng_state, restore_rom)
+                restore_rom = True
+
+                if settings.create_patch_file:
+                    file_list += write_patch_file(patch_context, world, patch_cosmetics_log, xor_seeds[world.id])
 
             # If we aren't outputting an uncompressed ROM, move to the next world.
             if not uncompressed_rom or world.id != settings.player_num - 1:
@@ -541,7 +729,7 @@ def cosmetic_patch(settings: Settings) -> None:
 
     # clear changes from the base patch file
     patched_base_rom = copy.copy(rom.buffer)
-    rom.changed_address = {}
+    rom.changed_ranges = ChangedRanges()
     rom.changed_dma = {}
     rom.force_patch = []
 
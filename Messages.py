@@ -1,6 +1,8 @@
 # text details: https://wiki.cloudmodding.com/oot/Text_Format
 
 from __future__ import annotations
+import copy
+import os
 import random
 from collections.abc import Callable, Iterable
 from typing import TYPE_CHECKING, Optional, Any
@@ -680,17 +682,12 @@ class TextCode:
             size += CONTROL_CODES[self.code][1]
         return size
 
-    # writes the code to the given offset, and returns the offset of the next byte
-    def write(self, rom: Rom, text_start: int, offset: int) -> int:
-        rom.write_byte(text_start + offset, self.code)
+    # appends the code to the given text data
+    def write(self, text: bytearray) -> None:
+        text.append(self.code)
 
-        extra_bytes = 0
         if self.code in CONTROL_CODES:
-            extra_bytes = CONTROL_CODES[self.code][1]
-            bytes_to_write = int_to_bytes(self.data, extra_bytes)
-            rom.write_bytes(text_start + offset + 1, bytes_to_write)
-
-        return offset + 1 + extra_bytes
+            text += int_to_bytes(self.data, CONTROL_CODES[self.code][1])
 
     __str__ = __repr__ = display
 
@@ -856,24 +853,17 @@ class Message:
 
         self.text_codes = text_codes
 
-    # writes a Message back into the rom, using the given index and offset to update the table
-    # returns the offset of the next message
-    def write(self, rom: Rom, index: int, text_start: int, offset: int, bank: int) -> int:
+    # appends a Message to the text data of the given bank, and its entry to the table
+    def write(self, table: bytearray, text: bytearray, bank: int) -> None:
         # construct the table entry
         id_bytes = int_to_bytes(self.id, 2)
-        offset_bytes = int_to_bytes(offset, 3)
-        entry = id_bytes + bytes([self.opts, 0x00, bank]) + offset_bytes
-        # write it back
-        entry_offset = EXTENDED_TABLE_START + 8 * index
-        rom.write_bytes(entry_offset, entry)
+        offset_bytes = int_to_bytes(len(text), 3)
+        table += id_bytes + bytes([self.opts, 0x00, bank]) + offset_bytes
 
         for code in self.text_codes:
-            offset = code.write(rom, text_start, offset)
-
-        while offset % 4 > 0:
-            offset = TextCode(0x00, 0).write(rom, text_start, offset) # pad to 4 byte align
+            code.write(text)
 
-        return offset
+        text += bytes(-len(text) % 4) # pad to 4 byte align
 
     # read a single message from rom
     @classmethod
@@ -1155,8 +1145,37 @@ def add_item_messages(messages: list[Message], shop_items: Iterable[ShopItem], w
     update_item_messages(messages, world)
 
 
-# reads each of the game's messages into a list of Message objects
+# Regions of the ROM the game's messages are read from
+MESSAGE_RANGES: list[tuple[int, int]] = [
+    (JPN_TABLE_START, CREDITS_TABLE_START),
+    (JPN_TEXT_START, JPN_TEXT_START + JPN_TEXT_SIZE_LIMIT),
+    (ENG_TEXT_START, ENG_TEXT_START + ENG_TEXT_SIZE_LIMIT),
+]
+
+# Messages of the base ROM by path: modification time and size of the file, followed by the parsed messages
+base_messages: dict[str, tuple[int, int, list[Message]]] = {}
+
+
+# The messages of the base ROM are only parsed once per base ROM file, and copied for every world,
+# unless the text tables were written to since the ROM was restored.
 def read_messages(rom: Rom) -> list[Message]:
+    if rom.source_file is None or rom.original is rom or any(rom.changed_ranges.overlaps(start, end) for start, end in MESSAGE_RANGES):
+        return parse_messages(rom)
+    try:
+        stat = os.stat(rom.source_file)
+    except OSError:
+        return parse_messages(rom)
+    source = (stat.st_mtime_ns, stat.st_size)
+    cached = base_messages.get(os.path.abspath(rom.source_file), None)
+    if cached is None or cached[:2] != source:
+        cached = (*source, parse_messages(rom.original))
+        base_messages[os.path.abspath(rom.source_file)] = cached
+    # Messages are changed by assigning their attributes, never in place, so shallow copies are enough
+    return [copy.copy(message) for message in cached[2]]
+
+
+# reads each of the game's messages into a list of Message objects
+def parse_messages(rom: Rom) -> list[Message]:
     table_offset = ENG_TABLE_START
     index = 0
     messages = []
@@ -1210,17 +1229,15 @@ def repack_messages(rom: Rom, messages: list[Message], permutation: Optional[lis
     if permutation is None:
         permutation = range(len(messages))
 
-    # repack messages
+    # repack messages into the table and text data, written to the rom at the end
+    table = bytearray()
+    text = bytearray()
+    jp_text = bytearray()
     offset = 0
     text_start = JPN_TEXT_START
     text_size_limit = EXTENDED_TEXT_SIZE_LIMIT
     text_bank = 0x08 # start with the Japanese text bank
     jp_bytes = 0
-    # An extra dummy message is inserted after exhausting the JP text file.
-    # Written message IDs are independent of the python list index, but the
-    # index has to be maintained for old/new lookups. This wouldn't be an
-    # issue if text shuffle didn't exist.
-    jp_index_offset = 0
 
     for old_index, new_index in enumerate(permutation):
         old_message = messages[old_index]
@@ -1242,14 +1259,13 @@ def repack_messages(rom: Rom, messages: list[Message], permutation: Optional[lis
             # 0xFFFD is used as the text ID for this in vanilla.
             # Text IDs need to be in order across the table for the
             # split to work.
-            entry = bytes([0xFF, 0xFD, 0x00, 0x00, text_bank]) + int_to_bytes(offset, 3)
-            entry_offset = EXTENDED_TABLE_START + 8 * old_index
-            rom.write_bytes(entry_offset, entry)
+            table += bytes([0xFF, 0xFD, 0x00, 0x00, text_bank]) + int_to_bytes(offset, 3)
             # if there is no room then switch to the English text bank
             text_bank = 0x07
             text_start = ENG_TEXT_START
             jp_bytes = offset
-            jp_index_offset = 1
+            jp_text = text
+            text = bytearray()
             offset = 0
 
         # Special handling for text ID 0xFFFC, which has hard-coded offsets to
@@ -1268,7 +1284,8 @@ def repack_messages(rom: Rom, messages: list[Message], permutation: Optional[lis
             rom.write_int16(0xAD1D2E, text_start & 0XFFFF)
 
         # actually write the message
-        offset = new_message.write(rom, old_index + jp_index_offset, text_start, offset, text_bank)
+        new_message.write(table, text, text_bank)
+        offset = len(text)
 
         new_message.id = remember_id
 
@@ -1279,14 +1296,17 @@ def repack_messages(rom: Rom, messages: list[Message], permutation: Optional[lis
 
     # end the table, accounting for additional entry for file split
     table_index = len(messages) + (1 if text_bank == 0x07 else 0)
-    entry = bytes([0xFF, 0xFD, 0x00, 0x00, text_bank]) + int_to_bytes(offset, 3)
-    entry_offset = EXTENDED_TABLE_START + 8 * table_index
-    rom.write_bytes(entry_offset, entry)
+    table += bytes([0xFF, 0xFD, 0x00, 0x00, text_bank]) + int_to_bytes(offset, 3)
     table_index += 1
-    entry_offset = EXTENDED_TABLE_START + 8 * table_index
     if 8 * (table_index + 1) > EXTENDED_TABLE_SIZE:
         raise(TypeError("Message ID table is too large: 0x" + "{:x}".format(8 * (table_index + 1)) + " written / 0x" + "{:x}".format(EXTENDED_TABLE_SIZE) + " allowed."))
-    rom.write_bytes(entry_offset, [0xFF, 0xFF, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+    table += bytes([0xFF, 0xFF, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+
+    # write the table and both text files at once
+    rom.write_bytes(EXTENDED_TABLE_START, table)
+    if text_bank == 0x07:
+        rom.write_bytes(JPN_TEXT_START, jp_text)
+    rom.write_bytes(text_start, text)
 
 
 # shuffles the messages in the game, making sure to keep various message types in their own group
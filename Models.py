@@ -98,8 +98,35 @@ def scan(bytes: bytearray, data: bytearray | str, start: int = 0) -> int:
     # If a string was passed, encode string as bytes
     if isinstance(data, str):
         databytes = data.encode()
+    databyteset = set(databytes)
+    # Only whole occurrences of the data can match, so let find() skip everything else.
+    candidate = bytes.find(databytes, start)
+    while candidate != -1:
+        # The matcher below doesn't recheck the byte that broke a partial match and skips some candidates because of
+        # the special cases, so replay it from the closest byte that isn't in the data, where it has to be reset.
+        resume = candidate
+        while resume > start and bytes[resume - 1] in databyteset:
+            resume -= 1
+        i = scan_match(bytes, data, databytes, resume, candidate + len(databytes))
+        if i != -1:
+            # If start is 0 then looking for the footer, return the index
+            if start == 0:
+                return i + 1
+            # Else, we want to know the offset, which will be after the footer and 1 padding byte
+            else:
+                i += 2
+                offsetbytes = []
+                for j in range(4):
+                    offsetbytes.append(bytes[i + j])
+                return int.from_bytes(offsetbytes, 'big')
+        candidate = bytes.find(databytes, candidate + 1)
+    return -1
+
+
+# Matches the data byte by byte in bytes[begin:end], returning the index of the last byte of the first match or -1
+def scan_match(bytes: bytearray, data: bytearray | str, databytes: bytes | bytearray, begin: int, end: int) -> int:
     dataindex = 0
-    for i in range(start, len(bytes)):
+    for i in range(begin, end):
         # Byte matches next byte in string
         if bytes[i] == databytes[dataindex]:
             dataindex += 1
@@ -164,16 +191,7 @@ def scan(bytes: bytearray, data: bytearray | str, start: int = 0) -> int:
                     dataindex = 0
             # All bytes have been found, so a match
             if dataindex == len(databytes):
-                # If start is 0 then looking for the footer, return the index
-                if start == 0:
-                    return i + 1
-                # Else, we want to know the offset, which will be after the footer and 1 padding byte
-                else:
-                    i += 2
-                    offsetbytes = []
-                    for j in range(4):
-                        offsetbytes.append(bytes[i + j])
-                    return int.from_bytes(offsetbytes, 'big')
+                return i
         # Match has been broken, reset to start of string
         else:
             dataindex = 0
@@ -205,9 +223,7 @@ def WriteDLPointer(dl: list[int], index: int, data: int) -> None:
 def LoadVanilla(rom: Rom, missing: list[str], rebase: int, linkstart: int, linksize: int,
                 pieces: dict[str, tuple[Offsets, int]], skips: dict[str, list[tuple[int, int]]]) -> tuple[list[int], dict[str, int]]:
     # Get vanilla "zobj" of Link's model
-    vanillaData = []
-    for i in range(linksize):
-        vanillaData.append(rom.buffer[linkstart + i])
+    vanillaData = list(rom.buffer[linkstart:linkstart + linksize])
     segment = 0x06
     vertices = {}
     matrices = {}
@@ -541,10 +557,7 @@ def LoadModel(rom: Rom, model: str, age: int) -> int:
             # Load vanilla model data for missing pieces
             (vanillaZobj, DLOffsets) = LoadVanilla(rom, missing, startaddr, linkstart, linksize, pieces, skips)
             # Write vanilla zobj data to end of model zobj
-            i = 0
-            for byte in vanillaZobj:
-                zobj.insert(startaddr + i, byte)
-                i += 1
+            zobj[startaddr:startaddr] = bytes(vanillaZobj)
             if len(zobj) > linksize:
                 raise ModelDefinitionError("After processing, model for " + agestr + " too large- It is "
                 + str(len(zobj)) + " bytes, but must be at most " + str(linksize) + " bytes.")
@@ -573,17 +586,11 @@ def LoadModel(rom: Rom, model: str, age: int) -> int:
         file = open(os.path.join(path, 'Constants/preconstants.zobj'), "rb")
         constants = file.read()
         file.close()
-        i = 0
-        for byte in constants:
-            zobj[PRE_CONSTANT_START + i] = byte
-            i += 1
+        zobj[PRE_CONSTANT_START:PRE_CONSTANT_START + len(constants)] = constants
         file = open(os.path.join(path, 'Constants/postconstants.zobj'), "rb")
         constants = file.read()
         file.close()
-        i = 0
-        for byte in constants:
-            zobj[postconstantstart + i] = byte
-            i += 1
+        zobj[postconstantstart:postconstantstart + len(constants)] = constants
         # Set up hierarchy pointer
         hierarchyOffset = FindHierarchy(zobj, agestr)
         hierarchyBytes = zobj[hierarchyOffset:hierarchyOffset+4] # Get the data the offset points to
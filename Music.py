@@ -2,6 +2,7 @@
 from __future__ import annotations
 import io
 import itertools
+import marshal
 import os
 import random
 import zipfile
@@ -122,7 +123,7 @@ class Bank:
     def __init__(self, index: int, meta: bytearray, data: bytes) -> None:
         self.index: int = index
         self.meta: bytearray = meta
-        self.data: bytes = data
+        self.data: bytes | bytearray = data
         self.zsounds: dict[int, dict[str, Any]] = {}
 
     def add_zsound(self, tempaddr: int, zsound: dict[str, Any]) -> None:
@@ -134,9 +135,17 @@ class Bank:
         bank_entry += self.meta
         return bank_entry
 
+    # Patches the temporary zsound addresses where they are found in one copy of the bank
     def update_zsound_pointers(self) -> None:
+        data = bytearray(self.data)
         for zsound_tempaddr in self.zsounds.keys():
-            self.data = self.data.replace(zsound_tempaddr.to_bytes(4, byteorder='big'), self.zsounds[zsound_tempaddr]['offset'].to_bytes(4, byteorder='big'))
+            tempaddr = zsound_tempaddr.to_bytes(4, byteorder='big')
+            offset = self.zsounds[zsound_tempaddr]['offset'].to_bytes(4, byteorder='big')
+            index = data.find(tempaddr)
+            while index != -1:
+                data[index:index + 4] = offset
+                index = data.find(tempaddr, index + 4)
+        self.data = data
 
 
 # Represents the information associated with a sequence, aside from the sequence data itself
@@ -176,7 +185,94 @@ class SequenceData:
     def __init__(self) -> None:
         self.address: int = -1
         self.size: int = -1
-        self.data: bytearray = bytearray()
+        self.data: bytearray | memoryview = bytearray()
+
+
+# Contents of the custom music .ootrs files by path: modification time and size of the file, the names of its
+# .meta, .seq, .zbank and .bankmeta files and the stripped lines of the .meta file (None if it couldn't be read).
+MUSIC_INDEX_VERSION: int = 1
+music_index: dict[str, tuple[int, int, Optional[str], Optional[str], Optional[str], Optional[str], Optional[list[str]]]] = {}
+music_index_changed: bool = False
+
+
+def music_index_path() -> str:
+    return os.path.join(data_path(), 'Music', '__pycache__', 'ootrs.marshal')
+
+
+def load_music_index() -> None:
+    global music_index
+    if music_index:
+        return
+    try:
+        with open(music_index_path(), 'rb') as f:
+            cached = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        cached = None
+    if isinstance(cached, tuple) and len(cached) == 2 and cached[0] == MUSIC_INDEX_VERSION:
+        music_index = cached[1]
+
+
+def save_music_index(filepaths: set[str]) -> None:
+    global music_index_changed
+    # Forget the files that are gone since the last scan
+    for filepath in [filepath for filepath in music_index if filepath not in filepaths]:
+        del music_index[filepath]
+        music_index_changed = True
+    if not music_index_changed:
+        return
+    try:
+        os.makedirs(os.path.dirname(music_index_path()), exist_ok=True)
+        with open(music_index_path(), 'wb') as f:
+            marshal.dump((MUSIC_INDEX_VERSION, music_index), f)
+        music_index_changed = False
+    except OSError:
+        # Read-only installs just open the changed files again next run.
+        pass
+
+
+# .ootrs files are only opened when they were added or changed since they were last indexed,
+# in memory or in a __pycache__ directory in data/Music.
+def read_music_file(filepath: str) -> tuple[Optional[str], Optional[str], Optional[str], Optional[str], Optional[list[str]]]:
+    global music_index_changed
+    stat = os.stat(filepath)
+    source = (stat.st_mtime_ns, stat.st_size)
+    cached = music_index.get(filepath, None)
+    if cached is not None and cached[:2] == source:
+        return cached[2:]
+
+    with zipfile.ZipFile(filepath) as zip:
+        meta_file = None
+        seq_file = None
+        zbank_file = None
+        bankmeta_file = None
+        for f in zip.namelist():
+            if f.endswith(".meta"):
+                meta_file = f
+                continue
+            if f.endswith(".seq"):
+                seq_file = f
+                continue
+            if f.endswith(".zbank"):
+                zbank_file = f
+                continue
+            if f.endswith(".bankmeta"):
+                bankmeta_file = f
+                continue
+
+        # Read meta info
+        lines = None
+        if meta_file:
+            try:
+                with zip.open(meta_file, 'r') as stream:
+                    lines = io.TextIOWrapper(stream).readlines() # Use TextIOWrapper in order to get text instead of binary from the seq.
+                # Strip newline(s)
+                lines = [line.rstrip() for line in lines]
+            except Exception:
+                lines = None
+
+    music_index[filepath] = (*source, meta_file, seq_file, zbank_file, bankmeta_file, lines)
+    music_index_changed = True
+    return meta_file, seq_file, zbank_file, bankmeta_file, lines
 
 
 def process_sequences(rom: Rom, ids: Iterable[tuple[str, int]], seq_type: str = 'bgm', disabled_source_sequences: Optional[list[str]] = None,
@@ -227,6 +323,8 @@ def process_sequences(rom: Rom, ids: Iterable[tuple[str, int]], seq_type: str =
     #   .meta metadata file
     # And optionally .zbank, .bankmeta, and .zsound files
 
+    load_music_index()
+    filepaths = set()
     for dirpath, _, filenames in os.walk(os.path.join(data_path(), 'Music'), followlinks=True):
         for fname in filenames:
             # Skip if included in exclusion file
@@ -235,88 +333,61 @@ def process_sequences(rom: Rom, ids: Iterable[tuple[str, int]], seq_type: str =
 
             # Find .ootrs zip files
             if fname.endswith('.ootrs'):
-                skip = False
-                # Open zip file
                 filepath = os.path.join(dirpath, fname)
-                with zipfile.ZipFile(filepath) as zip:
-                    # Make sure meta file and seq file exists
-                    meta_file = None
-                    seq_file = None
-                    zbank_file = None
-                    bankmeta_file = None
-                    for f in zip.namelist():
-                        if f.endswith(".meta"):
-                            meta_file = f
-                            continue
-                        if f.endswith(".seq"):
-                            seq_file = f
-                            continue
-                        if f.endswith(".zbank"):
-                            if not include_custom_audiobanks: # Check if we are excluding sequences with custom banks
-                                skip = True
-                                break
-                            zbank_file = f
-                            continue
-                        if f.endswith(".bankmeta"):
-                            bankmeta_file = f
-                            continue
-
-                    if skip:
-                        continue
-
-                    if not meta_file:
-                        raise FileNotFoundError(f'No .meta file in: "{fname}". This should never happen')
-                    if not seq_file:
-                        raise FileNotFoundError(f'No .seq file in: "{fname}". This should never happen')
-                    if zbank_file and not bankmeta_file:
-                        raise FileNotFoundError(f'Custom track "{fname}" contains .zbank but no .bankmeta')
-
-                    # Read meta info
-                    try:
-                        with zip.open(meta_file, 'r') as stream:
-                            lines = io.TextIOWrapper(stream).readlines() # Use TextIOWrapper in order to get text instead of binary from the seq.
-                        # Strip newline(s)
-                        lines = [line.rstrip() for line in lines]
-                    except Exception as ex:
-                        raise FileNotFoundError(f'Error reading meta file for: "{fname}". This should never happen')
-
-                    # Create new sequence, checking third line for correct type
-                    if (len(lines) > 2 and (lines[2].lower() == seq_type.lower() or lines[2] == '')) or (len(lines) <= 2 and seq_type == 'bgm'):
-                        seq = Sequence(filepath, lines[0], seq_file = seq_file, instrument_set = lines[1])
-                        if zbank_file:
-                            seq.zbank_file = zbank_file
-                            seq.bankmeta = bankmeta_file
-                        seq.zsounds = []
-                        if seq.instrument_set < 0x00 or seq.instrument_set > 0x25:
-                            raise Exception(f'{seq.name}: Sequence instrument must be in range [0x00, 0x25]')
-                        if seq.cosmetic_name == "None":
-                            raise Exception(f'{seq.name}: Sequences should not be named "None" as that is used for disabled music.')
-                        if seq.cosmetic_name in sequences:
-                            raise Exception(f'{seq.name} Sequence names should be unique. Duplicate sequence name: {seq.cosmetic_name}')
-
-                        if seq.cosmetic_name not in disabled_source_sequences:
-                            sequences[seq.cosmetic_name] = seq
-
-                        if len(lines) >= 4:
-                            seq_groups = lines[3].split(',')
-                            for group in seq_groups:
-                                group = group.strip()
-                                if group not in groups:
-                                    groups[group] = []
-                                groups[group].append(seq.cosmetic_name)
-
-                        # Process ZSOUND lines. Make these lines in the format of ZSOUND:file_path:temp_addr
-                        for line in lines:
-                            tokens = line.split(":")
-                            if tokens[0] == "ZSOUND":
-                                zsound_file = tokens[1]
-                                zsound_tempaddr = tokens[2]
-                                zsound = {
-                                    "file": tokens[1],
-                                    "tempaddr": tokens[2]
-                                }
-                                seq.zsounds.append(zsound)
-
+                filepaths.add(filepath)
+                meta_file, seq_file, zbank_file, bankmeta_file, lines = read_music_file(filepath)
+                # Check if we are excluding sequences with custom banks
+                if zbank_file and not include_custom_audiobanks:
+                    continue
+
+                # Make sure meta file and seq file exists
+                if not meta_file:
+                    raise FileNotFoundError(f'No .meta file in: "{fname}". This should never happen')
+                if not seq_file:
+                    raise FileNotFoundError(f'No .seq file in: "{fname}". This should never happen')
+                if zbank_file and not bankmeta_file:
+                    raise FileNotFoundError(f'Custom track "{fname}" contains .zbank but no .bankmeta')
+                if lines is None:
+                    raise FileNotFoundError(f'Error reading meta file for: "{fname}". This should never happen')
+
+                # Create new sequence, checking third line for correct type
+                if (len(lines) > 2 and (lines[2].lower() == seq_type.lower() or lines[2] == '')) or (len(lines) <= 2 and seq_type == 'bgm'):
+                    seq = Sequence(filepath, lines[0], seq_file = seq_file, instrument_set = lines[1])
+                    if zbank_file:
+                        seq.zbank_file = zbank_file
+                        seq.bankmeta = bankmeta_file
+                    seq.zsounds = []
+                    if seq.instrument_set < 0x00 or seq.instrument_set > 0x25:
+                        raise Exception(f'{seq.name}: Sequence instrument must be in range [0x00, 0x25]')
+                    if seq.cosmetic_name == "None":
+                        raise Exception(f'{seq.name}: Sequences should not be named "None" as that is used for disabled music.')
+                    if seq.cosmetic_name in sequences:
+                        raise Exception(f'{seq.name} Sequence names should be unique. Duplicate sequence name: {seq.cosmetic_name}')
+
+                    if seq.cosmetic_name not in disabled_source_sequences:
+                        sequences[seq.cosmetic_name] = seq
+
+                    if len(lines) >= 4:
+                        seq_groups = lines[3].split(',')
+                        for group in seq_groups:
+                            group = group.strip()
+                            if group not in groups:
+                                groups[group] = []
+                            groups[group].append(seq.cosmetic_name)
+
+                    # Process ZSOUND lines. Make these lines in the format of ZSOUND:file_path:temp_addr
+                    for line in lines:
+                        tokens = line.split(":")
+                        if tokens[0] == "ZSOUND":
+                            zsound_file = tokens[1]
+                            zsound_tempaddr = tokens[2]
+                            zsound = {
+                                "file": tokens[1],
+                                "tempaddr": tokens[2]
+                            }
+                            seq.zsounds.append(zsound)
+
+    save_music_index(filepaths)
     return sequences, target_sequences, groups
 
 
@@ -369,6 +440,8 @@ def rebuild_sequences(rom: Rom, sequences: list[Sequence], log: CosmeticsLog, sy
     creditlist = [sequence_id for title, sequence_id in credit_sequence_ids]
     fileselectlist = [sequence_id for title, sequence_id in fileselect_sequence_id]
 
+    # Copy the audio sequence file once, the vanilla sequences are slices of it
+    audioseq_data = memoryview(rom.read_bytes(audioseq_start, audioseq_size))
     for i in range(0x6E):
         # Create new sequence object, an entry for the audio sequence
         entry = SequenceData()
@@ -380,7 +453,10 @@ def rebuild_sequences(rom: Rom, sequences: list[Sequence], log: CosmeticsLog, sy
 
         # If size > 0, read the sequence data from the rom into the sequence object
         if entry.size > 0:
-            entry.data = rom.read_bytes(entry.address + audioseq_start, entry.size)
+            if entry.address + entry.size <= audioseq_size:
+                entry.data = audioseq_data[entry.address:entry.address + entry.size]
+            else:
+                entry.data = rom.read_bytes(entry.address + audioseq_start, entry.size)
         else:
             seq = replacement_dict.get(i, None)
             if seq and 0 < entry.address < 128:
@@ -396,8 +472,8 @@ def rebuild_sequences(rom: Rom, sequences: list[Sequence], log: CosmeticsLog, sy
     # List of sequences containing the new sequence data
     new_sequences = []
     address = 0
-    # Byte array to hold the data for the whole audio sequence
-    new_audio_sequence = []
+    # Where the data of each sequence goes in the new audio sequence file
+    new_sequence_data = []
 
     for i in range(0x6E):
         new_entry = SequenceData()
@@ -432,13 +508,12 @@ def rebuild_sequences(rom: Rom, sequences: list[Sequence], log: CosmeticsLog, sy
 
         new_sequences.append(new_entry)
 
-        # Concatenate the full audio sequence and the new sequence data
-        if new_entry.data != [] and new_entry.size > 0:
+        # Lay out the new sequence data after the previous one, it is written once the size of the file is known
+        if new_entry.size > 0:
             # Align sequences to 0x10
             if new_entry.size % 0x10 != 0:
-                new_entry.data.extend(bytearray(0x10 - (new_entry.size % 0x10)))
                 new_entry.size += 0x10 - (new_entry.size % 0x10)
-            new_audio_sequence.extend(new_entry.data)
+            new_sequence_data.append((address, new_entry))
             # Increment the current address by the size of the new sequence
             address += new_entry.size
 
@@ -446,14 +521,17 @@ def rebuild_sequences(rom: Rom, sequences: list[Sequence], log: CosmeticsLog, sy
     # Check if the new audio sequence is larger than the vanilla one
     if address > audioseq_size:
         # Zero out the old audio sequence
-        rom.buffer[audioseq_start:audioseq_end] = [0] * audioseq_size
+        rom.write_bytes(audioseq_start, bytes(audioseq_size))
 
         # Find free space and update dmatable
         new_address = rom.dma.free_space(address)
         audioseq_dma_entry.update(new_address, new_address + address)
 
-    # Write new audio sequence file
-    rom.write_bytes(new_address, new_audio_sequence)
+    # Write new audio sequence file, padding each sequence to its aligned size
+    for sequence_address, new_entry in new_sequence_data:
+        rom.write_bytes(new_address + sequence_address, new_entry.data)
+        if new_entry.size > len(new_entry.data):
+            rom.write_bytes(new_address + sequence_address + len(new_entry.data), bytes(new_entry.size - len(new_entry.data)))
 
     # If custom banks are supported, we're going to make copies of the banks to be used for fanfares
     # In that case, need to update the fanfare sequence's bank to point to the new one
@@ -579,46 +657,41 @@ def rebuild_sequences(rom: Rom, sequences: list[Sequence], log: CosmeticsLog, sy
     # Patch the new instrument data into the ROM in a new file.
     # If there is any instrument data to add, move the entire audiotable file to a new location in the ROM.
     if len(instr_data) > 0:
-        # Read the original audiotable data
-        audiotable_data = rom.read_bytes(audiotable_start, audiotable_size)
-        # Zeroize existing file
-        rom.write_bytes(audiotable_start, [0] * audiotable_size)
-        # Add the new data
-        audiotable_data += instr_data
         # Get new address for the file
-        new_audiotable_start = rom.dma.free_space(len(audiotable_data))
-        # Write the file to the new address
-        rom.write_bytes(new_audiotable_start, audiotable_data)
+        new_audiotable_start = rom.dma.free_space(audiotable_size + len(instr_data))
+        # Copy the original audiotable data to the new address, followed by the new data
+        with memoryview(rom.buffer) as buffer:
+            rom.write_bytes(new_audiotable_start, buffer[audiotable_start:audiotable_end])
+        rom.write_bytes(new_audiotable_start + audiotable_size, instr_data)
+        # Zeroize existing file
+        rom.write_bytes(audiotable_start, bytes(audiotable_size))
         # Update DMA
-        audiotable_dma_entry.update(new_audiotable_start, new_audiotable_start + len(audiotable_data))
+        audiotable_dma_entry.update(new_audiotable_start, new_audiotable_start + audiotable_size + len(instr_data))
         log.instr_dma_index = audiotable_dma_entry.index
 
-    # Add new audio banks
-    new_bank_data = bytearray(0)
-    # Read the original audiobank data
-    audiobank_data = rom.read_bytes(audiobank_start, audiobank_size)
-    new_bank_offset = len(audiobank_data)
+    # Add new audio banks after the original audiobank data
+    new_bank_offset = audiobank_size
     for bank in added_banks:
         bank.update_zsound_pointers()
         bank.offset = new_bank_offset
         #absolute_offset = new_audio_banks_addr + new_bank_offset
         bank_entry = bank.get_entry(new_bank_offset)
         rom.write_bytes(bank_table_base + 0x10 + bank.index * 0x10, bank_entry)
-        new_bank_data += bank.data
         new_bank_offset += len(bank.data)
 
     # If there is any audiobank data to add, move the entire audiobank file to a new place in ROM. Update the existing dmadata record
-    if len(new_bank_data) > 0:
-        # Zeroize existing file
-        rom.write_bytes(audiobank_start, [0] * audiobank_size)
-        # Add the new data
-        audiobank_data += new_bank_data
+    if new_bank_offset > audiobank_size:
         # Get new address for the file
-        new_audio_banks_addr = rom.dma.free_space(len(audiobank_data))
-        # Write the file to the new address
-        rom.write_bytes(new_audio_banks_addr, audiobank_data)
+        new_audio_banks_addr = rom.dma.free_space(new_bank_offset)
+        # Copy the original audiobank data to the new address, followed by the new banks
+        with memoryview(rom.buffer) as buffer:
+            rom.write_bytes(new_audio_banks_addr, buffer[audiobank_start:audiobank_end])
+        for bank in added_banks:
+            rom.write_bytes(new_audio_banks_addr + bank.offset, bank.data)
+        # Zeroize existing file
+        rom.write_bytes(audiobank_start, bytes(audiobank_size))
         # Update DMA
-        audiobank_dma_entry.update(new_audio_banks_addr, new_audio_banks_addr + len(audiobank_data))
+        audiobank_dma_entry.update(new_audio_banks_addr, new_audio_banks_addr + new_bank_offset)
         log.bank_dma_index = audiobank_dma_entry.index
         # Update size of bank table in the Audiobank table header.
         rom.write_bytes(bank_table_base, new_bank_index.to_bytes(2, 'big'))
@@ -857,7 +930,7 @@ def restore_music(rom: Rom) -> None:
     start, end, size = dma_entry.as_tuple()
     if start != orig_start:
         # Zero out old audioseq
-        rom.write_bytes(start, [0] * size)
+        rom.write_bytes(start, bytes(size))
         dma_entry.update(orig_start, orig_end, start)
 
 
@@ -1,86 +1,156 @@
 from __future__ import annotations
-import copy
 import random
 import zipfile
 import zlib
 from typing import TYPE_CHECKING, Optional
 
-from Rom import Rom
+from Rom import Rom, changed_runs
 from ntype import BigStream
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 if TYPE_CHECKING:
     from Settings import Settings
 
 
-# get the next XOR key. Uses some location in the source rom.
-# This will skip of 0s, since if we hit a block of 0s, the
-# patch data will be raw.
-def key_next(rom: Rom, key_address: int, address_range: tuple[int, int]) -> tuple[int, int]:
-    key = 0
-    while key == 0:
-        key_address += 1
-        if key_address > address_range[1]:
-            key_address = address_range[0]
-        key = rom.original.buffer[key_address]
-    return key, key_address
+# The XOR keys in the order they are used, starting after a key address.
+# These are the nonzero bytes of the source rom in the key range, since if
+# we hit a block of 0s, the patch data will be raw. Once the end of the
+# range is reached, the keys start over from the beginning of the range.
+class XorKeys:
+    def __init__(self, rom: Rom, key_address: int, address_range: tuple[int, int]) -> None:
+        range_start, range_end = address_range
+        self.keys: bytes = bytes(rom.original.buffer[range_start:range_end + 1]).replace(b'\x00', b'')
+        # keys before the range are only used when starting before it
+        self.lead: bytes = bytes(rom.original.buffer[key_address + 1:range_start]).replace(b'\x00', b'')
+        self.index: int = 0
+        if range_start <= key_address < range_end:
+            self.index = len(bytes(rom.original.buffer[range_start:key_address + 1]).replace(b'\x00', b''))
+
+    # get the next count keys, skipping offset keys, without using them up
+    def peek(self, count: int, offset: int = 0) -> bytes:
+        keys = self.lead[offset:offset + count]
+        if len(keys) == count:
+            return keys
+        if not self.keys:
+            raise Exception("XOR key range is empty.")
+        index = (self.index + max(offset - len(self.lead), 0)) % len(self.keys)
+        while len(keys) < count:
+            keys += self.keys[index:index + count - len(keys)]
+            index = 0
+        return keys
+
+    def skip(self, count: int) -> None:
+        lead = min(count, len(self.lead))
+        self.lead = self.lead[lead:]
+        if count > lead:
+            if not self.keys:
+                raise Exception("XOR key range is empty.")
+            self.index = (self.index + count - lead) % len(self.keys)
+
+    def take(self, count: int) -> bytes:
+        keys = self.peek(count)
+        self.skip(count)
+        return keys
+
+
+# XOR two byte strings of the same length.
+def xor_bytes(data: bytes, keys: bytes) -> bytes:
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(keys, 'big')).to_bytes(len(data), 'big')
+
+
+# XOR every nonzero byte with the next key. 0s are left as 0s, so
+# keys must have one key for each nonzero byte of data.
+def xor_nonzero(data: bytes, keys: bytes) -> bytes:
+    if numpy is not None:
+        return xor_nonzero_numpy(data, keys)
+    return xor_nonzero_python(data, keys)
+
+
+def xor_nonzero_numpy(data: bytes, keys: bytes) -> bytes:
+    new_data = numpy.frombuffer(data, dtype=numpy.uint8).copy()
+    new_data[new_data != 0] ^= numpy.frombuffer(keys, dtype=numpy.uint8)
+    return new_data.tobytes()
+
+
+def xor_nonzero_python(data: bytes, keys: bytes) -> bytes:
+    runs = []
+    key_index = 0
+    for run in data.split(b'\x00'):
+        runs.append(xor_bytes(run, keys[key_index:key_index + len(run)]))
+        key_index += len(run)
+    return b'\x00'.join(runs)
+
+
+# find the first nonzero byte between start and end that is the same as
+# its XOR key, so XORing it would result in 0. Returns end if there is none.
+def find_unsafe_key(keys: XorKeys, data: bytes, start: int, end: int) -> int:
+    key_offset = 0
+    while start < end:
+        window = data[start:min(start + 0x400, end)]
+        window_data = window.replace(b'\x00', b'')
+        unsafe = xor_bytes(window_data, keys.peek(len(window_data), key_offset)).find(0)
+        if unsafe >= 0:
+            # locate the nonzero byte in the window
+            low, high = unsafe + 1, len(window)
+            while low < high:
+                middle = (low + high) // 2
+                if middle - window.count(0, 0, middle) > unsafe:
+                    high = middle
+                else:
+                    low = middle + 1
+            return start + low - 1
+        start += len(window)
+        key_offset += len(window_data)
+    return end
 
 
 # creates a XOR block for the patch. This might break it up into
 # multiple smaller blocks if there is a concern about the XOR key
 # or if it is too long.
-def write_block(rom: Rom, xor_address: int, xor_range: tuple[int, int], block_start: int,
-                data: list[int], patch_data: BigStream) -> int:
-    new_data = []
+def write_block(keys: XorKeys, block_start: int, data: bytes, patch_data: BigStream) -> None:
+    section_start = 0
     key_offset = 0
     continue_block = False
 
-    for b in data:
-        if b == 0:
-            # Leave 0s as 0s. Do not XOR
-            new_data += [0]
-        else:
-            # get the next XOR key
-            key, xor_address = key_next(rom, xor_address, xor_range)
-
-            # if the XOR would result in 0, change the key.
-            # This requires breaking up the block.
-            if b == key:
-                write_block_section(block_start, key_offset, new_data, patch_data, continue_block)
-                new_data = []
-                key_offset = 0
-                continue_block = True
-
-                # search for next safe XOR key
-                while b == key:
-                    key_offset += 1
-                    key, xor_address = key_next(rom, xor_address, xor_range)
-                    # if we aren't able to find one quickly, we may need to break again
-                    if key_offset == 0xFF:
-                        write_block_section(block_start, key_offset, new_data, patch_data, continue_block)
-                        new_data = []
-                        key_offset = 0
-                        continue_block = True
-
-            # XOR the key with the byte
-            new_data += [b ^ key]
-
-            # Break the block if it's too long
-            if len(new_data) == 0xFFFF:
-                write_block_section(block_start, key_offset, new_data, patch_data, continue_block)
-                new_data = []
+    while True:
+        # Break the block if it's too long. A block only gets too long
+        # when the byte that makes it full isn't a 0.
+        is_full = section_start + 0xFFFF <= len(data) and data[section_start + 0xFFFE] != 0
+        section_end = section_start + 0xFFFF if is_full else len(data)
+
+        # XOR all the bytes up to the first one that would result in 0
+        unsafe = find_unsafe_key(keys, data, section_start, section_end)
+        section = data[section_start:unsafe]
+        write_block_section(block_start, key_offset, xor_nonzero(section, keys.take(len(section) - section.count(0))), patch_data, continue_block)
+        if unsafe == section_end and not is_full:
+            return
+        section_start = unsafe
+        key_offset = 0
+        continue_block = True
+        if unsafe == section_end:
+            continue
+
+        # if the XOR would result in 0, change the key.
+        # This requires breaking up the block.
+        b = data[unsafe]
+        while keys.peek(1)[0] == b:
+            keys.skip(1)
+            key_offset += 1
+            # if we aren't able to find one quickly, we may need to break again
+            if key_offset == 0xFF:
+                write_block_section(block_start, key_offset, b'', patch_data, continue_block)
                 key_offset = 0
-                continue_block = True
-
-    # Save the block
-    write_block_section(block_start, key_offset, new_data, patch_data, continue_block)
-    return xor_address
 
 
 # This saves a sub-block for the XOR block. If it's the first part
 # then it will include the address to write to. Otherwise, it will
 # have a number of XOR keys to skip and then continue writing after
 # the previous block
-def write_block_section(start: int, key_skip: int, in_data: list[int], patch_data: BigStream, is_continue: bool) -> None:
+def write_block_section(start: int, key_skip: int, in_data: bytes, patch_data: BigStream, is_continue: bool) -> None:
     if not is_continue:
         patch_data.append_int32(start)
     else:
@@ -93,7 +163,7 @@ def write_block_section(start: int, key_skip: int, in_data: list[int], patch_dat
 # xor_range is the range the XOR key will read from. This range is not
 # too important, but I tried to choose from a section that didn't really
 # have big gaps of 0s which we want to avoid.
-def create_patch_file(rom: Rom, file: str, xor_range: tuple[int, int] = (0x00B8AD30, 0x00F029A0)) -> None:
+def create_patch_file(rom: Rom, file: str, xor_range: tuple[int, int] = (0x00B8AD30, 0x00F029A0), xor_seed: Optional[int] = None) -> None:
     dma_start, dma_end = rom.dma.dma_start, rom.dma.dma_end
 
     # add header
@@ -104,11 +174,12 @@ def create_patch_file(rom: Rom, file: str, xor_range: tuple[int, int] = (0x00B8A
     patch_data.append_int32(xor_range[1])
 
     # get random xor key. This range is chosen because it generally
-    # doesn't have many sections of 0s
-    xor_address = random.Random().randint(*xor_range)
+    # doesn't have many sections of 0s. Passing a seed makes the patch reproducible.
+    xor_address = random.Random(xor_seed).randint(*xor_range)
     patch_data.append_int32(xor_address)
+    keys = XorKeys(rom, xor_address, xor_range)
 
-    new_buffer = copy.copy(rom.original.buffer)
+    new_buffer = bytearray(rom.original.buffer)
 
     # write every changed DMA entry
     for dma_index, (from_file, start, size) in rom.changed_dma.items():
@@ -120,8 +191,7 @@ def create_patch_file(rom: Rom, file: str, xor_range: tuple[int, int] = (0x00B8A
         # We don't trust files that have modified DMA to have their
         # changed addresses tracked correctly, so we invalidate the
         # entire file
-        for address in range(start, start + size):
-            rom.changed_address[address] = rom.buffer[address]
+        rom.changed_ranges.add(start, start + size)
 
         # Simulate moving the files to know which addresses have changed
         if from_file >= 0:
@@ -136,39 +206,36 @@ def create_patch_file(rom: Rom, file: str, xor_range: tuple[int, int] = (0x00B8A
     # end of DMA entries
     patch_data.append_int16(0xFFFF)
 
-    # filter down the addresses that will actually need to change.
-    # Make sure to not include any of the DMA table addresses
-    changed_addresses = [address for address, value in rom.changed_address.items()
-                         if (address >= dma_end or address < dma_start) and
-                         (address in rom.force_patch or new_buffer[address] != value)]
-    changed_addresses.sort()
+    # filter down the changed ranges to the runs of bytes that will actually
+    # need to change. Make sure to not include any of the DMA table addresses
+    runs = []
+    for start, end in rom.changed_ranges:
+        for run_start, run_end in ((start, min(end, dma_start)), (max(start, dma_end), end)):
+            runs.extend(changed_runs(rom.buffer, new_buffer, run_start, min(run_end, len(rom.buffer))))
+    runs.extend((address, address + 1) for address in rom.force_patch
+                if (address >= dma_end or address < dma_start) and address in rom.changed_ranges)
+    runs.sort()
 
     # Write the address changes. We'll store the data with XOR so that
     # the patch data won't be raw data from the patched rom.
-    data = []
     block_start = block_end = None
     BLOCK_HEADER_SIZE = 7  # this is used to break up gaps
-    for address in changed_addresses:
+    for run_start, run_end in runs:
         # if there's a block to write and there's a gap, write it
-        if block_start:
-            block_end = block_start + len(data) - 1
-            if address > block_end + BLOCK_HEADER_SIZE:
-                xor_address = write_block(rom, xor_address, xor_range, block_start, data, patch_data)
-                data = []
-                block_start = None
-                block_end = None
+        if block_start is not None and run_start > block_end + BLOCK_HEADER_SIZE:
+            write_block(keys, block_start, bytes(rom.buffer[block_start:block_end+1]), patch_data)
+            block_start = None
 
         # start a new block
-        if not block_start:
-            block_start = address
-            block_end = address - 1
-
-        # save the new data
-        data += rom.buffer[block_end+1:address+1]
+        if block_start is None:
+            block_start = run_start
+            block_end = run_end - 1
+        else:
+            block_end = max(block_end, run_end - 1)
 
     # if there was any leftover blocks, write them out
-    if block_start:
-        xor_address = write_block(rom, xor_address, xor_range, block_start, data, patch_data)
+    if block_start is not None:
+        write_block(keys, block_start, bytes(rom.buffer[block_start:block_end+1]), patch_data)
 
     # compress the patch file
     patch_data = bytes(patch_data.buffer)
@@ -209,6 +276,7 @@ def apply_patch_file(rom: Rom, settings: Settings, sub_file: Optional[str] = Non
     dma_start = patch_data.read_int32()
     xor_range = (patch_data.read_int32(), patch_data.read_int32())
     xor_address = patch_data.read_int32()
+    keys = XorKeys(rom, xor_address, xor_range)
 
     # Load all the DMA table updates. This will move the files around.
     # A key thing is that some of these entries will list a source file
@@ -238,10 +306,10 @@ def apply_patch_file(rom: Rom, settings: Settings, sub_file: Optional[str] = Non
             old_dma_start, old_dma_end, old_size = rom.original.dma.get_dmadata_record_by_key(from_file).as_tuple()
             copy_size = min(size, old_size)
             rom.write_bytes(start, rom.original.read_bytes(from_file, copy_size))
-            rom.buffer[start+copy_size:start+size] = [0] * (size - copy_size)
+            rom.write_bytes(start+copy_size, [0] * (size - copy_size))
         else:
             # if it's a new file, fill with 0s
-            rom.buffer[start:start+size] = [0] * size
+            rom.write_bytes(start, [0] * size)
 
     # Read in the XOR data blocks. This goes to the end of the file.
     block_start = 0
@@ -258,19 +326,12 @@ def apply_patch_file(rom: Rom, settings: Settings, sub_file: Optional[str] = Non
             key_skip = patch_data.read_byte()
             block_size = patch_data.read_int16()
             # skip specified XOR keys
-            for _ in range(key_skip):
-                key, xor_address = key_next(rom, xor_address, xor_range)
-
-        # read in the new data
-        data = []
-        for b in patch_data.read_bytes(length=block_size):
-            if b == 0:
-                # keep 0s as 0s
-                data += [0]
-            else:
-                # The XOR will always be safe and will never produce 0
-                key, xor_address = key_next(rom, xor_address, xor_range)
-                data += [b ^ key]
+            keys.skip(key_skip)
+
+        # read in the new data. 0s are kept as 0s, and the XOR will
+        # always be safe and will never produce 0
+        data = bytes(patch_data.read_bytes(length=block_size))
+        data = xor_nonzero(data, keys.take(len(data) - data.count(0)))
 
         # Save the new data to rom
         if settings.repatch_cosmetics:
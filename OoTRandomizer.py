@@ -11,10 +11,11 @@ import time
 
 
 def start() -> None:
-    from Main import main, from_patch_file, cosmetic_patch, diff_roms
+    from Main import main, main_batch, from_patch_file, cosmetic_patch, diff_roms
+    from RuleParser import load_rule_cache, save_rule_cache
     from Settings import get_settings_from_command_line_args
     from Utils import check_version, VersionError, local_path
-    settings, gui, args_loglevel, no_log_file, diff_rom = get_settings_from_command_line_args()
+    settings, gui, args_loglevel, no_log_file, diff_rom, batch_workers, batch_retries, rule_cache = get_settings_from_command_line_args()
 
     # set up logger
     loglevel = {'error': logging.ERROR, 'info': logging.INFO, 'warning': logging.WARNING, 'debug': logging.DEBUG}[args_loglevel]
@@ -38,6 +39,9 @@ def start() -> None:
         except VersionError as e:
             logger.warning(str(e))
 
+    if rule_cache and not load_rule_cache(rule_cache):
+        logger.info('Rule cache %s is missing or outdated, it will be rebuilt.', rule_cache)
+
     try:
         if gui:
             from Gui import gui_main
@@ -48,6 +52,10 @@ def start() -> None:
             cosmetic_patch(settings)
         elif settings.patch_file != '':
             from_patch_file(settings)
+        elif settings.count is not None and settings.count > 1 and batch_workers is not None:
+            results = main_batch(settings, batch_workers, batch_retries)
+            if not all(result.success for result in results):
+                sys.exit(1)
         elif settings.count is not None and settings.count > 1:
             orig_seed = settings.seed
             for i in range(settings.count):
@@ -59,6 +67,9 @@ def start() -> None:
         logger.exception(ex)
         sys.exit(1)
 
+    if rule_cache:
+        save_rule_cache(rule_cache)
+
 
 if __name__ == '__main__':
     start()
@@ -1,12 +1,15 @@
 from __future__ import annotations
 import datetime
+import hashlib
 import itertools
+import marshal
+import os
 import random
 import re
 import struct
 import sys
 import zlib
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Iterable, Sequence
 from typing import Optional, Any
 
 from Cutscenes import patch_cutscenes
@@ -27,14 +30,14 @@ from OcarinaSongs import patch_songs
 from MQ import patch_files, File, update_dmadata, insert_space, add_relocations
 from Rom import Rom
 from SaveContext import SaveContext, Scenes, FlagType
-from SceneFlags import build_xflag_tables, build_xflags_from_world, get_alt_list_bytes
+from SceneFlags import XFLAG_LOCATION_TYPES, build_xflag_tables, build_xflags_from_world, get_alt_list_bytes, get_flag_tuple
 from Sounds import move_audiobank_table
 from Spoiler import Spoiler
 from TextBox import line_wrap
-from Utils import data_path
+from Utils import data_path, local_path
 from World import World
 from ntype import BigStream
-from texture_util import ci4_rgba16patch_to_ci8, rgba16_patch
+from texture_util import build_patched_texture, ci4_rgba16patch_to_ci8, rgba16_patch
 from version import __version__
 
 if sys.version_info >= (3, 10):
@@ -43,6 +46,13 @@ else:
     TypeAlias = str
 
 OverrideEntry: TypeAlias = "tuple[int, int, int, int, int, int]"
+# Scene, room (-1 for transition actors), setup (0 for the main header), address and offset of the actor id of an actor entry.
+ActorEntry: TypeAlias = "tuple[int, int, int, int, int]"
+
+ACTOR_SCENE_TABLE: int = 0x00B71440
+
+# Base ROM actor indexes by source file: see get_base_actor_index.
+base_actor_indexes: dict[str, tuple[str, str, int, int, list[tuple[list[ActorEntry], list[tuple[int, int]]]]]] = {}
 
 
 def patch_rom(spoiler: Spoiler, world: World, rom: Rom) -> Rom:
@@ -125,7 +135,7 @@ def patch_rom(spoiler: Spoiler, world: World, rom: Rom) -> Rom:
     # Add the new models to the extended object file.
     for name, start, end, object_id, patches in zobj_patches:
         end_address = start_address + end - start
-        rom.buffer[start_address:end_address] = rom.buffer[start:end]
+        rom.write_bytes(start_address, rom.read_bytes(start, end - start))
         # Apply patches
         for offset, patch in patches:
             rom.write_bytes(start_address + offset, patch)
@@ -265,7 +275,7 @@ def patch_rom(spoiler: Spoiler, world: World, rom: Rom) -> Rom:
     extended_textures_start = start_address = rom.dma.free_space()
     for texture_id, texture_name, rom_address_base, rom_address_palette, size, func, patch_file in crate_textures:
         # Apply the texture patch. Resulting texture will be stored in texture_data as a bytearray
-        texture_data = func(rom, rom_address_base, rom_address_palette, size, data_path(patch_file) if patch_file else None)
+        texture_data = build_patched_texture(func, rom, rom_address_base, rom_address_palette, size, data_path(patch_file) if patch_file else None)
         rom.write_bytes(start_address, texture_data)  # write the bytes to our new file
         end_address = ((start_address + len(texture_data) + 0x0F) >> 4) << 4
 
@@ -1705,6 +1715,9 @@ def patch_rom(spoiler: Spoiler, world: World, rom: Rom) -> Rom:
         0x79: world.get_location("LW Deku Scrub Grotto Front"),
     }
 
+    # Actor functions run together once the salesman, grotto and cow data below is known
+    actor_funcs = []
+
     scrub_message_dict = {}
     if world.settings.shuffle_scrubs == 'off':
         # Revert Deku Scrubs changes
@@ -1735,7 +1748,7 @@ def patch_rom(spoiler: Spoiler, world: World, rom: Rom) -> Rom:
             scrub_message_dict[text_id] = update_scrub_text(get_message_by_id(messages, text_id).raw_text, text_replacement, default_price, price)
 
         # update actor IDs
-        set_deku_salesman_data(rom)
+        set_deku_salesman_data(rom, actor_funcs)
 
     # Update scrub messages.
     shuffle_messages.scrubs_message_ids = []
@@ -1753,14 +1766,18 @@ def patch_rom(spoiler: Spoiler, world: World, rom: Rom) -> Rom:
                 rom.write_byte(load_table_pointer + 2, entrance.data['content'])
 
         # Update grotto actors based on their new entrance
-        set_grotto_shuffle_data(rom, world)
+        set_grotto_shuffle_data(rom, world, actor_funcs)
 
     if world.settings.shuffle_cows:
         rom.write_byte(rom.sym('SHUFFLE_COWS'), 0x01)
         # Move some cows because they are too close from each other in vanilla
         rom.write_bytes(0x33650CA, [0xFE, 0xD3, 0x00, 0x00, 0x00, 0x6E, 0x00, 0x00, 0x4A, 0x34])  # LLR Tower right cow
         rom.write_bytes(0x2C550AE, [0x00, 0x82])  # LLR Stable right cow
-        set_cow_id_data(rom, world)
+        set_cow_id_data(rom, world, actor_funcs)
+
+    # Patch the salesman, grotto and cow actors in a single pass over the actors
+    if actor_funcs:
+        get_actor_lists(rom, actor_funcs)
 
     if world.settings.shuffle_beans:
         rom.write_byte(rom.sym('SHUFFLE_BEANS'), 0x01)
@@ -2330,18 +2347,14 @@ def get_override_entry(location: Location) -> Optional[OverrideEntry]:
     elif location.type == 'Chest':
         type = 1
         default &= 0x1F
-    elif location.type in ['Freestanding', 'Pot', 'Crate', 'FlyingPot', 'SmallCrate', 'RupeeTower', 'Beehive', 'SilverRupee', 'Wonderitem']:
+    elif location.type in XFLAG_LOCATION_TYPES:
         type = 6
         if not (isinstance(location.default, list) or isinstance(location.default, tuple)):
             raise Exception("Not right")
         if isinstance(location.default, list):
             default = location.default[0]
 
-        if len(default) == 3:
-            room, scene_setup, flag = default
-            subflag = 0
-        elif len(default) == 4:
-            room, scene_setup, flag, subflag = default
+        room, scene_setup, flag, subflag = get_flag_tuple(default)
 
         if location.scene == 0x3E: # handle grottos separately...
             default = ((scene_setup & 0x1F) << 19) + ((room & 0x0F) << 15) + ((flag & 0x7F) << 8) + ((subflag & 0xFF)) #scene_setup = grotto_id
@@ -2396,80 +2409,165 @@ chestTypeMap: dict[int, list[int]] = {
 }
 
 
-def room_get_actors(rom: Rom, actor_func: Callable[[Rom, int, int, int], Any], room_data: int, scene: int,
-                    alternate: Optional[int] = None) -> dict[int, Any]:
-    actors = {}
+# Adds the actors of a room header to the index, in the order get_actor_list visits them,
+# and the header bytes the layout was read from to read_ranges.
+def index_room_actors(rom: Rom, room_data: int, scene: int, room: int, setup: int, entries: list[ActorEntry],
+                      read_ranges: list[tuple[int, int]], alternate: Optional[int] = None) -> None:
     room_start = alternate if alternate else room_data
     command = 0
     while command != 0x14:  # 0x14 = end header
         command = rom.read_byte(room_data)
+        read_ranges.append((room_data, room_data + 8))
         if command == 0x01:  # actor list
             actor_count = rom.read_byte(room_data + 1)
             actor_list = room_start + (rom.read_int32(room_data + 4) & 0x00FFFFFF)
             for _ in range(0, actor_count):
-                actor_id = rom.read_int16(actor_list)
-                entry = actor_func(rom, actor_id, actor_list, scene)
-                if entry:
-                    actors[actor_list] = entry
+                entries.append((scene, room, setup, actor_list, 0))
                 actor_list = actor_list + 16
         if command == 0x18:  # Alternate header list
             header_list = room_start + (rom.read_int32(room_data + 4) & 0x00FFFFFF)
+            read_ranges.append((header_list, header_list + 12))
             for alt_id in range(0, 3):
                 header_data = room_start + (rom.read_int32(header_list) & 0x00FFFFFF)
                 if header_data != 0 and not alternate:
-                    actors.update(room_get_actors(rom, actor_func, header_data, scene, room_start))
+                    index_room_actors(rom, header_data, scene, room, alt_id + 1, entries, read_ranges, room_start)
                 header_list = header_list + 4
         room_data = room_data + 8
-    return actors
 
 
-def scene_get_actors(rom: Rom, actor_func: Callable[[Rom, int, int, int], Any], scene_data: int, scene: int,
-                     alternate: Optional[int] = None, processed_rooms: Optional[list[int]] = None) -> dict[int, Any]:
-    if processed_rooms is None:
-        processed_rooms = []
-    actors = {}
+# Same for a scene header, including the rooms it lists. Rooms shared between setups are only indexed the first time.
+def index_scene_actors(rom: Rom, scene_data: int, scene: int, setup: int, entries: list[ActorEntry], read_ranges: list[tuple[int, int]],
+                       processed_rooms: set[int], alternate: Optional[int] = None) -> None:
     scene_start = alternate if alternate else scene_data
     command = 0
     while command != 0x14:  # 0x14 = end header
         command = rom.read_byte(scene_data)
+        read_ranges.append((scene_data, scene_data + 8))
         if command == 0x04:  # room list
             room_count = rom.read_byte(scene_data + 1)
             room_list = scene_start + (rom.read_int32(scene_data + 4) & 0x00FFFFFF)
-            for _ in range(0, room_count):
+            read_ranges.append((room_list, room_list + room_count * 8))
+            for room in range(0, room_count):
                 room_data = rom.read_int32(room_list)
-
                 if room_data not in processed_rooms:
-                    actors.update(room_get_actors(rom, actor_func, room_data, scene))
-                    processed_rooms.append(room_data)
+                    index_room_actors(rom, room_data, scene, room, setup, entries, read_ranges)
+                    processed_rooms.add(room_data)
                 room_list = room_list + 8
         if command == 0x0E:  # transition actor list
             actor_count = rom.read_byte(scene_data + 1)
             actor_list = scene_start + (rom.read_int32(scene_data + 4) & 0x00FFFFFF)
             for _ in range(0, actor_count):
-                actor_id = rom.read_int16(actor_list + 4)
-                entry = actor_func(rom, actor_id, actor_list, scene)
-                if entry:
-                    actors[actor_list] = entry
+                entries.append((scene, -1, setup, actor_list, 4))
                 actor_list = actor_list + 16
         if command == 0x18:  # Alternate header list
             header_list = scene_start + (rom.read_int32(scene_data + 4) & 0x00FFFFFF)
+            read_ranges.append((header_list, header_list + 12))
             for alt_id in range(0, 3):
                 header_data = scene_start + (rom.read_int32(header_list) & 0x00FFFFFF)
                 if header_data != 0 and not alternate:
-                    actors.update(scene_get_actors(rom, actor_func, header_data, scene, scene_start, processed_rooms))
+                    index_scene_actors(rom, header_data, scene, alt_id + 1, entries, read_ranges, processed_rooms, scene_start)
                 header_list = header_list + 4
 
         scene_data = scene_data + 8
-    return actors
 
 
-def get_actor_list(rom: Rom, actor_func: Callable[[Rom, int, int, int], Any]) -> dict[int, Any]:
-    actors = {}
-    scene_table = 0x00B71440
+# Returns the actors of a scene in visiting order, and the merged ranges of header bytes their layout depends on.
+def build_scene_actor_index(rom: Rom, scene: int) -> tuple[list[ActorEntry], list[tuple[int, int]]]:
+    entries = []
+    read_ranges = [(ACTOR_SCENE_TABLE + scene * 0x14, ACTOR_SCENE_TABLE + scene * 0x14 + 4)]
+    scene_data = rom.read_int32(ACTOR_SCENE_TABLE + scene * 0x14)
+    index_scene_actors(rom, scene_data, scene, 0, entries, read_ranges, set())
+    merged_ranges = []
+    for start, end in sorted(read_ranges):
+        if merged_ranges and start <= merged_ranges[-1][1]:
+            merged_ranges[-1] = (merged_ranges[-1][0], max(end, merged_ranges[-1][1]))
+        else:
+            merged_ranges.append((start, end))
+    return entries, merged_ranges
+
+
+# Identifies the code the actor index is built with, so the cached index is built again whenever it changes.
+def actor_index_version() -> str:
+    version = hashlib.sha256()
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in ('Patches.py', 'Rom.py', 'ntype.py'):
+        try:
+            with open(os.path.join(source_dir, filename), 'rb') as f:
+                version.update(f.read())
+        except OSError:
+            pass
+    return version.hexdigest()
+
+
+# The actor layout of the base ROM never changes, so it is indexed once per base ROM file and kept in memory
+# and on disk next to the decompressed ROM, until the file or actor_index_version changes.
+def get_base_actor_index(rom: Rom, cache_path: Optional[str] = None) -> Optional[list[tuple[list[ActorEntry], list[tuple[int, int]]]]]:
+    if rom.source_file is None or rom.original is rom:
+        return None
+    try:
+        stat = os.stat(rom.source_file)
+    except OSError:
+        return None
+    source = (actor_index_version(), os.path.abspath(rom.source_file), stat.st_mtime_ns, stat.st_size)
+    cached = base_actor_indexes.get(source[1], None)
+    if cached is None or cached[:4] != source:
+        if cache_path is None:
+            cache_path = local_path('ZOOTDEC.actors')
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            cached = None
+        if not isinstance(cached, tuple) or cached[:4] != source:
+            cached = (*source, [build_scene_actor_index(rom.original, scene) for scene in range(0x00, 0x65)])
+            try:
+                with open(cache_path, 'wb') as f:
+                    marshal.dump(cached, f)
+            except OSError:
+                # Read-only installs just index the base ROM again next run.
+                pass
+        base_actor_indexes[source[1]] = cached
+    return cached[4]
+
+
+# Returns every actor get_actor_list visits, in order. Scenes whose headers were written to since the ROM was
+# restored, for example by the MQ dungeon patches, are indexed from the patched ROM, the rest come from the base ROM index.
+def get_actor_index(rom: Rom) -> list[ActorEntry]:
+    base_index = get_base_actor_index(rom)
+    entries = []
     for scene in range(0x00, 0x65):
-        scene_data = rom.read_int32(scene_table + (scene * 0x14))
-        actors.update(scene_get_actors(rom, actor_func, scene_data, scene))
-    return actors
+        if base_index is not None:
+            scene_entries, read_ranges = base_index[scene]
+            if not any(rom.changed_ranges.overlaps(start, end) for start, end in read_ranges):
+                entries.extend(scene_entries)
+                continue
+        entries.extend(build_scene_actor_index(rom, scene)[0])
+    return entries
+
+
+# Calls every actor function on every actor of every scene in a single pass over the actors.
+# Returns a dict per function, of the actor addresses it returned a value for.
+def get_actor_lists(rom: Rom, actor_funcs: Sequence[Callable[[Rom, int, int, int], Any]]) -> list[dict[int, Any]]:
+    actor_lists = [{} for _ in actor_funcs]
+    for scene, room, setup, actor, id_offset in get_actor_index(rom):
+        actor_id = rom.read_int16(actor + id_offset)
+        for actor_func, actors in zip(actor_funcs, actor_lists):
+            entry = actor_func(rom, actor_id, actor, scene)
+            if entry:
+                actors[actor] = entry
+    return actor_lists
+
+
+def get_actor_list(rom: Rom, actor_func: Callable[[Rom, int, int, int], Any]) -> dict[int, Any]:
+    return get_actor_lists(rom, [actor_func])[0]
+
+
+# Runs an actor function over all actors now, or adds it to actor_funcs to run later in a single pass with the others.
+def patch_actors(rom: Rom, actor_func: Callable[[Rom, int, int, int], Any], actor_funcs: Optional[list[Callable[[Rom, int, int, int], Any]]] = None) -> None:
+    if actor_funcs is None:
+        get_actor_list(rom, actor_func)
+    else:
+        actor_funcs.append(actor_func)
 
 
 def get_override_itemid(override_table: Iterable[OverrideEntry], scene: int, type: int, flags: int) -> Optional[int]:
@@ -2488,7 +2586,7 @@ def remove_entrance_blockers(rom: Rom) -> None:
     get_actor_list(rom, remove_entrance_blockers_do)
 
 
-def set_cow_id_data(rom: Rom, world: World) -> None:
+def set_cow_id_data(rom: Rom, world: World, actor_funcs: Optional[list[Callable[[Rom, int, int, int], Any]]] = None) -> None:
     def set_cow_id(rom: Rom, actor_id: int, actor: int, scene: int) -> None:
         nonlocal last_scene
         nonlocal cow_count
@@ -2511,10 +2609,10 @@ def set_cow_id_data(rom: Rom, world: World) -> None:
     last_scene = -1
     cow_count = 1
 
-    get_actor_list(rom, set_cow_id)
+    patch_actors(rom, set_cow_id, actor_funcs)
 
 
-def set_grotto_shuffle_data(rom: Rom, world: World) -> None:
+def set_grotto_shuffle_data(rom: Rom, world: World, actor_funcs: Optional[list[Callable[[Rom, int, int, int], Any]]] = None) -> None:
     def override_grotto_data(rom: Rom, actor_id: int, actor: int, scene: int) -> None:
         if actor_id == 0x009B:  # Grotto
             actor_zrot = rom.read_int16(actor + 12)
@@ -2535,17 +2633,17 @@ def set_grotto_shuffle_data(rom: Rom, world: World) -> None:
             rom.write_int16(rom.sym('GROTTO_EXIT_LIST') + 2 * entrance.data['grotto_id'], entrance.replaces.data['index'])
 
     # Override grotto actors data with the new data
-    get_actor_list(rom, override_grotto_data)
+    patch_actors(rom, override_grotto_data, actor_funcs)
 
 
-def set_deku_salesman_data(rom: Rom) -> None:
+def set_deku_salesman_data(rom: Rom, actor_funcs: Optional[list[Callable[[Rom, int, int, int], Any]]] = None) -> None:
     def set_deku_salesman(rom: Rom, actor_id: int, actor: int, scene: int) -> None:
         if actor_id == 0x0195:  # Salesman
             actor_var = rom.read_int16(actor + 14)
             if actor_var == 6:
                 rom.write_int16(actor + 14, 0x0003)
 
-    get_actor_list(rom, set_deku_salesman)
+    patch_actors(rom, set_deku_salesman, actor_funcs)
 
 
 def set_jabu_stone_actors(rom: Rom, jabu_actor_type: int) -> None:
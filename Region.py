@@ -52,6 +52,8 @@ class Region:
         self.scene: Optional[str] = None
         self.is_boss_room: bool = False
         self.savewarp: Optional[Entrance] = None
+        # Index assigned by World.load_regions_from_json, used by Search to store reachability in arrays.
+        self.index: int = -1
 
     def copy(self) -> Region:
         new_region = Region(world=self.world, name=self.name, region_type=self.type)
@@ -72,6 +74,7 @@ class Region:
         new_region.scene = self.scene
         new_region.is_boss_room = self.is_boss_room
         new_region.savewarp = self.savewarp
+        new_region.index = self.index
 
         return new_region
 
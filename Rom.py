@@ -1,8 +1,11 @@
 from __future__ import annotations
+import bisect
 import copy
 import json
+import mmap
 import os
 import platform
+import re
 import subprocess
 from collections.abc import Iterator, Sequence
 from typing import Optional
@@ -13,6 +16,11 @@ from crc import calculate_crc
 from ntype import BigStream
 from version import base_version, branch_identifier, supplementary_version
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 DMADATA_START: int = 0x7430  # NTSC 1.0/1.1: 0x7430, NTSC 1.2: 0x7960, Debug: 0x012F70
 
 
@@ -21,10 +29,11 @@ class Rom(BigStream):
         super().__init__(bytearray())
 
         self.original: Rom = self
-        self.changed_address: dict[int, int] = {}
+        self.changed_ranges: ChangedRanges = ChangedRanges()
         self.changed_dma: dict[int, tuple[int, int, int]] = {}
         self.force_patch: list[int] = []
         self.dma: DMAIterator = DMAIterator(self, DMADATA_START)
+        self.source_file: Optional[str] = None
 
         with open(data_path('generated/symbols.json'), 'r') as stream:
             symbols = json.load(stream)
@@ -53,7 +62,8 @@ class Rom(BigStream):
 
         # Add file to maximum size
         self.buffer.extend(bytearray([0x00] * (0x4000000 - len(self.buffer))))
-        self.original = self.copy()
+        self.original = Rom()
+        self.original.buffer = map_rom_file(self.source_file, len(self.buffer)) or copy.copy(self.buffer)
 
         # Add version number to header.
         self.write_version_bytes()
@@ -61,7 +71,7 @@ class Rom(BigStream):
     def copy(self) -> Rom:
         new_rom: Rom = Rom()
         new_rom.buffer = copy.copy(self.buffer)
-        new_rom.changed_address = copy.copy(self.changed_address)
+        new_rom.changed_ranges = self.changed_ranges.copy()
         new_rom.changed_dma = copy.copy(self.changed_dma)
         new_rom.force_patch = copy.copy(self.force_patch)
         return new_rom
@@ -70,6 +80,7 @@ class Rom(BigStream):
         try:
             with open(input_file, 'rb') as stream:
                 self.buffer = bytearray(stream.read())
+            self.source_file = input_file
         except FileNotFoundError as ex:
             raise FileNotFoundError(f'Invalid path to Base ROM: "{input_file}"')
 
@@ -131,27 +142,33 @@ class Rom(BigStream):
 
     def write_byte(self, address: int, value: int) -> None:
         super().write_byte(address, value)
-        self.changed_address[self.last_address-1] = value
+        self.changed_ranges.add(self.last_address - 1, self.last_address)
 
     def write_bytes_restrictive(self, start: int, size: int, values: Sequence[int]) -> None:
-        for i in range(size):
-            address = start + i
-            should_write = True
-            for restrictiveBlock in restrictiveBytes:
-                # If i is between the start of restrictive zone [0] and start + size [1]
-                if restrictiveBlock[0] <= address < restrictiveBlock[0] + restrictiveBlock[1]:
-                    should_write = False
-                    break
-            if should_write:
-                self.write_byte(address, values[i])
+        # Write everything between the restrictive zones that overlap the values
+        end = start + size
+        address = start
+        for zone_start, zone_end in sorted((zone_start, zone_start + zone_size) for zone_start, zone_size in restrictiveBytes
+                                           if zone_start < end and zone_start + zone_size > start):
+            if zone_start > address:
+                self.write_bytes(address, values[address - start:zone_start - start])
+            address = max(address, zone_end)
+        if end > address:
+            self.write_bytes(address, values[address - start:end - start])
 
     def write_bytes(self, address: int, values: Sequence[int]) -> None:
         super().write_bytes(address, values)
-        self.changed_address.update(zip(range(address, address + len(values)), values))
+        self.changed_ranges.add(self.last_address - len(values), self.last_address)
 
+    # Every write goes through write_byte(s), so only the changed ranges can differ from the
+    # original. Copying just those back in place avoids allocating a new ROM for every world.
     def restore(self) -> None:
-        self.buffer = copy.copy(self.original.buffer)
-        self.changed_address = {}
+        if len(self.buffer) == len(self.original.buffer):
+            for start, end in self.changed_ranges:
+                self.buffer[start:end] = self.original.buffer[start:end]
+        else:
+            self.buffer = bytearray(self.original.buffer)
+        self.changed_ranges = ChangedRanges()
         self.changed_dma = {}
         self.force_patch = []
         self.last_address = 0
@@ -246,20 +263,144 @@ class Rom(BigStream):
                     from_file = old_dma_start
                 self.changed_dma[dma_entry.index] = (from_file, dma_start, dma_end - dma_start)
 
-    # This will rescan the entire ROM, compare to original ROM, and repopulate changed_address.
+    # This will rescan the entire ROM, compare to original ROM, and repopulate changed_ranges.
     def rescan_changed_bytes(self) -> None:
-        self.changed_address = {}
+        self.changed_ranges = ChangedRanges()
         size = len(self.buffer)
         original_size = len(self.original.buffer)
-        for i, byte in enumerate(self.buffer):
-            if i >= original_size:
-                self.changed_address[i] = byte
+        for start, end in changed_runs(self.buffer, self.original.buffer, 0, min(size, original_size)):
+            self.changed_ranges.add(start, end)
+        self.changed_ranges.add(min(size, original_size), max(size, original_size))
+
+
+# The unmodified ROM is only ever read, so when the ROM file that was read already has the full size
+# it is mapped read-only instead of kept as a private copy. Its pages are then shared with the
+# OS file cache and with every other process patching from the same file.
+def map_rom_file(file: str, size: int) -> Optional[mmap.mmap]:
+    try:
+        with open(file, 'rb') as stream:
+            if os.fstat(stream.fileno()).st_size != size:
+                return None
+            return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+# Returns the [start, end) runs of bytes that differ between two buffers within [start, end).
+# Equal chunks are skipped with a single memoryview comparison, only differing chunks are diffed.
+def changed_runs(buffer: bytearray, original: bytearray, start: int, end: int, chunk_size: int = 0x10000) -> list[tuple[int, int]]:
+    runs = []
+    with memoryview(buffer) as buffer_view, memoryview(original) as original_view:
+        for chunk_start in range(start, end, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, end)
+            new_chunk, old_chunk = buffer_view[chunk_start:chunk_end], original_view[chunk_start:chunk_end]
+            if new_chunk == old_chunk:
                 continue
-            orig_byte = self.original.read_byte(i)
-            if byte != orig_byte:
-                self.changed_address[i] = byte
-        if size < original_size:
-            self.changed_address.update(zip(range(size, original_size-1), [0]*(original_size-size)))
+            if numpy is not None:
+                chunk_runs = chunk_changed_runs_numpy(new_chunk, old_chunk)
+            else:
+                chunk_runs = chunk_changed_runs_python(new_chunk, old_chunk)
+            for run_start, run_end in chunk_runs:
+                run_start += chunk_start
+                run_end += chunk_start
+                # runs that continue over the end of a chunk are joined
+                if runs and runs[-1][1] == run_start:
+                    run_start = runs.pop()[0]
+                runs.append((run_start, run_end))
+            new_chunk.release()
+            old_chunk.release()
+    return runs
+
+
+def chunk_changed_runs_numpy(new_chunk: memoryview, old_chunk: memoryview) -> list[tuple[int, int]]:
+    changed = numpy.frombuffer(new_chunk, dtype=numpy.uint8) != numpy.frombuffer(old_chunk, dtype=numpy.uint8)
+    # every run starts and ends where the changed flag flips
+    edges = numpy.flatnonzero(numpy.diff(changed, prepend=False, append=False))
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+# The nonzero bytes of the XOR of two byte strings are the ones that differ
+nonzero_bytes = re.compile(rb'[^\x00]+')
+
+
+def chunk_changed_runs_python(new_chunk: memoryview, old_chunk: memoryview, block_size: int = 0x100) -> list[tuple[int, int]]:
+    runs = []
+    for block_start in range(0, len(new_chunk), block_size):
+        block_end = min(block_start + block_size, len(new_chunk))
+        if new_chunk[block_start:block_end] == old_chunk[block_start:block_end]:
+            continue
+        changed = (int.from_bytes(new_chunk[block_start:block_end], 'big') ^ int.from_bytes(old_chunk[block_start:block_end], 'big')).to_bytes(block_end - block_start, 'big')
+        for match in nonzero_bytes.finditer(changed):
+            run_start, run_end = block_start + match.start(), block_start + match.end()
+            if runs and runs[-1][1] == run_start:
+                run_start = runs.pop()[0]
+            runs.append((run_start, run_end))
+    return runs
+
+
+# The [start, end) spans of the ROM that have been written to, so patch creation only has to
+# look at the modified regions. Writes are appended as they come, extending the last span when
+# they continue it, and are sorted and merged whenever the spans are read.
+class ChangedRanges:
+    def __init__(self, ranges: Optional[list[tuple[int, int]]] = None) -> None:
+        self.ranges: list[tuple[int, int]] = [] if ranges is None else ranges
+        self.merged: bool = ranges is None
+        self.merged_count: int = 0
+
+    def add(self, start: int, end: int) -> None:
+        if start >= end:
+            return
+        if self.ranges:
+            last_start, last_end = self.ranges[-1]
+            if last_start <= start <= last_end:
+                if end > last_end:
+                    self.ranges[-1] = (last_start, end)
+                return
+            if start < last_end:
+                self.merged = False
+        self.ranges.append((start, end))
+        # Keep scattered writes from piling up
+        if not self.merged and len(self.ranges) > 2 * self.merged_count + 0x1000:
+            self.merge()
+
+    def merge(self) -> None:
+        if self.merged:
+            return
+        merged = []
+        for start, end in sorted(self.ranges):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        self.ranges = merged
+        self.merged = True
+        self.merged_count = len(merged)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        self.merge()
+        return iter(self.ranges)
+
+    def __len__(self) -> int:
+        self.merge()
+        return len(self.ranges)
+
+    def __contains__(self, address: int) -> bool:
+        self.merge()
+        index = bisect.bisect_right(self.ranges, (address, float('inf'))) - 1
+        return index >= 0 and self.ranges[index][1] > address
+
+    # Whether any byte in [start, end) changed.
+    def overlaps(self, start: int, end: int) -> bool:
+        self.merge()
+        index = bisect.bisect_left(self.ranges, (end,)) - 1
+        return index >= 0 and self.ranges[index][1] > start
+
+    def copy(self) -> ChangedRanges:
+        new_ranges = ChangedRanges(self.ranges.copy())
+        new_ranges.merged = self.merged
+        new_ranges.merged_count = self.merged_count
+        return new_ranges
 
 
 class DMAEntry:
@@ -1,8 +1,13 @@
 from __future__ import annotations
 import ast
+import hashlib
 import logging
+import marshal
+import os
 import re
+import sys
 from collections import defaultdict
+from types import FunctionType
 from typing import TYPE_CHECKING, Optional, Any
 
 from Entrance import Entrance
@@ -12,6 +17,12 @@ from Region import TimeOfDay
 from RulesCommon import AccessRule, allowed_globals, escape_name
 from State import State
 from Utils import data_path, read_logic_file
+from version import __version__
+
+if sys.version_info >= (3, 10):
+    from typing import TypeAlias
+else:
+    TypeAlias = str
 
 if TYPE_CHECKING:
     from World import World
@@ -37,6 +48,25 @@ allowed_globals.update(special_globals)
 rule_aliases: dict[str, tuple[list[re.Pattern[str]], str]] = {}
 nonaliases: set[str] = set()
 
+# A world or settings value a rule was compiled against: ('world' or 'setting', name, repr of the value or None if unset)
+RuleDependency: TypeAlias = "tuple[str, str, Optional[str]]"
+# An event a rule registers while being parsed: escaped name, only if it is a new item, create the event item
+RuleEvent: TypeAlias = "tuple[str, bool, bool]"
+
+
+class CompiledRule:
+    def __init__(self, dependencies: tuple[RuleDependency, ...], rule_str: str, access_rule: AccessRule, events: tuple[RuleEvent, ...]) -> None:
+        self.dependencies: tuple[RuleDependency, ...] = dependencies
+        self.rule_str: str = rule_str
+        self.access_rule: AccessRule = access_rule
+        self.events: tuple[RuleEvent, ...] = events
+
+
+# Rules compiled by any world in this process, so worlds with the same logic settings
+# (and repeat generations) skip the AST pipeline. Keyed by the rule string and whether
+# it was parsed for a GS token; every variant lists the values it was compiled against.
+compiled_rules: dict[tuple[str, bool], list[CompiledRule]] = {}
+
 
 def load_aliases() -> None:
     j = read_logic_file(data_path('LogicHelpers.json'))
@@ -56,6 +86,48 @@ def isliteral(expr: ast.expr) -> bool:
     return isinstance(expr, ast.Constant)
 
 
+# Anything that changes how a rule string is transformed invalidates the saved rule cache.
+def rule_cache_version() -> str:
+    version = hashlib.sha256(f'{__version__} {sys.version}'.encode())
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in ('RuleParser.py', 'RulesCommon.py', 'State.py', 'Item.py', 'ItemList.py'):
+        try:
+            with open(os.path.join(source_dir, filename), 'rb') as f:
+                version.update(f.read())
+        except OSError:
+            pass
+    with open(data_path('LogicHelpers.json'), 'rb') as f:
+        version.update(f.read())
+    return version.hexdigest()
+
+
+# Loads compiled rules saved by save_rule_cache. Returns whether the file could be used.
+def load_rule_cache(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            version, rules = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return False
+    if version != rule_cache_version():
+        return False
+    for key, variants in rules.items():
+        for dependencies, rule_str, code, events in variants:
+            access_rule = FunctionType(code, allowed_globals)
+            access_rule.__kwdefaults__ = dict(kwarg_defaults)
+            compiled_rules.setdefault(key, []).append(CompiledRule(dependencies, rule_str, access_rule, events))
+    return True
+
+
+def save_rule_cache(path: str) -> None:
+    rules = {
+        key: [(rule.dependencies, rule.rule_str, rule.access_rule.__code__, rule.events) for rule in variants]
+        for key, variants in compiled_rules.items()
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb') as f:
+        marshal.dump((rule_cache_version(), rules), f)
+
+
 class Rule_AST_Transformer(ast.NodeTransformer):
     def __init__(self, world: World) -> None:
         self.world: World = world
@@ -70,6 +142,40 @@ class Rule_AST_Transformer(ast.NodeTransformer):
             load_aliases()
         # final rule cache
         self.rule_cache: dict[str, AccessRule] = {}
+        # what the rule being parsed depends on, so it can be shared through compiled_rules
+        self.rule_dependencies: dict[tuple[str, str], Optional[str]] = {}
+        self.rule_events: list[RuleEvent] = []
+        self.rule_shareable: bool = True
+
+    # Lookups of world and settings values while parsing go through these,
+    # so the compiled rule records which values it was built from.
+    def current_dependency(self, kind: str, name: str) -> Optional[str]:
+        values = self.world.__dict__ if kind == 'world' else self.world.settings.settings_dict
+        return repr(values[name]) if name in values else None
+
+    def world_value(self, name: str) -> Any:
+        self.rule_dependencies[('world', name)] = self.current_dependency('world', name)
+        return self.world.__dict__.get(name, None)
+
+    def in_world(self, name: str) -> bool:
+        self.world_value(name)
+        return name in self.world.__dict__
+
+    def setting_value(self, name: str) -> Any:
+        self.rule_dependencies[('setting', name)] = self.current_dependency('setting', name)
+        return self.world.settings.settings_dict.get(name, None)
+
+    def in_settings(self, name: str) -> bool:
+        self.setting_value(name)
+        return name in self.world.settings.settings_dict
+
+    def add_event(self, name: str, only_new: bool, create: bool) -> None:
+        self.rule_events.append((name, only_new, create))
+        if not only_new or name not in ItemInfo.solver_ids:
+            self.events.add(name.replace('_', ' '))
+            if create:
+                # Ensure the item info is updated properly
+                Item(name, event=True)
 
     def visit_Name(self, node: ast.Name) -> Any:
         if node.id in dir(self):
@@ -88,19 +194,17 @@ class Rule_AST_Transformer(ast.NodeTransformer):
                     ctx=ast.Load()),
                 args=[node],
                 keywords=[])
-        elif node.id in self.world.__dict__:
-            return ast.parse('%r' % self.world.__dict__[node.id], mode='eval').body
-        elif node.id in self.world.settings.settings_dict:
+        elif self.in_world(node.id):
+            return ast.parse('%r' % self.world_value(node.id), mode='eval').body
+        elif self.in_settings(node.id):
             # Settings are constant
-            return ast.parse('%r' % self.world.settings.settings_dict[node.id], mode='eval').body
+            return ast.parse('%r' % self.setting_value(node.id), mode='eval').body
         elif node.id in State.__dict__:
             return self.make_call(node, node.id, [], [])
         elif node.id in kwarg_defaults or node.id in special_globals:
             return node
         elif event_name.match(node.id):
-            self.events.add(node.id.replace('_', ' '))
-            # Ensure the item info is updated properly
-            Item(node.id, event=True)
+            self.add_event(node.id, only_new=False, create=True)
             return ast.Call(
                 func=ast.Attribute(
                     value=ast.Name(id='state', ctx=ast.Load()),
@@ -113,9 +217,7 @@ class Rule_AST_Transformer(ast.NodeTransformer):
 
     def visit_Str(self, node: ast.Constant) -> Any:
         esc = escape_name(node.value)
-        if esc not in ItemInfo.solver_ids:
-            self.events.add(esc.replace('_', ' '))
-            Item(esc, event=True)
+        self.add_event(esc, only_new=True, create=True)
         return ast.Call(
             func=ast.Attribute(
                 value=ast.Name(id='state', ctx=ast.Load()),
@@ -147,10 +249,9 @@ class Rule_AST_Transformer(ast.NodeTransformer):
 
         if isinstance(count, ast.Name):
             # Must be a settings constant
-            count = ast.parse('%r' % self.world.settings.settings_dict[count.id], mode='eval').body
+            count = ast.parse('%r' % self.setting_value(count.id), mode='eval').body
 
-        if item.id not in ItemInfo.solver_ids:
-            self.events.add(item.id.replace('_', ' '))
+        self.add_event(item.id, only_new=True, create=False)
 
         return ast.Call(
             func=ast.Attribute(
@@ -186,7 +287,7 @@ class Rule_AST_Transformer(ast.NodeTransformer):
         new_args = []
         for child in node.args:
             if isinstance(child, ast.Name):
-                if child.id in self.world.__dict__:
+                if self.in_world(child.id):
                     child = ast.Attribute(
                         value=ast.Attribute(
                             value=ast.Name(id='state', ctx=ast.Load()),
@@ -194,7 +295,7 @@ class Rule_AST_Transformer(ast.NodeTransformer):
                             ctx=ast.Load()),
                         attr=child.id,
                         ctx=ast.Load())
-                elif child.id in self.world.settings.settings_dict:
+                elif self.in_settings(child.id):
                     child = ast.Attribute(
                         value=ast.Attribute(
                             value=ast.Attribute(
@@ -246,8 +347,8 @@ class Rule_AST_Transformer(ast.NodeTransformer):
         # Fast check for json can_use
         if (len(node.ops) == 1 and isinstance(node.ops[0], ast.Eq)
                 and isinstance(node.left, ast.Name) and isinstance(node.comparators[0], ast.Name)
-                and node.left.id not in self.world.__dict__ and node.comparators[0].id not in self.world.__dict__
-                and node.left.id not in self.world.settings.settings_dict and node.comparators[0].id not in self.world.settings.settings_dict):
+                and not self.in_world(node.left.id) and not self.in_world(node.comparators[0].id)
+                and not self.in_settings(node.left.id) and not self.in_settings(node.comparators[0].id)):
             return ast.Constant(node.left.id == node.comparators[0].id)
 
         node.left = escape_or_string(node.left)
@@ -295,8 +396,8 @@ class Rule_AST_Transformer(ast.NodeTransformer):
             if isinstance(elt, ast.Constant) and isinstance(elt.value, str):
                 items.add(escape_name(elt.value))
             elif (isinstance(elt, ast.Name) and elt.id not in rule_aliases
-                    and elt.id not in self.world.__dict__
-                    and elt.id not in self.world.settings.settings_dict
+                    and not self.in_world(elt.id)
+                    and not self.in_settings(elt.id)
                     and elt.id not in dir(self)
                     and elt.id not in State.__dict__):
                 items.add(elt.id)
@@ -358,6 +459,8 @@ class Rule_AST_Transformer(ast.NodeTransformer):
             keywords=keywords)
 
     def replace_subrule(self, target: str, node: ast.AST) -> ast.Call:
+        # Subrules are events of this world, so the rule using them can't be shared.
+        self.rule_shareable = False
         rule = ast.dump(node, False)
         if rule in self.replaced_rules[target]:
             return self.replaced_rules[target][rule]
@@ -398,14 +501,15 @@ class Rule_AST_Transformer(ast.NodeTransformer):
                 if access_rule is self.rule_cache.get('NameConstant(True)') or access_rule is self.rule_cache.get('Constant(True)'):
                     event.always = True
                 event.set_rule(access_rule)
-                region.locations.append(event)
+                self.world.add_location(region, event)
 
                 make_event_item(subrule_name, event)
         # Safeguard in case this is called multiple times per world
         self.delayed_rules.clear()
 
-    def make_access_rule(self, body: ast.AST) -> AccessRule:
-        rule_str = ast.dump(body, False)
+    def make_access_rule(self, body: ast.AST, rule_str: Optional[str] = None) -> AccessRule:
+        if rule_str is None:
+            rule_str = ast.dump(body, False)
         if rule_str not in self.rule_cache:
             # requires consistent iteration on dicts
             kwargs = [ast.arg(arg=k) for k in kwarg_defaults.keys()]
@@ -450,24 +554,26 @@ class Rule_AST_Transformer(ast.NodeTransformer):
     ## Handlers for compile-time optimizations (former State functions)
 
     def at_day(self, node: ast.Call) -> ast.expr:
-        if self.world.ensure_tod_access:
+        if self.world_value('ensure_tod_access'):
             # tod has DAY or (tod == NONE and (ss or find a path from a provider))
             # parsing is better than constructing this expression by hand
             return ast.parse("(tod & TimeOfDay.DAY) if tod else ((state.has_all_of((Ocarina, Suns_Song)) and state.has_all_notes_for_song('Suns Song')) or state.search.can_reach(spot.parent_region, age=age, tod=TimeOfDay.DAY))", mode='eval').body
         return ast.Constant(True)
 
     def at_dampe_time(self, node: ast.Call) -> ast.expr:
-        if self.world.ensure_tod_access:
+        if self.world_value('ensure_tod_access'):
             # tod has DAMPE or (tod == NONE and (find a path from a provider))
             # parsing is better than constructing this expression by hand
             return ast.parse("(tod & TimeOfDay.DAMPE) if tod else state.search.can_reach(spot.parent_region, age=age, tod=TimeOfDay.DAMPE)", mode='eval').body
         return ast.Constant(True)
 
     def at_night(self, node: ast.Call) -> ast.expr:
-        if self.current_spot.type == 'GS Token' and self.world.settings.logic_no_night_tokens_without_suns_song:
-            # Using visit here to resolve 'can_play' rule
-            return self.visit(ast.parse('can_play(Suns_Song)', mode='eval').body)
-        if self.world.ensure_tod_access:
+        if self.current_spot.type == 'GS Token':
+            self.setting_value('logic_no_night_tokens_without_suns_song')
+            if self.world.settings.logic_no_night_tokens_without_suns_song:
+                # Using visit here to resolve 'can_play' rule
+                return self.visit(ast.parse('can_play(Suns_Song)', mode='eval').body)
+        if self.world_value('ensure_tod_access'):
             # tod has DAMPE or (tod == NONE and (ss or find a path from a provider))
             # parsing is better than constructing this expression by hand
             return ast.parse("(tod & TimeOfDay.DAMPE) if tod else ((state.has_all_of((Ocarina, Suns_Song)) and state.has_all_notes_for_song('Suns Song')) or state.search.can_reach(spot.parent_region, age=age, tod=TimeOfDay.DAMPE))", mode='eval').body
@@ -477,7 +583,23 @@ class Rule_AST_Transformer(ast.NodeTransformer):
     # If spot is None, here() rules won't work.
     def parse_rule(self, rule_string: str, spot: Optional[Location | Entrance] = None) -> AccessRule:
         self.current_spot = spot
-        return self.make_access_rule(self.visit(ast.parse(rule_string, mode='eval').body))
+        key = (rule_string, spot is not None and spot.type == 'GS Token')
+        for compiled in compiled_rules.get(key, ()):
+            if all(self.current_dependency(kind, name) == value for kind, name, value in compiled.dependencies):
+                for event in compiled.events:
+                    self.add_event(*event)
+                return self.rule_cache.setdefault(compiled.rule_str, compiled.access_rule)
+
+        self.rule_dependencies = {}
+        self.rule_events = []
+        self.rule_shareable = True
+        body = self.visit(ast.parse(rule_string, mode='eval').body)
+        rule_str = ast.dump(body, False)
+        access_rule = self.make_access_rule(body, rule_str)
+        if self.rule_shareable:
+            dependencies = tuple((kind, name, value) for (kind, name), value in self.rule_dependencies.items())
+            compiled_rules.setdefault(key, []).append(CompiledRule(dependencies, rule_str, access_rule, tuple(self.rule_events)))
+        return access_rule
 
     def parse_spot_rule(self, spot: Location | Entrance) -> None:
         rule = spot.rule_string.split('#', 1)[0].strip()
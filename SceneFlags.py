@@ -6,44 +6,40 @@ if TYPE_CHECKING:
     from Location import Location
     from World import World
 
+# Location types that use our flag system
+XFLAG_LOCATION_TYPES: frozenset[str] = frozenset(("Freestanding", "Pot", "FlyingPot", "Crate", "SmallCrate", "Beehive", "RupeeTower", "SilverRupee", "Wonderitem"))
+
+
 # Loop through all of the locations in the world. Extract ones that use our flag system to start building our xflag tables
 def build_xflags_from_world(world: World) ->  tuple[dict[int, dict[tuple[int, int], list[tuple[int, int]]]], list[tuple[Location, tuple[int, int, int, int], tuple[int, int, int, int]]]]:
     scene_flags = {}
     alt_list = []
     for i in range(0, 101):
-        scene_flags[i] = {}
-        for location in world.get_locations():
-            if location.scene == i and location.type in ["Freestanding", "Pot", "FlyingPot", "Crate", "SmallCrate", "Beehive", "RupeeTower", "SilverRupee", "Wonderitem"]:
-                default = location.default
-                if isinstance(default, list):  # List of alternative room/setup/flag to use
-                    primary_tuple = default[0]
-                    if len(primary_tuple) == 3:
-                        room, setup, flag = primary_tuple
-                        subflag = 0
-                        primary_tuple = (room, setup, flag, subflag)
-                    for c in range(1, len(default)):
-                        alt = default[c]
-                        if len(alt) == 3:
-                            room, setup, flag = alt
-                            subflag = 0
-                            alt = (room, setup, flag, subflag)
-                        alt_list.append((location, alt, primary_tuple))
-                    default = primary_tuple  # Use the first tuple as the primary tuple
-                if isinstance(default, tuple):
-                    if len(default) == 3:
-                        room, setup, flag = default
-                        subflag = 0
-                    elif len(default) == 4:
-                        room, setup, flag, subflag = default
-                    room_setup = (setup, room)
-                    if not room_setup in scene_flags[i].keys():
-                        scene_flags[i][room_setup] = []
-                    scene_flags[i][room_setup].append((flag, subflag))
-
-        if len(scene_flags[i].keys()) == 0:
-            del scene_flags[i]
+        room_flags = {}
+        for location in world.get_scene_locations(i, XFLAG_LOCATION_TYPES):
+            default = location.default
+            if isinstance(default, list):  # List of alternative room/setup/flag to use
+                primary_tuple = get_flag_tuple(default[0])
+                for alt in default[1:]:
+                    alt_list.append((location, get_flag_tuple(alt), primary_tuple))
+                default = primary_tuple  # Use the first tuple as the primary tuple
+            if isinstance(default, tuple):
+                room, setup, flag, subflag = get_flag_tuple(default)
+                room_flags.setdefault((setup, room), []).append((flag, subflag))
+
+        if room_flags:
+            scene_flags[i] = room_flags
     return scene_flags, alt_list
 
+
+# Location defaults are (room, setup, flag) or (room, setup, flag, subflag) tuples. Add the subflag if it's missing
+def get_flag_tuple(default: tuple[int, ...]) -> tuple[int, int, int, int]:
+    if len(default) == 3:
+        room, setup, flag = default
+        return room, setup, flag, 0
+    return default
+
+
 # Take the data from build_xflags_from_world and create the actual tables that will be stored in the ROM
 def build_xflag_tables(xflags: dict[int, dict[tuple[int,int], list[tuple[int,int]]]]) -> tuple[bytearray, bytearray, bytearray, int]:
     scene_table = bytearray([0xFF] * 202)
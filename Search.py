@@ -1,5 +1,4 @@
 from __future__ import annotations
-import copy
 import itertools
 import sys
 from collections.abc import Callable, Iterable
@@ -23,19 +22,29 @@ if TYPE_CHECKING:
 ValidGoals: TypeAlias = "dict[str, bool | dict[str, list[int] | dict[int, list[str]]]]"
 
 
+# Flag stored alongside the TimeOfDay bits in the region arrays to mark a region as reached.
+REACHED: int = 0x80
+
+
 @dataclass
 class SearchCache:
+    # Regions and locations of all worlds are stored in bytearrays indexed by
+    # Region.index and Location.index, so that copying a cache is a handful
+    # of memcpys rather than rebuilding dicts and sets.
     child_queue: list[Entrance] = field(default_factory=list)
     adult_queue: list[Entrance] = field(default_factory=list)
-    visited_locations: set[Location] = field(default_factory=set)
-    child_regions: dict[Region, int] = field(default_factory=dict)
-    adult_regions: dict[Region, int] = field(default_factory=dict)
+    visited_locations: bytearray = field(default_factory=bytearray)
+    child_regions: bytearray = field(default_factory=bytearray)
+    adult_regions: bytearray = field(default_factory=bytearray)
 
     def copy(self) -> SearchCache:
-        new = type(self)()
-        for name, value in self.__dict__.items():
-            setattr(new, name, copy.copy(value))
-        return new
+        return SearchCache(
+            child_queue=self.child_queue[:],
+            adult_queue=self.adult_queue[:],
+            visited_locations=self.visited_locations[:],
+            child_regions=self.child_regions[:],
+            adult_regions=self.adult_regions[:],
+        )
 
 
 class Search:
@@ -53,18 +62,26 @@ class Search:
             self.cached_spheres = [self._cache]
         else:
             root_regions = [state.world.get_region('Root') for state in self.state_list]
-            # The cache is a dict with 5 values:
-            #  child_regions, adult_regions: maps of Region -> tod, all the regions in that sphere
-            #    values are lazily-determined tod flags (see TimeOfDay).
+            # The cache holds 5 values:
+            #  child_regions, adult_regions: arrays indexed by Region.index of all the regions
+            #    in that sphere. Non-zero entries are reached regions, the low bits
+            #    are lazily-determined tod flags (see TimeOfDay).
             #  child_queue, adult_queue: queue of Entrance, all the exits to try next sphere
-            #  visited_locations: set of Locations visited in or before that sphere.
+            #  visited_locations: array indexed by Location.index of the Locations
+            #    visited in or before that sphere.
+            world_count = max(state.world.settings.world_count for state in self.state_list)
+            region_slots = world_count * max(len(state.world.regions) for state in self.state_list)
+            location_slots = world_count * max(state.world.location_count for state in self.state_list)
             self._cache = SearchCache(
                 child_queue=list(exit for region in root_regions for exit in region.exits),
                 adult_queue=list(exit for region in root_regions for exit in region.exits),
-                visited_locations=set(),
-                child_regions={region: TimeOfDay.NONE for region in root_regions},
-                adult_regions={region: TimeOfDay.NONE for region in root_regions},
+                visited_locations=bytearray(location_slots),
+                child_regions=bytearray(region_slots),
+                adult_regions=bytearray(region_slots),
             )
+            for region in root_regions:
+                self._cache.child_regions[region.index] = REACHED
+                self._cache.adult_regions[region.index] = REACHED
             self.cached_spheres = [self._cache]
             self.next_sphere()
 
@@ -73,6 +90,25 @@ class Search:
         # copy always makes a nonreversible instance
         return Search(self.state_list, initial_cache=self._cache.copy())
 
+    # Makes a search over copies of the given states that resumes from this search's sphere cache.
+    # Only valid if everything this search reached is also reachable with those states, so that
+    # continuing to explore converges on the same result as exploring them from scratch.
+    # collected_items are the items this search picked up beyond what those states already hold,
+    # they are collected into the new search to match what it would have found on its own.
+    def resume_with(self, state_list: Iterable[State], collected_items: Iterable[Item]) -> Search:
+        search = Search(state_list, initial_cache=self._cache.copy())
+        search.collect_all(collected_items)
+        return search
+
+    # Queues exits connected after this search already explored their parent regions,
+    # so that the next sphere tries them like any other exit.
+    def queue_exits(self, exits: Iterable[Entrance]) -> None:
+        for exit in exits:
+            if self._cache.child_regions[exit.parent_region.index]:
+                self._cache.child_queue.append(exit)
+            if self._cache.adult_regions[exit.parent_region.index]:
+                self._cache.adult_queue.append(exit)
+
     def collect_all(self, itempool: Iterable[Item]) -> None:
         for item in itempool:
             if item.solver_id is not None and item.world is not None:
@@ -126,36 +162,35 @@ class Search:
     # Internal to the iteration. Modifies the exit_queue, regions.
     # Returns a queue of the exits whose access rule failed,
     # as a cache for the exits to try on the next iteration.
-    def _expand_regions(self, exit_queue: list[Entrance], regions: dict[Region, int], age: Optional[str]) -> list[Entrance]:
+    def _expand_regions(self, exit_queue: list[Entrance], regions: bytearray, age: Optional[str]) -> list[Entrance]:
         failed = []
         for exit in exit_queue:
-            if exit.world and exit.connected_region and exit.connected_region not in regions:
+            if exit.world and exit.connected_region and not regions[exit.connected_region.index]:
                 # Evaluate the access rule directly, without tod
                 if exit.access_rule(self.state_list[exit.world.id], spot=exit, age=age):
                     # If it found a new tod, make sure we try other entrances again.
                     # Probably would take too long and not be worth it if we only grabbed the exits
                     # for the given world...
-                    if exit.connected_region.provides_time and ~regions[exit.world.get_region('Root')] & exit.connected_region.provides_time:
+                    if exit.connected_region.provides_time and ~regions[exit.world.get_region('Root').index] & exit.connected_region.provides_time:
                         exit_queue.extend(failed)
                         failed = []
-                        regions[exit.world.get_region('Root')] |= exit.connected_region.provides_time
-                    regions[exit.connected_region] = exit.connected_region.provides_time
+                        regions[exit.world.get_region('Root').index] |= exit.connected_region.provides_time
+                    regions[exit.connected_region.index] = REACHED | exit.connected_region.provides_time
                     exit_queue.extend(exit.connected_region.exits)
                 else:
                     failed.append(exit)
         return failed
 
-    def _expand_tod_regions(self, regions: dict[Region, int], goal_region: Region, age: Optional[str], tod: int) -> bool:
+    def _expand_tod_regions(self, regions: bytearray, goal_region: Region, age: Optional[str], tod: int) -> bool:
         # grab all the exits from the regions with the given tod in the same world as our goal.
         # we want those that go to existing regions without the tod, until we reach the goal.
-        has_tod_world = lambda regtod: regtod[1] & tod and regtod[0].world == goal_region.world
-        exit_queue = list(itertools.chain.from_iterable(region.exits for region, _ in filter(has_tod_world, regions.items())))
+        exit_queue = list(itertools.chain.from_iterable(region.exits for region in goal_region.world.regions if regions[region.index] & tod))
         for exit in exit_queue:
             # We don't look for new regions, just spreading the tod to our existing regions
-            if exit.connected_region in regions and tod & ~regions[exit.connected_region]:
+            if exit.connected_region and regions[exit.connected_region.index] and tod & ~regions[exit.connected_region.index]:
                 # Evaluate the access rule directly
                 if exit.access_rule(self.state_list[exit.world.id], spot=exit, age=age, tod=tod):
-                    regions[exit.connected_region] |= tod
+                    regions[exit.connected_region.index] |= tod
                     if exit.connected_region == goal_region:
                         return True
                     exit_queue.extend(exit.connected_region.exits)
@@ -166,7 +201,7 @@ class Search:
     # the regions accessible as adult, and the set of visited locations.
     # These are references to the new entry in the cache, so they can be modified
     # directly.
-    def next_sphere(self) -> tuple[dict[Region, int], dict[Region, int], set[Location]]:
+    def next_sphere(self) -> tuple[bytearray, bytearray, bytearray]:
         # Use the queue to iteratively add regions to the accessed set,
         # until we are stuck or out of regions.
 
@@ -186,6 +221,8 @@ class Search:
     # locations to see if the game is beatable. Collection should be done
     # using internal State (recommended to just call search.collect).
     def iter_reachable_locations(self, item_locations: Iterable[Location]) -> Iterable[Location]:
+        # Visited locations are dropped as we go, so each pass only checks the ones still left.
+        pending_locations = list(item_locations)
         had_reachable_locations = True
         # will loop as long as any visits were made, and at least once
         while had_reachable_locations:
@@ -194,24 +231,29 @@ class Search:
             # Get all locations in accessible_regions that aren't visited,
             # and check if they can be reached. Collect them.
             had_reachable_locations = False
-            for loc in item_locations:
-                if loc in visited_locations:
+            remaining_locations = []
+            for loc in pending_locations:
+                if visited_locations[loc.index]:
                     continue
                 # Check adult first; it's the most likely.
-                if (loc.parent_region in adult_regions
+                if (adult_regions[loc.parent_region.index]
                         and loc.access_rule(self.state_list[loc.world.id], spot=loc, age='adult')):
                     had_reachable_locations = True
                     # Mark it visited for this algorithm
-                    visited_locations.add(loc)
+                    visited_locations[loc.index] = 1
                     yield loc
 
-                elif (loc.parent_region in child_regions
+                elif (child_regions[loc.parent_region.index]
                       and loc.access_rule(self.state_list[loc.world.id], spot=loc, age='child')):
                     had_reachable_locations = True
                     # Mark it visited for this algorithm
-                    visited_locations.add(loc)
+                    visited_locations[loc.index] = 1
                     yield loc
 
+                else:
+                    remaining_locations.append(loc)
+            pending_locations = remaining_locations
+
     # This collects all item locations available in the state list given that
     # the states have collected items. The purpose is that it will search for
     # all new items that become accessible with a new item set.
@@ -266,11 +308,11 @@ class Search:
             valid_goals['way of the hero'] = False
         return valid_goals
 
-    def beatable_goals(self, goal_categories: dict[str, GoalCategory]) -> ValidGoals:
+    def beatable_goals(self, goal_categories: dict[str, GoalCategory], item_locations: Optional[Iterable[Location]] = None) -> ValidGoals:
         # collect all available items
         # make a new search since we might be iterating over one already
         search = self.copy()
-        search.collect_locations()
+        search.collect_locations(item_locations)
         valid_goals = search.test_category_goals(goal_categories)
         if all(map(State.won, search.state_list)):
             valid_goals['way of the hero'] = True
@@ -311,7 +353,7 @@ class Search:
             for location in state.world.distribution.skipped_locations:
                 # We need to use the locations in the current world
                 location = state.world.get_location(location.name)
-                self._cache.visited_locations.add(location)
+                self._cache.visited_locations[location.index] = 1
                 yield location
 
     def collect_pseudo_starting_items(self) -> None:
@@ -323,15 +365,17 @@ class Search:
     # Implicitly requires is_starting_age or Time_Travel.
     def can_reach(self, region: Region, age: Optional[str] = None, tod: int = TimeOfDay.NONE) -> bool:
         if age == 'adult':
+            reached = self._cache.adult_regions[region.index]
             if tod:
-                return region in self._cache.adult_regions and (self._cache.adult_regions[region] & tod or self._expand_tod_regions(self._cache.adult_regions, region, age, tod))
+                return bool(reached and (reached & tod or self._expand_tod_regions(self._cache.adult_regions, region, age, tod)))
             else:
-                return region in self._cache.adult_regions
+                return bool(reached)
         elif age == 'child':
+            reached = self._cache.child_regions[region.index]
             if tod:
-                return region in self._cache.child_regions and (self._cache.child_regions[region] & tod or self._expand_tod_regions(self._cache.child_regions, region, age, tod))
+                return bool(reached and (reached & tod or self._expand_tod_regions(self._cache.child_regions, region, age, tod)))
             else:
-                return region in self._cache.child_regions
+                return bool(reached)
         elif age == 'both':
             return self.can_reach(region, age='adult', tod=tod) and self.can_reach(region, age='child', tod=tod)
         else:
@@ -345,16 +389,19 @@ class Search:
     # Use the cache in the search to determine location reachability.
     # Only works for locations that had progression items...
     def visited(self, location: Location) -> bool:
-        return location in self._cache.visited_locations
+        return location.index is not None and bool(self._cache.visited_locations[location.index])
 
     # Use the cache in the search to get all reachable regions.
     def reachable_regions(self, age: Optional[str] = None) -> set[Region]:
         if age == 'adult':
-            return set(self._cache.adult_regions.keys())
+            return self._regions_in(self._cache.adult_regions)
         elif age == 'child':
-            return set(self._cache.child_regions.keys())
+            return self._regions_in(self._cache.child_regions)
         else:
-            return set(self._cache.adult_regions.keys()).union(self._cache.child_regions.keys())
+            return self._regions_in(self._cache.adult_regions).union(self._regions_in(self._cache.child_regions))
+
+    def _regions_in(self, regions: bytearray) -> set[Region]:
+        return {region for state in self.state_list for region in state.world.regions if regions[region.index]}
 
     # Returns whether the given age can access the spot at this age and tod,
     # by checking whether the search has reached the containing region, and evaluating the spot's access rule.
@@ -379,11 +426,11 @@ class RewindableSearch(Search):
         # in the top two caches (if it's the first being unvisited for a sphere)
         # in the topmost cache only (otherwise)
         # After we unvisit every location in a sphere, the top two caches have identical visited locations.
-        assert location in self.cached_spheres[-1].visited_locations
-        if location in self.cached_spheres[-2].visited_locations:
+        assert self.cached_spheres[-1].visited_locations[location.index]
+        if self.cached_spheres[-2].visited_locations[location.index]:
             self.cached_spheres.pop()
             self._cache = self.cached_spheres[-1]
-        self._cache.visited_locations.discard(location)
+        self._cache.visited_locations[location.index] = 0
 
     def reset(self) -> None:
         self._cache = self.cached_spheres[0]
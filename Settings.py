@@ -386,7 +386,7 @@ class Settings(SettingInfos):
 
 
 # gets the randomizer settings, whether to open the gui, and the logger level from command line arguments
-def get_settings_from_command_line_args() -> tuple[Settings, bool, str, bool, str]:
+def get_settings_from_command_line_args() -> tuple[Settings, bool, str, bool, str, Optional[int], int, Optional[str]]:
     parser = argparse.ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
 
     parser.add_argument('--gui', help='Launch the GUI', action='store_true')
@@ -399,6 +399,9 @@ def get_settings_from_command_line_args() -> tuple[Settings, bool, str, bool, st
     parser.add_argument('--no_log', help='Suppresses the generation of a log file.', action='store_true')
     parser.add_argument('--output_settings', help='Always outputs a settings.json file even when spoiler is enabled.', action='store_true')
     parser.add_argument('--diff_rom', help='Generates a ZPF patch from the specified ROM file.')
+    parser.add_argument('--batch_workers', type=int, help='When generating more than one seed, spread them over this many worker processes. 0 uses one per CPU core.')
+    parser.add_argument('--batch_retries', type=int, default=1, help='How many times a failed seed is retried in batch mode. A seed fails the same way every time it is generated, so this only helps when its worker process dies, for example from running out of memory.')
+    parser.add_argument('--rule_cache', help='Reuse the compiled logic rules saved in this file, and save the rules compiled by this run to it.')
 
     args = parser.parse_args()
     settings_base = {}
@@ -456,4 +459,4 @@ def get_settings_from_command_line_args() -> tuple[Settings, bool, str, bool, st
             print(settings.get_settings_string())
         sys.exit(0)
 
-    return settings, args.gui, args.loglevel, args.no_log, args.diff_rom
+    return settings, args.gui, args.loglevel, args.no_log, args.diff_rom, args.batch_workers, args.batch_retries, args.rule_cache
@@ -11,9 +11,9 @@ from Location import LocationIterator
 from LocationList import location_table
 from Models import get_model_choices
 from SettingsListTricks import logic_tricks
-from SettingTypes import SettingInfo, SettingInfoStr, SettingInfoList, SettingInfoDict, Textbox, Button, Checkbutton, \
-    Combobox, Radiobutton, Fileinput, Directoryinput, Textinput, ComboboxInt, Scale, Numberinput, MultipleSelect, \
-    SearchBox
+from SettingTypes import SettingInfo, SettingInfoStr, SettingInfoInt, SettingInfoList, SettingInfoDict, Textbox, Button, \
+    Checkbutton, Combobox, Radiobutton, Fileinput, Directoryinput, Textinput, ComboboxInt, Scale, Numberinput, \
+    MultipleSelect, SearchBox
 import Sounds
 import StartingItems
 from Utils import data_path
@@ -32,6 +32,8 @@ class SettingInfos:
     patch_without_output = Checkbutton(None)
     generating_patch_file = Checkbutton(None)
     output_file = SettingInfoStr(None, None)
+    patch_workers = SettingInfoInt(None, None, False, default=1)  # Processes creating multiworld patch files, 0 for one per CPU.
+    goal_workers = SettingInfoInt(None, None, False, default=1)  # Processes searching multiworld goal categories, 0 for one per CPU.
     seed = SettingInfoStr(None, None)
 
     # GUI Only Buttons/Text
@@ -3,7 +3,7 @@ import logging
 import random
 from collections import OrderedDict
 from itertools import chain
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Optional
 
 from Item import Item
 from LocationList import location_sort_order
@@ -13,7 +13,7 @@ if TYPE_CHECKING:
     from Dungeon import Dungeon
     from Entrance import Entrance
     from Goals import GoalCategory
-    from Hints import GossipText
+    from Hints import GossipText, HintReachability
     from Location import Location
     from Region import Region
     from Settings import Settings
@@ -76,6 +76,7 @@ class Spoiler:
         self.goal_locations: dict[int, dict[str, dict[str, dict[int, list[Location]]]]] = {}
         self.goal_categories: dict[int, dict[str, GoalCategory]] = {}
         self.hints: dict[int, dict[int, GossipText]] = {world.id: {} for world in worlds}
+        self.hint_reachability: Optional[HintReachability] = None
         self.file_hash: list[int] = []
         self.password: list[int] = []
 
@@ -238,19 +239,31 @@ class Spoiler:
                         required_locations.append(location)
 
         # Reduce each entrance sphere in reverse order, by checking if the game is beatable when we disconnect the entrance.
+        # explored_search holds everything reachable with the entrances connected so far. An entrance it can't
+        # pass through was never used to reach anything, so disconnecting it changes nothing and the game
+        # stays beatable without having to search again.
         required_entrances = []
+        explored_search = Search([world.state for world in worlds])
+        explored_search.collect_locations()
         for sphere in reversed(entrance_spheres):
             random.shuffle(sphere)
             for entrance in sphere:
+                if not explored_search.spot_access(entrance):
+                    entrance.disconnect()
+                    continue
+
                 # we disconnect the entrance and check if the game is still beatable
                 old_connected_region = entrance.disconnect()
 
                 # we use a new search to ensure the disconnected entrance is no longer used
                 sub_search = Search([world.state for world in worlds])
+                sub_search.collect_locations()
 
                 # Test whether the game is still beatable from here.
                 logger.debug('Checking if reaching %s, through %s, is required to beat the game.', old_connected_region.name, entrance.name)
-                if not sub_search.can_beat_game():
+                if sub_search.can_beat_game(False):
+                    explored_search = sub_search
+                else:
                     # still required, so reconnect the entrance
                     entrance.connect(old_connected_region)
                     required_entrances.append(entrance)
@@ -31,8 +31,8 @@ class State:
     def copy(self, new_world: Optional[World] = None) -> State:
         new_world = new_world if new_world else self.world
         new_state = State(new_world)
-        for i, val in enumerate(self.solv_items):
-            new_state.solv_items[i] = val
+        # solver ids may have been added since this state was created, so only overwrite the prefix
+        new_state.solv_items[:len(self.solv_items)] = self.solv_items
         return new_state
 
     def item_name(self, location: str | Location) -> Optional[str]:
@@ -3,26 +3,46 @@
 # See `python -m unittest -h` or `pytest -h` for more options.
 
 from __future__ import annotations
+import gzip
 import json
 import logging
+import multiprocessing
 import os
 import random
 import re
+import tempfile
 import unittest
 from collections import Counter, defaultdict
+from types import SimpleNamespace
 from typing import Literal, Optional, Any, overload
+from unittest import mock
 
-from EntranceShuffle import EntranceShuffleError
+from Entrance import Entrance
+from EntranceShuffle import EntranceShuffleError, ValidationSearch
 from Fill import ShuffleError
+import Goals
 from Hints import HintArea, build_misc_item_hints
 from Item import ItemInfo
 from ItemPool import remove_junk_items, remove_junk_ludicrous_items, ludicrous_items_base, ludicrous_items_extended, trade_items, ludicrous_exclusions
 from LocationList import location_is_viewable
-from Main import main, resolve_settings, build_world_graphs
+import Main
+from Main import PatchFileContext, build_world_graphs, create_patch_files_parallel, main, main_batch, prepare_rom, resolve_settings, write_patch_file
+from MBSDIFFPatch import apply_minibsdiff_patch_file
 from Messages import Message, read_messages, shuffle_messages
+from MQ import Scene, apply_scene_patch, get_compiled_scene_patches, get_json, patch_files, write_scene_data
+from Models import scan
+from N64Patch import apply_patch_file, create_patch_file
 from Settings import Settings, get_preset_files
 from Spoiler import Spoiler
-from Rom import Rom
+from Patches import build_scene_actor_index, get_actor_index, get_actor_lists, get_base_actor_index, set_cow_id_data, set_deku_salesman_data, set_grotto_shuffle_data
+from Rom import Rom, ChangedRanges, changed_runs, chunk_changed_runs_python, DMADATA_START
+from RuleParser import compiled_rules, load_rule_cache, save_rule_cache
+from Search import Search
+from Utils import data_path, parse_logic_file, read_logic_file
+from crc import calculate_crc_numpy, calculate_crc_python
+from texture_util import ci4_rgba16patch_to_ci8, ci4_rgba16patch_to_ci8_numpy, rgba16_patch, rgba16_patch_numpy
+import texture_util
+from ntype import BigStream
 
 test_dir = os.path.join(os.path.dirname(__file__), 'tests')
 output_dir = os.path.join(test_dir, 'Output')
@@ -547,6 +567,23 @@ class TestPlandomizer(unittest.TestCase):
 
 
 class TestHints(unittest.TestCase):
+    def test_goal_workers(self):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.skipTest("Goal searches only run in parallel in forked processes.")
+        with open(os.path.join(test_dir, 'triforce-multiworld.sav')) as f:
+            settings_dict = json.load(f)
+        # Without the triforce hunt, the rainbow bridge is a locked goal category.
+        settings_dict['triforce_hunt'] = False
+        spoilers = []
+        for goal_workers in (1, 2):
+            settings = make_settings_for_test({**settings_dict, 'goal_workers': goal_workers}, seed='TESTTESTTEST', outfilename=f'goal-workers-{goal_workers}')
+            with mock.patch.object(Goals, 'search_locked_goals_parallel', wraps=Goals.search_locked_goals_parallel) as parallel_search:
+                main(settings)
+            self.assertEqual(parallel_search.called, goal_workers > 1)
+            spoilers.append(load_spoiler(f'{settings.output_file}_Spoiler.json'))
+        for key in (':goal_locations', ':woth_locations', ':barren_regions', 'gossip_stones'):
+            self.assertEqual(spoilers[0][key], spoilers[1][key])
+
     def test_skip_zelda(self):
         # Song from Impa would be WotH, but instead of relying on random chance to get HC WotH,
         # just exclude all other locations to see if HC is barren.
@@ -662,6 +699,453 @@ class TestEntranceRandomizer(unittest.TestCase):
             with self.assertRaises(EntranceShuffleError):
                 build_world_graphs(settings)
 
+    def test_validation_search_matches_max_explore(self):
+        # Validating placements resumes a search kept across the placements of a pool,
+        # which must reach exactly what a new search of the same placement reaches.
+        settings = load_settings('entrance.sav', seed='TESTTESTTEST')
+        resolve_settings(settings)
+        resumed_max_explore = ValidationSearch.max_explore
+        compared = []
+
+        def max_explore(validation_search: ValidationSearch, entrance_placed: Entrance) -> Search:
+            search = resumed_max_explore(validation_search, entrance_placed)
+            new_search = Search.max_explore([world.state for world in validation_search.worlds], validation_search.itempool)
+            self.assertEqual(search.reachable_regions('child'), new_search.reachable_regions('child'))
+            self.assertEqual(search.reachable_regions('adult'), new_search.reachable_regions('adult'))
+            locations = [location for world in validation_search.worlds for location in world.get_locations()]
+            self.assertEqual(list(map(search.visited, locations)), list(map(new_search.visited, locations)))
+            compared.append(entrance_placed)
+            return search
+
+        ValidationSearch.max_explore = max_explore
+        try:
+            build_world_graphs(settings)
+        except EntranceShuffleError:
+            pass
+        finally:
+            ValidationSearch.max_explore = resumed_max_explore
+        self.assertTrue(compared)
+
+
+class TestSearch(unittest.TestCase):
+    def test_copy_is_independent(self):
+        settings = load_settings('plentiful.sav', seed='TESTTESTTEST')
+        resolve_settings(settings)
+        worlds = build_world_graphs(settings)
+        world = worlds[0]
+        search = Search([world.state for world in worlds])
+        explored_search = search.copy()
+        explored_search.collect_all(world.itempool)
+        explored_search.collect_locations()
+        # Exploring the copy must not leak into the original search's regions or locations
+        self.assertLess(len(search.reachable_regions()), len(explored_search.reachable_regions()))
+        self.assertTrue(any(map(explored_search.visited, world.get_locations())))
+        self.assertFalse(any(map(search.visited, world.get_locations())))
+        self.assertTrue(explored_search.can_reach(world.get_region('Spirit Temple Lobby'), age='adult'))
+        self.assertFalse(search.can_reach(world.get_region('Spirit Temple Lobby'), age='adult'))
+
+
+class TestRuleCache(unittest.TestCase):
+    def test_compiled_rules_depend_on_settings(self):
+        rule = 'logic_lens_botw or Bow'
+        with_trick = make_settings_for_test({'allowed_tricks': ['logic_lens_botw']}, seed='TESTTESTTEST')
+        without_trick = make_settings_for_test({'allowed_tricks': []}, seed='TESTTESTTEST')
+        resolve_settings(with_trick)
+        resolve_settings(without_trick)
+        world_with_trick = build_world_graphs(with_trick)[0]
+        world_without_trick = build_world_graphs(without_trick)[0]
+
+        access_rule = world_with_trick.parser.parse_rule(rule)
+        self.assertIs(access_rule, world_with_trick.parser.parse_rule(rule))
+        self.assertTrue(access_rule(world_with_trick.state))
+        self.assertFalse(world_without_trick.parser.parse_rule(rule)(world_without_trick.state))
+
+        # Rules loaded from a saved cache behave like the ones they were saved from
+        cache_file = os.path.join(output_dir, 'rule_cache.bin')
+        save_rule_cache(cache_file)
+        compiled_rules.clear()
+        self.assertTrue(load_rule_cache(cache_file))
+        self.assertIn((rule, False), compiled_rules)
+        self.assertTrue(build_world_graphs(with_trick)[0].parser.parse_rule(rule)(world_with_trick.state))
+        self.assertFalse(build_world_graphs(without_trick)[0].parser.parse_rule(rule)(world_without_trick.state))
+
+
+class TestLogicFiles(unittest.TestCase):
+    def test_cached_logic_files_match_source(self):
+        for logic_dir in ('World', 'Glitched World'):
+            for filename in os.listdir(data_path(logic_dir)):
+                if not filename.endswith('.json'):
+                    continue
+                file_path = data_path(os.path.join(logic_dir, filename))
+                with self.subTest(file_path):
+                    regions = read_logic_file(file_path)
+                    self.assertEqual(regions, parse_logic_file(file_path))
+                    # Every read is a separate copy
+                    regions.clear()
+                    self.assertEqual(read_logic_file(file_path), parse_logic_file(file_path))
+
+
+class TestCrc(unittest.TestCase):
+    data = BigStream(bytearray(i * 7 & 0xFF for i in range(0x102000)))
+    expected = bytearray.fromhex('e12cee3c68bd3b09')
+
+    def test_python_crc(self):
+        self.assertEqual(calculate_crc_python(self.data), self.expected)
+
+    def test_numpy_crc(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy not available.")
+        self.assertEqual(calculate_crc_numpy(self.data), self.expected)
+
+
+class TestChangedRanges(unittest.TestCase):
+    def test_ranges_are_merged(self):
+        ranges = ChangedRanges()
+        for start, end in [(10, 20), (20, 25), (5, 8), (7, 12), (40, 41), (30, 30), (100, 200), (150, 160)]:
+            ranges.add(start, end)
+        self.assertEqual(list(ranges), [(5, 25), (40, 41), (100, 200)])
+        self.assertIn(5, ranges)
+        self.assertIn(199, ranges)
+        self.assertNotIn(25, ranges)
+        self.assertNotIn(0, ranges)
+        copied = ranges.copy()
+        copied.add(0, 1)
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(len(copied), 4)
+
+    def test_changed_runs(self):
+        original = bytearray(0x1000)
+        buffer = bytearray(original)
+        buffer[0x10:0x20] = b'\x01' * 0x10
+        buffer[0x3FF:0x402] = b'\x02' * 3
+        buffer[0xFFF] = 3
+        self.assertEqual(list(changed_runs(buffer, original, 0, 0x1000)), [(0x10, 0x20), (0x3FF, 0x402), (0xFFF, 0x1000)])
+        self.assertEqual(list(changed_runs(buffer, original, 0x400, 0x800)), [(0x400, 0x402)])
+        self.assertEqual(list(changed_runs(buffer, original, 0, 0x1000, chunk_size=0x100)), [(0x10, 0x20), (0x3FF, 0x402), (0xFFF, 0x1000)])
+        with memoryview(buffer) as new_chunk, memoryview(original) as old_chunk:
+            self.assertEqual(chunk_changed_runs_python(new_chunk, old_chunk, block_size=0x10), [(0x10, 0x20), (0x3FF, 0x402), (0xFFF, 0x1000)])
+
+    def test_restore_reverts_writes(self):
+        rom = Rom()
+        rom.buffer = bytearray(range(256)) * 0x100
+        rom.original = Rom()
+        rom.original.buffer = bytes(rom.buffer)
+        rom.restore()
+        restored = bytearray(rom.buffer)
+        rom.write_bytes(0x1000, [0xAA] * 0x2000)
+        rom.write_int32s(0x100, [1, 2, 3])
+        rom.write_byte(0x50, 0)
+        rom.restore()
+        self.assertEqual(rom.buffer, restored)
+        self.assertEqual(len(rom.changed_ranges), 2)  # version bytes
+
+
+class TestActors(unittest.TestCase):
+    # Scene 5 lists rooms A and B, has a transition actor, and an alternate header listing rooms A and C.
+    # Room B has an alternate header of its own. Every other scene is empty.
+    def setUp(self) -> None:
+        self.rom = Rom()
+        rom = self.rom
+        rom.buffer = bytearray(0xC00000)
+        for scene in range(0x00, 0x65):
+            rom.write_int32(0xB71440 + scene * 0x14, 0x200000)
+        rom.write_byte(0x200000, 0x14)
+
+        scene, room_a, room_b, room_c = 0x100000, 0x110000, 0x120000, 0x130000
+        rom.write_int32(0xB71440 + 5 * 0x14, scene)
+        rom.write_int32s(scene, [0x04020000, 0x02000040, 0x0E010000, 0x02000080, 0x18000000, 0x020000A0, 0x14000000, 0])
+        rom.write_int32s(scene + 0x40, [room_a, room_a + 0x100, room_b, room_b + 0x200])
+        rom.write_int32s(scene + 0xA0, [0x02000100, 0, 0])
+        rom.write_int32s(scene + 0x100, [0x04020000, 0x02000140, 0x14000000, 0])
+        rom.write_int32s(scene + 0x140, [room_a, room_a + 0x100, room_c, room_c + 0x100])
+
+        rom.write_int32s(room_a, [0x01030000, 0x03000040, 0x14000000, 0])
+        self.cow_a, self.salesman_a, self.grotto = room_a + 0x40, room_a + 0x50, room_a + 0x60
+        rom.write_int16(self.cow_a, 0x01C6)
+        rom.write_int16s(self.salesman_a, [0x0195, 0, 0, 0, 0, 0, 0, 0x0006])
+        rom.write_int16s(self.grotto, [0x009B, 0, 0, 0, 0, 0, 0x1111, 0x0203])
+
+        rom.write_int32s(room_b, [0x01020000, 0x03000040, 0x18000000, 0x03000080, 0x14000000, 0])
+        rom.write_int32s(room_b + 0x80, [0x03000100, 0, 0])
+        rom.write_int32s(room_b + 0x100, [0x01010000, 0x03000140, 0x14000000, 0])
+        self.cows_b = [room_b + 0x40, room_b + 0x50, room_b + 0x140]
+        for cow in self.cows_b:
+            rom.write_int16(cow, 0x01C6)
+
+        rom.write_int32s(room_c, [0x01010000, 0x03000040, 0x14000000, 0])
+        self.salesman_c = room_c + 0x40
+        rom.write_int16s(self.salesman_c, [0x0195, 0, 0, 0, 0, 0, 0, 0x0005])
+
+        self.transition_actor = scene + 0x80
+        rom.write_int16(self.transition_actor + 4, 0x002E)
+        rom.changed_ranges = ChangedRanges()
+
+        grotto_entrance = SimpleNamespace(primary=True, data={'scene': 5, 'content': 0x03}, replaces=SimpleNamespace(data={'index': 0x1234}))
+        self.world = SimpleNamespace(dungeon_mq={'Jabu Jabus Belly': False}, get_shuffled_entrances=lambda type=None: [grotto_entrance])
+
+    def test_get_actor_lists(self):
+        def actor_ids(rom: Rom, actor_id: int, actor: int, scene: int) -> tuple[int, int]:
+            return actor_id, scene
+
+        def cows(rom: Rom, actor_id: int, actor: int, scene: int) -> bool:
+            return actor_id == 0x01C6
+
+        ids, cow_list = get_actor_lists(self.rom, [actor_ids, cows])
+        self.assertEqual(ids, {
+            self.cow_a: (0x01C6, 5), self.salesman_a: (0x0195, 5), self.grotto: (0x009B, 5),
+            self.cows_b[0]: (0x01C6, 5), self.cows_b[1]: (0x01C6, 5), self.cows_b[2]: (0x01C6, 5),
+            self.transition_actor: (0x002E, 5), self.salesman_c: (0x0195, 5),
+        })
+        self.assertEqual(list(cow_list), [self.cow_a, *self.cows_b])
+
+    def test_single_pass_patches(self):
+        serial = self.rom.copy()
+        set_grotto_shuffle_data(serial, self.world)
+        set_cow_id_data(serial, self.world)
+        set_deku_salesman_data(serial)
+
+        actor_funcs = []
+        set_grotto_shuffle_data(self.rom, self.world, actor_funcs)
+        set_cow_id_data(self.rom, self.world, actor_funcs)
+        set_deku_salesman_data(self.rom, actor_funcs)
+        self.assertNotEqual(self.rom.buffer, serial.buffer)
+        get_actor_lists(self.rom, actor_funcs)
+        self.assertEqual(self.rom.buffer, serial.buffer)
+
+        # Empty alternate header slots point back at the room's own header, so room B's main cows are counted again for setups 2 and 3.
+        self.assertEqual([self.rom.read_int16(cow + 8) for cow in [self.cow_a, *self.cows_b]], [1, 7, 8, 4])
+        self.assertEqual(self.rom.read_int16(self.salesman_a + 14), 0x0003)
+        self.assertEqual(self.rom.read_int16(self.salesman_c + 14), 0x0005)
+        self.assertEqual(self.rom.read_int16(self.grotto + 12), 0x1234)
+        self.assertEqual(self.rom.read_byte(self.grotto + 14), 0x22)
+
+    def test_base_actor_index(self):
+        rom = self.rom
+        with tempfile.TemporaryDirectory() as temp_dir:
+            rom.source_file = os.path.join(temp_dir, 'ZOOTDEC.z64')
+            with open(rom.source_file, 'wb') as f:
+                f.write(rom.buffer)
+            rom.original = Rom()
+            rom.original.buffer = bytearray(rom.buffer)
+            cache_path = os.path.join(temp_dir, 'ZOOTDEC.actors')
+            self.assertIsNotNone(get_base_actor_index(rom, cache_path))
+            self.assertTrue(os.path.isfile(cache_path))
+
+            # Room C loses its actor, so scene 5 has to be indexed from the patched ROM.
+            for changed in (False, True):
+                if changed:
+                    rom.write_byte(0x130001, 0)
+                self.assertEqual(get_actor_index(rom), [entry for scene in range(0x00, 0x65) for entry in build_scene_actor_index(rom, scene)[0]])
+            self.assertNotIn(self.salesman_c, [entry[3] for entry in get_actor_index(rom)])
+
+
+class TestModelScan(unittest.TestCase):
+    manifest = b''.join(name + b'\x00' + offset.to_bytes(4, 'big') for name, offset in [
+        (b'Gauntlet.Fist.L', 0x06000100), (b'Bottle.Hand.L', 0x06000200), (b'FPS.Hookshot', 0x06000300),
+        (b'Broken.Blade.3', 0x06000400), (b'Fist.L', 0x06000500), (b'Bottle', 0x06000600),
+        (b'Hookshot', 0x06000700), (b'Hand.L', 0x06000800), (b'Blade.3', 0x06000900),
+    ])
+    zobj = bytearray(b'\xDF\x01\x00\x00\x00\x00\x00\x00\x00!PlayAsManifest0' + manifest)
+
+    def test_footer_names(self):
+        footer = scan(self.zobj, "!PlayAsManifest0")
+        self.assertEqual(footer, 25)
+        self.assertEqual(scan(self.zobj, "Fist.L", footer), 0x06000500)
+        self.assertEqual(scan(self.zobj, "Bottle", footer), 0x06000600)
+        self.assertEqual(scan(self.zobj, "Hookshot", footer), 0x06000700)
+        self.assertEqual(scan(self.zobj, "Hand.L", footer), 0x06000800)
+        self.assertEqual(scan(self.zobj, "Blade.3", footer), 0x06000900)
+        self.assertEqual(scan(self.zobj, "Fist.R", footer), -1)
+        self.assertEqual(scan(self.zobj, "MODLOADER64"), -1)
+
+    def test_broken_partial_match(self):
+        # A byte that breaks a partial match is not checked as the start of a new one
+        end_dl = bytearray(b'\xDF\x00\x00\x00\x00\x00\x00\x00')
+        self.assertEqual(scan(bytearray(b'\x01\xDF') + end_dl + bytearray(b'\x01') + end_dl, end_dl) - 8, 11)
+        self.assertEqual(scan(bytearray(b'xHHand.L\x00\x06\x00\x00\x10'), "Hand.L", 1), -1)
+
+
+class TestTextures(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(0x20)
+        self.rom = Rom()
+        self.rom.buffer = bytearray(0x3000)
+        self.rom.buffer[0x20:0x2020] = bytes(random.randrange(0x100) for _ in range(0x2000))
+        # 16 different colors for the ci4 textures
+        self.palette = [0x0843 * (i + 1) for i in range(16)]
+        self.rom.write_int16s(0x2800, self.palette)
+        self.patch_file = data_path('textures/chest/chest_base_gilded_rgba16_patch.bin')
+
+    def require_numpy(self) -> None:
+        if texture_util.numpy is None:
+            self.skipTest("NumPy not available.")
+
+    def python_texture(self, func, *args) -> bytearray:
+        numpy = texture_util.numpy
+        texture_util.numpy = None
+        try:
+            return func(self.rom, *args)
+        finally:
+            texture_util.numpy = numpy
+
+    def test_rgba16_patch(self):
+        self.require_numpy()
+        for patch_file in (self.patch_file, None):
+            self.assertEqual(rgba16_patch_numpy(self.rom, 0x20, 2048, patch_file), self.python_texture(rgba16_patch, 0x20, None, 2048, patch_file))
+
+    def test_ci4_to_ci8(self):
+        self.require_numpy()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Few enough different patch pixels to stay within 256 colors
+            ci4_patch_file = os.path.join(temp_dir, 'patch.bin')
+            with open(ci4_patch_file, 'wb') as f:
+                f.write(b''.join(random.choice([0x0000, 0x0842, 0xF000, 0x001E]).to_bytes(2, 'big') for _ in range(2048)))
+            for patch_file in (ci4_patch_file, None):
+                self.assertEqual(ci4_rgba16patch_to_ci8_numpy(self.rom, 0x20, 0x2800, 2048, patch_file), self.python_texture(ci4_rgba16patch_to_ci8, 0x20, 0x2800, 2048, patch_file))
+
+    def test_ci4_to_ci8_small_texture(self):
+        # Palette indexes 0, 1, 2, 3, 1, 0, 15, 2, high nibble first
+        self.rom.write_bytes(0x2900, [0x01, 0x23, 0x10, 0xF2])
+        p = self.palette
+        padding = [0x0001] * (0x100 - 5)
+        expected_texture = [0, 1, 2, 3, 1, 0, 4, 2]
+        expected = b''.join(color.to_bytes(2, 'big') for color in [p[0], p[1], p[2], p[3], p[15], *padding]) + bytes(expected_texture)
+
+        # The patch turns the color 15 pixel into color 0
+        patched_texture = [0, 1, 2, 3, 1, 0, 0, 2]
+        patched = b''.join(color.to_bytes(2, 'big') for color in [p[0], p[1], p[2], p[3], *padding, 0x0001]) + bytes(patched_texture)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            patch_file = os.path.join(temp_dir, 'patch.bin')
+            with open(patch_file, 'wb') as f:
+                f.write(b''.join(pixel.to_bytes(2, 'big') for pixel in [0, 0, 0, 0, 0, 0, p[15] ^ p[0], 0]))
+            implementations = [lambda *args: self.python_texture(ci4_rgba16patch_to_ci8, *args)]
+            if texture_util.numpy is not None:
+                implementations.append(lambda *args: ci4_rgba16patch_to_ci8_numpy(self.rom, *args))
+            for implementation in implementations:
+                self.assertEqual(implementation(0x2900, 0x2800, 8, None), expected)
+                self.assertEqual(implementation(0x2900, 0x2800, 8, patch_file), patched)
+
+
+class TestPatchFile(unittest.TestCase):
+    def test_round_trip(self):
+        generator = random.Random(21)
+        original = Rom()
+        original.buffer = bytearray(generator.getrandbits(8 * 0x40000).to_bytes(0x40000, 'big'))
+        original.buffer[0x20000:0x28000] = bytes(0x8000)
+        original.write_int32s(DMADATA_START, [0, DMADATA_START, 0, 0, DMADATA_START, DMADATA_START + 0x40, 0, 0, DMADATA_START + 0x40, 0x40000, 0, 0, 0, 0, 0, 0])
+        rom = Rom()
+        rom.buffer = bytearray(original.buffer)
+        rom.original = original
+
+        # changes with 0s, blocks too long for one section and bytes that match their XOR keys
+        rom.write_bytes(0x10000, bytes(generator.choice((0, 0, 1, 0x80, 0xFF)) for _ in range(0x20000)))
+        rom.write_bytes(0x8000, original.buffer[0xB000:0xC000])
+        rom.write_bytes(0x30001, b'\xFF' * 0x300)
+        rom.write_int32(0x3F000, 0x12345678)
+
+        patch_file = os.path.join(output_dir, 'test_round_trip.zpf')
+        create_patch_file(rom, patch_file, xor_range=(0x8000, 0x3FFFF), xor_seed=21)
+        patched = Rom()
+        patched.buffer = bytearray(original.buffer)
+        patched.original = original
+        apply_patch_file(patched, Settings({'patch_file': patch_file}))
+        self.assertEqual(patched.buffer, rom.buffer)
+
+    def test_parallel_patch_files(self):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.skipTest("Patch files are only created in parallel in forked processes.")
+        generator = random.Random(9)
+        original = Rom()
+        original.buffer = bytearray(0x1000000)
+        original.buffer[0xB8AD30:0xF029A0] = generator.getrandbits(8 * 0x377C70).to_bytes(0x377C70, 'big')
+        original.write_int32s(DMADATA_START, [0, DMADATA_START, 0, 0, DMADATA_START, DMADATA_START + 0x30, 0, 0, DMADATA_START + 0x30, 0x1000000, 0, 0])
+        rom = Rom()
+        rom.buffer = bytearray(original.buffer)
+        rom.original = original
+        rom.write_version_bytes()
+
+        # Stands in for patching a world, with the random state prepare_rom picked for it
+        def patch_world(spoiler: Any, world: Any, rom: Rom) -> None:
+            for _ in range(0x40):
+                rom.write_int32s(random.randrange(0x1000, 0xFF0000), [random.getrandbits(32) for _ in range(4)])
+
+        settings = Settings({'world_count': 3, 'create_cosmetics_log': False, 'create_patch_file': True})
+        spoiler = SimpleNamespace(worlds=[SimpleNamespace(id=world_id) for world_id in range(3)])
+        random.seed(9)
+        rng_state = random.getstate()
+        xor_seeds = [1, 2, 3]
+        with tempfile.TemporaryDirectory() as temp_dir, mock.patch.object(Main, 'patch_rom', patch_world), \
+                mock.patch.object(Main, 'patch_cosmetics', lambda settings, rom: None):
+            output_dirs = [os.path.join(temp_dir, 'serial'), os.path.join(temp_dir, 'parallel')]
+            for output_dir in output_dirs:
+                os.mkdir(output_dir)
+            contexts = [PatchFileContext(settings, spoiler, rom, rng_state, output_dir, 'Test', False) for output_dir in output_dirs]
+
+            # The workers start from the unpatched ROM, so the parallel files are created first.
+            parallel_files = create_patch_files_parallel(contexts[1], xor_seeds, 2)
+            serial_files = []
+            for world in spoiler.worlds:
+                settings.generating_patch_file = True
+                patch_cosmetics_log = prepare_rom(spoiler, world, rom, settings, rng_state, world.id > 0)
+                serial_files += write_patch_file(contexts[0], world, patch_cosmetics_log, xor_seeds[world.id])
+
+            self.assertEqual(serial_files, ['TestP1.zpf', 'TestP2.zpf', 'TestP3.zpf'])
+            self.assertEqual(parallel_files, serial_files)
+            patch_files = []
+            for filename in serial_files:
+                with open(os.path.join(output_dirs[0], filename), 'rb') as serial, open(os.path.join(output_dirs[1], filename), 'rb') as parallel:
+                    patch_files.append(serial.read())
+                    self.assertEqual(parallel.read(), patch_files[-1])
+            self.assertEqual(len(set(patch_files)), 3)
+
+    def test_minibsdiff(self):
+        original = Rom()
+        original.buffer = bytearray(range(0x100)) * 0x10
+        rom = Rom()
+        rom.buffer = bytearray(original.buffer)
+        rom.original = original
+
+        # add 0x80 diff bytes with wraparound, write 0x20 extra bytes, then skip 0x100 original bytes for the rest
+        control = [0x80, 0x20, 0x100, 0xE60, 0, 0]
+        diff = bytes(0x10) + b'\x01' * 0x20 + b'\xFF' * 0x10 + bytes(0x40 + 0xE60)
+        header = [len(control) * 8, len(diff), 0xF00] + control
+        patch_file = os.path.join(output_dir, 'test_minibsdiff.patch')
+        with gzip.open(patch_file, 'wb') as stream:
+            stream.write(b'MBSDIF43' + b''.join(value.to_bytes(8, 'little') for value in header) + diff + b'\xAA' * 0x20)
+        apply_minibsdiff_patch_file(rom, patch_file)
+
+        expected = original.buffer[:0x10] + bytes(range(0x11, 0x31)) + bytes(range(0x2F, 0x3F)) + original.buffer[0x40:0x80]
+        expected += b'\xAA' * 0x20 + original.buffer[0x180:0xFE0] + original.buffer[0xF00:]
+        self.assertEqual(rom.buffer, expected)
+        self.assertEqual(list(rom.changed_ranges), [(0x10, 0x40), (0x80, 0xF00)])
+
+
+# Stands in for Main.main in batch worker processes. Seed 1 kills its worker every time, seed 2 only the first time.
+def die_in_batch_worker(settings: Settings) -> None:
+    if settings.seed.endswith('-1'):
+        os._exit(1)
+    if settings.seed.endswith('-2') and not os.path.exists(batch_died_file):
+        open(batch_died_file, 'w').close()
+        os._exit(1)
+
+
+batch_died_file: str = ''
+
+
+class TestBatch(unittest.TestCase):
+    def test_worker_death(self):
+        global batch_died_file
+        if multiprocessing.get_start_method() != 'fork':
+            self.skipTest("Worker processes don't inherit the patched main.")
+        with tempfile.TemporaryDirectory() as temp_dir, mock.patch.object(Main, 'main', die_in_batch_worker):
+            batch_died_file = os.path.join(temp_dir, 'died')
+            results = main_batch(Settings({'seed': 'BATCH', 'count': 4}), workers=1, max_retries=1)
+        self.assertEqual([(result.seed, result.success, result.attempts) for result in results],
+                         [('BATCH-0', True, 1), ('BATCH-1', False, 2), ('BATCH-2', True, 2), ('BATCH-3', True, 1)])
+        self.assertEqual(results[1].error, 'Worker process died.')
+
 
 class TestValidSpoilers(unittest.TestCase):
     # Normalizes spoiler dict for single world or multiple worlds
@@ -862,6 +1346,31 @@ class TestTextShuffle(unittest.TestCase):
         shuffle_messages(messages)
         shuffle_messages(messages, False)
 
+class TestMQ(unittest.TestCase):
+    def test_compiled_scene_patches(self):
+        if not os.path.isfile('./ZOOTDEC.z64'):
+            self.skipTest("Base ROM file not available.")
+        rom = Rom("./ZOOTDEC.z64")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_path = os.path.join(temp_dir, 'ZOOTDEC.mq')
+            scene_patches = get_compiled_scene_patches(rom, cache_path)
+            self.assertIsNotNone(scene_patches)
+            self.assertTrue(os.path.isfile(cache_path))
+        mq_scenes = [scene_data['Id'] for scene_data in get_json()]
+
+        # Once from the base ROM, and once after an earlier patch wrote to something the first scene reads,
+        # which has to patch that scene without its compiled patch.
+        for changed_address in (None, scene_patches[mq_scenes[0]][0][0][0]):
+            rom.restore()
+            if changed_address is not None:
+                rom.write_byte(changed_address, rom.read_byte(changed_address))
+                self.assertFalse(apply_scene_patch(rom, scene_patches[mq_scenes[0]]))
+            uncached = rom.copy()
+            for scene_data in get_json():
+                write_scene_data(uncached, Scene(scene_data))
+            patch_files(rom, mq_scenes)
+            self.assertEqual(rom.buffer, uncached.buffer)
+
 class TestSceneFlags(unittest.TestCase):
     def test_build_room_xflags(self):
         from SceneFlags import build_room_xflags, encode_room_xflags
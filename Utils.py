@@ -2,6 +2,7 @@ from __future__ import annotations
 import io
 import json
 import logging
+import marshal
 import os
 import re
 import subprocess
@@ -60,7 +61,7 @@ def default_output_path(path: str) -> str:
     return path
 
 
-def read_logic_file(file_path: str):
+def parse_logic_file(file_path: str):
     json_string = ""
     with io.open(file_path, 'r') as file:
         for line in file.readlines():
@@ -74,6 +75,37 @@ def read_logic_file(file_path: str):
                         "                                   ^^\n")
 
 
+# Parsed logic files by path: modification time and size of the source, marshalled contents.
+# Every read unmarshals a fresh copy, so callers are free to modify what they get.
+logic_file_cache: dict[str, tuple[int, int, bytes]] = {}
+
+
+# Logic files are parsed once and kept marshalled in memory and in a __pycache__ directory
+# next to them, until the source file's modification time or size changes.
+def read_logic_file(file_path: str):
+    stat = os.stat(file_path)
+    source = (stat.st_mtime_ns, stat.st_size)
+    cached = logic_file_cache.get(file_path, None)
+    if cached is None or cached[:2] != source:
+        cache_path = os.path.join(os.path.dirname(file_path), '__pycache__', os.path.basename(file_path) + '.marshal')
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            cached = None
+        if not isinstance(cached, tuple) or cached[:2] != source:
+            cached = (*source, marshal.dumps(parse_logic_file(file_path)))
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path, 'wb') as f:
+                    marshal.dump(cached, f)
+            except OSError:
+                # Read-only installs just parse the file again next run.
+                pass
+        logic_file_cache[file_path] = cached
+    return marshal.loads(cached[2])
+
+
 def open_file(filename: str) -> None:
     if sys.platform == 'win32':
         os.startfile(filename)
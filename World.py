@@ -5,14 +5,14 @@ import logging
 import os
 import random
 from collections import OrderedDict, defaultdict
-from collections.abc import Iterable, Iterator
+from collections.abc import Collection, Iterable, Iterator
 from typing import Any, Optional
 
 from Dungeon import Dungeon
 from Entrance import Entrance
 from Goals import Goal, GoalCategory
 from HintList import get_required_hints, misc_item_hint_table, misc_location_hint_table
-from Hints import HintArea, hint_dist_keys, hint_dist_files
+from Hints import HintArea, HintAreaIndex, hint_dist_keys, hint_dist_files
 from Item import Item, ItemFactory, ItemInfo, make_event_item
 from ItemPool import reward_list
 from Location import Location, LocationFactory
@@ -35,8 +35,11 @@ class World:
         self.regions: list[Region] = []
         self.itempool: list[Item] = []
         self._cached_locations: list[Location] = []
+        self._scene_locations: dict[Optional[int], list[Location]] = {}
+        self.location_count: int = 0
         self._entrance_cache: dict[str, Entrance] = {}
         self._region_cache: dict[str, Region] = {}
+        self.hint_area_index: HintAreaIndex = HintAreaIndex()
         self._location_cache: dict[str, Location] = {}
         self.shop_prices: dict[str, int] = {}
         self.scrub_prices: dict[int, int] = {}
@@ -367,6 +370,7 @@ class World:
 
         new_world.dungeons = [dungeon for dungeon in self.dungeons]
         new_world.regions = [region for region in self.regions]
+        new_world.location_count = self.location_count
         new_world.itempool = [item for item in self.itempool]
         new_world.state = self.state.copy(new_world)
 
@@ -592,8 +596,7 @@ class World:
                     if new_location.never:
                         # We still need to fill the location even if ALR is off.
                         logging.getLogger('').debug('Unreachable location: %s', new_location.name)
-                    new_location.world = self
-                    new_region.locations.append(new_location)
+                    self.add_location(new_region, new_location)
             if 'events' in region:
                 for event, rule in region['events'].items():
                     # Allow duplicate placement of events
@@ -605,8 +608,7 @@ class World:
                     if new_location.never:
                         logging.getLogger('').debug('Dropping unreachable event: %s', new_location.name)
                     else:
-                        new_location.world = self
-                        new_region.locations.append(new_location)
+                        self.add_location(new_region, new_location)
                         make_event_item(event, new_location)
             if 'exits' in region:
                 for exit, rule in region['exits'].items():
@@ -624,9 +626,22 @@ class World:
                 new_region.savewarp = new_exit
                 # the replaced entrance may not exist yet so we connect it after all region files have been read
                 savewarps_to_connect.append((new_exit, region['savewarp']))
+            new_region.index = self.interleaved_index(len(self.regions))
             self.regions.append(new_region)
         return savewarps_to_connect
 
+    # Regions and locations are numbered across all worlds of a seed, interleaved by world id,
+    # so that Search can track them in flat arrays shared by every world.
+    def interleaved_index(self, local_index: int) -> int:
+        return local_index * self.settings.world_count + self.id
+
+    # Attaches a location to one of this world's regions and gives it an index for the search arrays.
+    def add_location(self, region: Region, location: Location) -> None:
+        location.world = self
+        location.index = self.interleaved_index(self.location_count)
+        self.location_count += 1
+        region.locations.append(location)
+
     def create_dungeons(self) -> list[tuple[Entrance, str]]:
         savewarps_to_connect = []
         for hint_area in HintArea:
@@ -1199,6 +1214,17 @@ class World:
                 self._cached_locations.extend(region.locations)
         return self._cached_locations
 
+    # The locations in a scene, optionally only those of some types, in the same order as get_locations.
+    # Locations are grouped by scene once, so looking up every scene only goes over each location once.
+    def get_scene_locations(self, scene: Optional[int], types: Optional[Collection[str]] = None) -> list[Location]:
+        if not self._scene_locations:
+            for location in self.get_locations():
+                self._scene_locations.setdefault(location.scene, []).append(location)
+        locations = self._scene_locations.get(scene, [])
+        if types is None:
+            return locations
+        return [location for location in locations if location.type in types]
+
     def get_unfilled_locations(self) -> Iterable[Location]:
         return filter(Location.has_no_item, self.get_locations())
 
@@ -1,18 +1,32 @@
+from __future__ import annotations
 import itertools
+import struct
 
 from ntype import uint32, BigStream
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CRC_SEED: int = 0xDF26F436
+CRC_START: int = 0x1000
+CRC_LENGTH: int = 0x100000
+
 
 def calculate_crc(data: BigStream) -> bytearray:
-    t1 = t2 = t3 = t4 = t5 = t6 = 0xDF26F436
+    if numpy is not None:
+        return calculate_crc_numpy(data)
+    return calculate_crc_python(data)
 
-    u32 = 0xFFFFFFFF
 
-    m1 = data.read_bytes(0x1000, 0x100000)
-    words = map(uint32.value, zip(m1[0::4], m1[1::4], m1[2::4], m1[3::4]))
+def calculate_crc_python(data: BigStream) -> bytearray:
+    t1 = t2 = t3 = t4 = t5 = t6 = CRC_SEED
+
+    u32 = 0xFFFFFFFF
 
-    m2 = data.read_bytes(0x750, 0x100)
-    words2 = map(uint32.value, zip(m2[0::4], m2[1::4], m2[2::4], m2[3::4]))
+    words = struct.unpack(f'>{CRC_LENGTH // 4}I', data.read_bytes(CRC_START, CRC_LENGTH))
+    words2 = struct.unpack('>64I', data.read_bytes(0x750, 0x100))
 
     for d, d2 in zip(words, itertools.cycle(words2)):
         # keep t2 and t6 in u32 for comparisons; others can wait to be truncated
@@ -36,3 +50,32 @@ def calculate_crc(data: BigStream) -> bytearray:
     crc1 = (t5 ^ t2 ^ t1) & u32
 
     return uint32.bytes(crc0) + uint32.bytes(crc1)
+
+
+# Same checksum with every accumulator except t2 computed on whole arrays.
+# t2 depends on its own previous value, so it still takes a (much lighter) loop.
+def calculate_crc_numpy(data: BigStream) -> bytearray:
+    u32 = 0xFFFFFFFF
+
+    words = numpy.frombuffer(data.read_bytes(CRC_START, CRC_LENGTH), dtype='>u4').astype(numpy.uint64)
+    words2 = numpy.frombuffer(data.read_bytes(0x750, 0x100), dtype='>u4').astype(numpy.uint64)
+
+    # Running sums can't overflow 64 bits: 0x40000 words of at most 32 bits each.
+    sums = numpy.cumsum(words) + CRC_SEED
+    t6 = sums & u32
+    # Every time the running sum wraps around 32 bits, t4 is incremented.
+    t4 = CRC_SEED + (int(sums[-1]) >> 32)
+    t3 = CRC_SEED ^ int(numpy.bitwise_xor.reduce(words))
+    shifts = words & 0x1F
+    rotated = ((words << shifts) | (words >> (32 - shifts))) & u32
+    t5 = CRC_SEED + int(rotated.sum())
+    t1 = CRC_SEED + int((numpy.resize(words2, words.shape) ^ words).sum())
+
+    t2 = CRC_SEED
+    for d, r, t6_d in zip(words.tolist(), rotated.tolist(), (t6 ^ words).tolist()):
+        t2 ^= r if t2 > d else t6_d
+
+    crc0 = (int(t6[-1]) ^ t4 ^ t3) & u32
+    crc1 = (t5 ^ t2 ^ t1) & u32
+
+    return uint32.bytes(crc0) + uint32.bytes(crc1)
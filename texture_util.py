@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 from __future__ import annotations
+import os
+from collections.abc import Callable
+from typing import Optional
 
 from Rom import Rom
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # Read a ci4 texture from rom and convert to rgba16
 # rom - Rom
@@ -31,27 +39,24 @@ def rgba16_to_ci8(rgba16_texture: list[int]) -> tuple[list[int], list[int]]:
             palette.append(0x0001)
 
     # Create the new ci8 texture (list of bytes) by locating the index of each color from the rgba16 texture in the color palette.
+    palette_indexes = {}
+    for index, color in enumerate(palette):
+        palette_indexes.setdefault(color, index)
     for pixel in rgba16_texture:
-        if pixel in palette:
-            ci8_texture.append(palette.index(pixel))
+        if pixel in palette_indexes:
+            ci8_texture.append(palette_indexes[pixel])
     return ci8_texture, palette
 
 
 # Load a palette (essentially just an rgba16 texture) from rom
 def load_palette(rom: Rom, address: int, length: int) -> list[int]:
-    palette = []
-    for i in range(0, length):
-        palette.append(rom.read_int16(address + 2 * i))
-    return palette
+    data = rom.read_bytes(address, 2 * length)
+    return [int.from_bytes(data[i:i + 2], 'big') for i in range(0, 2 * length, 2)]
 
 
 # Get a list of unique colors (palette) from an rgba16 texture
 def get_colors_from_rgba16(rgba16_texture: list[int]) -> list[int]:
-    colors = []
-    for pixel in rgba16_texture:
-        if pixel not in colors:
-            colors.append(pixel)
-    return colors
+    return list(dict.fromkeys(rgba16_texture))
 
 
 # Apply a patch to a rgba16 texture. The patch texture is exclusive or'd with the original to produce the result
@@ -62,14 +67,9 @@ def apply_rgba16_patch(rgba16_texture: list[int], rgba16_patch: list[int]) -> li
     if rgba16_patch is not None and (len(rgba16_texture) != len(rgba16_patch)):
         raise(Exception("OG Texture and Patch not the same length!"))
 
-    new_texture = []
     if not rgba16_patch:
-        for i in range(0, len(rgba16_texture)):
-            new_texture.append(rgba16_texture[i])
-        return new_texture
-    for i in range(0, len(rgba16_texture)):
-        new_texture.append(rgba16_texture[i] ^ rgba16_patch[i])
-    return new_texture
+        return list(rgba16_texture)
+    return [pixel ^ patch for pixel, patch in zip(rgba16_texture, rgba16_patch)]
 
 
 # Save a rgba16 texture to a file
@@ -98,10 +98,8 @@ def save_ci8_texture(ci8_texture: list[int], filename: str) -> None:
 # size - Size of the texture in PIXELS
 # returns - list of ints representing each 16-bit pixel
 def load_rgba16_texture_from_rom(rom: Rom, base_texture_address: int, size: int) -> list[int]:
-    texture = []
-    for i in range(0, size):
-        texture.append(int.from_bytes(rom.read_bytes(base_texture_address + 2 * i, 2), 'big'))
-    return texture
+    data = rom.read_bytes(base_texture_address, 2 * size)
+    return [int.from_bytes(data[i:i + 2], 'big') for i in range(0, 2 * size, 2)]
 
 
 # Load an rgba16 texture from a binary file.
@@ -140,6 +138,8 @@ def rgba16_from_file(rom: Rom, base_texture_address: int, base_palette_address:
 # patchfile - file path of a rgba16 binary texture to patch
 # returns - bytearray of the new texture
 def rgba16_patch(rom: Rom, base_texture_address: int, base_palette_address: int, size: int, patchfile: str) -> bytearray:
+    if numpy is not None:
+        return rgba16_patch_numpy(rom, base_texture_address, size, patchfile)
     base_texture_rgba16 = load_rgba16_texture_from_rom(rom, base_texture_address, size)
     patch_rgba16 = None
     if patchfile:
@@ -159,6 +159,8 @@ def rgba16_patch(rom: Rom, base_texture_address: int, base_palette_address: int,
 # patchfile - file path of a rgba16 binary texture to patch
 # returns - bytearray of the new texture
 def ci4_rgba16patch_to_ci8(rom: Rom, base_texture_address: int, base_palette_address: int, size: int, patchfile: str) -> bytearray:
+    if numpy is not None:
+        return ci4_rgba16patch_to_ci8_numpy(rom, base_texture_address, base_palette_address, size, patchfile)
     palette = load_palette(rom, base_palette_address, 16) # load the original palette from rom
     base_texture_rgba16 = ci4_to_rgba16(rom, base_texture_address, size, palette) # load the original texture from rom and convert to ci8
     patch_rgba16 = None
@@ -175,6 +177,72 @@ def ci4_rgba16patch_to_ci8(rom: Rom, base_texture_address: int, base_palette_add
     return bytes
 
 
+# Load an rgba16 patch file as an array of 16-bit pixels, or None if there is no patch file
+def load_rgba16_patch_numpy(patchfile: str, size: int) -> Optional[numpy.ndarray]:
+    if not patchfile:
+        return None
+    with open(patchfile, 'rb') as file:
+        data = file.read(2 * size)
+    if len(data) != 2 * size:
+        # Short files are padded the same way load_rgba16_texture does
+        return numpy.array(load_rgba16_texture(patchfile, size), dtype='>u2')
+    return numpy.frombuffer(data, dtype='>u2')
+
+
+# Same as rgba16_patch, on arrays of pixels
+def rgba16_patch_numpy(rom: Rom, base_texture_address: int, size: int, patchfile: str) -> bytearray:
+    base_texture_rgba16 = numpy.frombuffer(rom.read_bytes(base_texture_address, 2 * size), dtype='>u2')
+    patch_rgba16 = load_rgba16_patch_numpy(patchfile, size)
+    if patch_rgba16 is None:
+        return bytearray(base_texture_rgba16.tobytes())
+    return bytearray((base_texture_rgba16 ^ patch_rgba16).astype('>u2').tobytes())
+
+
+# Same as ci4_rgba16patch_to_ci8, on arrays of pixels
+def ci4_rgba16patch_to_ci8_numpy(rom: Rom, base_texture_address: int, base_palette_address: int, size: int, patchfile: str) -> bytearray:
+    palette = numpy.frombuffer(rom.read_bytes(base_palette_address, 2 * 16), dtype='>u2')
+    texture = numpy.frombuffer(rom.read_bytes(base_texture_address, size // 2), dtype=numpy.uint8)
+    # Each ci4 byte holds two pixels, high nibble first
+    new_texture_rgba16 = palette[numpy.stack((texture >> 4, texture & 0x0F), axis=1).ravel()]
+    patch_rgba16 = load_rgba16_patch_numpy(patchfile, size)
+    if patch_rgba16 is not None:
+        new_texture_rgba16 = new_texture_rgba16 ^ patch_rgba16
+
+    # The palette holds the colors in the order they first appear in the texture, padded with 0x0001
+    colors, first_pixels, ci8_texture = numpy.unique(new_texture_rgba16, return_index=True, return_inverse=True)
+    if len(colors) > 0x100:
+        raise(Exception("RGB Texture exceeds maximum of 256 colors"))
+    order = numpy.argsort(first_pixels)
+    ci8_palette = numpy.full(0x100, 0x0001, dtype='>u2')
+    ci8_palette[:len(colors)] = colors[order]
+    palette_indexes = numpy.empty(len(colors), dtype=numpy.uint8)
+    palette_indexes[order] = numpy.arange(len(colors))
+    return bytearray(ci8_palette.tobytes() + palette_indexes[ci8_texture.ravel()].tobytes())
+
+
+# Patched textures only depend on the original texture and palette and the patch file, so every texture is only
+# built once per process, as long as the texture data in the ROM and the patch file don't change.
+patched_textures: dict[tuple, bytes] = {}
+
+
+def build_patched_texture(func: Callable[[Rom, int, Optional[int], int, Optional[str]], bytearray], rom: Rom,
+                          base_texture_address: int, base_palette_address: Optional[int], size: int, patchfile: Optional[str]) -> bytearray:
+    patch_source = None
+    if patchfile:
+        stat = os.stat(patchfile)
+        patch_source = (patchfile, stat.st_mtime_ns, stat.st_size)
+    key = (
+        func.__name__, base_texture_address, base_palette_address, size, patch_source,
+        bytes(rom.read_bytes(base_texture_address, 2 * size)),
+        bytes(rom.read_bytes(base_palette_address, 2 * 16)) if base_palette_address is not None else None,
+    )
+    texture = patched_textures.get(key, None)
+    if texture is None:
+        texture = bytes(func(rom, base_texture_address, base_palette_address, size, patchfile))
+        patched_textures[key] = texture
+    return bytearray(texture)
+
+
 # Function to create rgba16 texture patches for crates
 def build_crate_ci8_patches() -> None:
     # load crate textures from rom